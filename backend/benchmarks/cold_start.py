@@ -0,0 +1,167 @@
+"""Measure cold start: import time of the app, and time to the first successful /api/convert.
+
+The import profile comes from `python -X importtime -c "import main"`: the
+app's direct imports and the slowest modules, and whether `import main`
+stays within --budget-ms. Then, for each file type and with the pool
+warm-up off and on (PDF_POOL_WARMUP), a fresh process imports the app,
+starts its lifespan and converts one small file through httpx's ASGI
+transport, as the first request after a sleeping instance wakes up
+would; --idle leaves time between startup and that request. Exits with
+status 1 when `import main` is over --budget-ms, or a first response fails
+or takes longer than --response-budget-s from launch. Needs httpx (pip
+install httpx). tests/test_cold_start.py checks the same budgets. Run from
+backend/:
+
+    python -m benchmarks.cold_start --budget-ms 600
+    python -m benchmarks.cold_start --only docx pptx --idle 2
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import subprocess
+import tempfile
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).parent.parent
+FIXTURES = ("txt", "md", "html", "csv", "xlsx", "docx", "pptx", "jpg")
+IMPORT_BUDGET_MS = 600
+FIRST_RESPONSE_BUDGET_S = 3  # from launching the process to the first /api/convert response
+# Only the pool workers import these, once a file of their type arrives
+# (pypdf imports the PIL package itself to see whether it is installed)
+CONVERTER_MODULES = ("reportlab", "PIL.Image", "markdown", "openpyxl", "docx", "pptx")
+
+
+def import_profile(repeat: int) -> tuple[float, list[tuple[int, int, str]]]:
+    """Fastest of `repeat` runs of `import main`: (milliseconds, [(self us, cumulative us, module)...])."""
+    best = None
+    for _ in range(repeat):
+        run = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", "import main"],
+            cwd=BACKEND_DIR, capture_output=True, text=True, check=True,
+        )
+        rows = []
+        for line in run.stderr.splitlines():
+            if not line.startswith("import time:") or "imported package" in line:
+                continue
+            own, cumulative, name = line[len("import time:"):].split("|")
+            rows.append((int(own), int(cumulative), name.rstrip()))
+        total = next(cumulative for _, cumulative, name in rows if name.strip() == "main")
+        if best is None or total < best[0]:
+            best = (total, rows)
+    return best[0] / 1000, best[1]
+
+
+def print_profile(total_ms: float, rows: list[tuple[int, int, str]], top: int):
+    # Nesting shows as indentation: main's direct imports are one level below it
+    depth = {name: len(name) - len(name.lstrip()) for _, _, name in rows}
+    main_depth = min(d for name, d in depth.items() if name.strip() == "main")
+    direct = [r for r in rows if depth[r[2]] == main_depth + 2]
+    print(f"import main: {total_ms:.0f}ms\n\n{'imported by main':<40} {'cumulative':>10}")
+    for _, cumulative, name in sorted(direct, key=lambda r: -r[1])[:top]:
+        print(f"{name.strip():<40} {cumulative / 1000:>8.1f}ms")
+    print(f"\n{'slowest modules':<40} {'self':>10}")
+    for own, _, name in sorted(rows, key=lambda r: -r[0])[:top]:
+        print(f"{name.strip():<40} {own / 1000:>8.1f}ms")
+
+
+async def first_convert(path: Path, idle: float) -> dict:
+    """Child process: import the app, start it and time the first and second conversion of `path`."""
+    import httpx
+
+    started = time.time()
+    from main import app
+    imported = time.time()
+
+    async with app.router.lifespan_context(app):
+        ready = time.time()
+        await asyncio.sleep(idle)
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test", timeout=None) as client:
+            times = []
+            for _ in range(2):
+                sent = time.time()
+                response = await client.post("/api/convert", files=[("files", (path.name, path.read_bytes()))])
+                times.append(time.time() - sent)
+                if response.status_code != 200:
+                    break
+    return {
+        "first_response_at": ready + idle + times[0],
+        "import_s": round(imported - started, 4),
+        "startup_s": round(ready - imported, 4),
+        "first_response_s": round(times[0], 4),
+        "second_response_s": round(times[-1], 4),
+        "status": response.status_code,
+    }
+
+
+def measure(path: Path, warm_up: bool, idle: float) -> dict:
+    """Run first_convert in a fresh interpreter; launch_s is from launch to the first response."""
+    env = dict(os.environ, PDF_POOL_WARMUP="1" if warm_up else "0", RESULT_CACHE_MAX_BYTES="0")
+    launched = time.time()
+    run = subprocess.run(
+        [sys.executable, "-m", "benchmarks.cold_start", "--child", str(path), "--idle", str(idle)],
+        cwd=BACKEND_DIR, env=env, capture_output=True, text=True,
+    )
+    if run.returncode:
+        raise RuntimeError(f"cold start of {path.name} failed:\n{run.stderr}")
+    result = json.loads(run.stdout.splitlines()[-1])
+    result["launch_s"] = round(result.pop("first_response_at") - launched, 4)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--budget-ms", type=float, default=IMPORT_BUDGET_MS, help="allowed time for `import main`")
+    parser.add_argument("--response-budget-s", type=float, default=FIRST_RESPONSE_BUDGET_S,
+                        help="allowed time from launch to the first response, minus --idle")
+    parser.add_argument("--repeat", type=int, default=3, help="import profile runs; the fastest counts")
+    parser.add_argument("--top", type=int, default=12, help="modules to list in the import profile")
+    parser.add_argument("--only", nargs="+", choices=FIXTURES, default=list(FIXTURES), help="file types to convert")
+    parser.add_argument("--warm-up", choices=("off", "on", "both"), default="both")
+    parser.add_argument("--idle", type=float, default=0,
+                        help="seconds between startup and the first request (time the warm-up gets)")
+    parser.add_argument("--output", type=Path, help="also write the results as JSON")
+    parser.add_argument("--child", type=Path, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(asyncio.run(first_convert(args.child, args.idle))))
+        return
+
+    total_ms, rows = import_profile(args.repeat)
+    print_profile(total_ms, rows, args.top)
+    results = {"import_ms": round(total_ms, 1), "budget_ms": args.budget_ms, "first_convert": {}}
+
+    modes = {"off": [False], "on": [True], "both": [False, True]}[args.warm_up]
+    failed = []
+    with tempfile.TemporaryDirectory() as tmp:
+        from benchmarks.corpus import make_corpus
+        corpus = make_corpus(Path(tmp), 0.05)
+
+        print(f"\n{'first convert':<14} {'warm-up':>7} {'launch':>9} {'import':>9} {'startup':>9} "
+              f"{'1st resp':>9} {'2nd resp':>9}")
+        for name in args.only:
+            for warm_up in modes:
+                key = f"{name}.warm_up_{'on' if warm_up else 'off'}"
+                case = results["first_convert"][key] = measure(corpus[name], warm_up, args.idle)
+                if case["status"] != 200 or case["launch_s"] - args.idle > args.response_budget_s:
+                    failed.append(key)
+                print(f"{name:<14} {'on' if warm_up else 'off':>7} {case['launch_s']:>8.3f}s {case['import_s']:>8.3f}s "
+                      f"{case['startup_s']:>8.3f}s {case['first_response_s']:>8.3f}s {case['second_response_s']:>8.3f}s"
+                      + (f"  HTTP {case['status']}" if case["status"] != 200 else ""))
+
+    if args.output:
+        args.output.write_text(json.dumps(results, indent=2))
+    if failed:
+        print(f"\nfirst conversion failed or took over {args.response_budget_s:g}s: {', '.join(failed)}")
+    if total_ms > args.budget_ms:
+        print(f"\nimport main took {total_ms:.0f}ms, over the {args.budget_ms:.0f}ms budget")
+    if failed or total_ms > args.budget_ms:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
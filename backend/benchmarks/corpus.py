@@ -0,0 +1,149 @@
+"""Generate the synthetic benchmark corpus: one file per input type, plus PDFs to split and merge.
+
+Everything is seeded, so the same scale always produces the same
+documents and results from different runs are comparable. Sizes grow
+linearly with --scale. Run from backend/:
+
+    python -m benchmarks.corpus --scale 1 --out /tmp/corpus
+"""
+import io
+import json
+import random
+import argparse
+from pathlib import Path
+
+from PIL import Image
+from reportlab.lib.utils import ImageReader
+from reportlab.pdfgen import canvas
+
+from benchmarks.csv_benchmark import make_csv
+from benchmarks.html_benchmark import WORDS, make_html, make_markdown
+from benchmarks.pptx_benchmark import make_deck
+from benchmarks.text_benchmark import make_log
+from benchmarks.xlsx_benchmark import make_workbook
+
+MANIFEST = "corpus.json"
+
+
+def make_docx(path: Path, sections: int):
+    """Headings, paragraphs of prose and a small table per section, like a long contract."""
+    from docx import Document
+
+    rng = random.Random(0)
+    doc = Document()
+    for s in range(sections):
+        doc.add_heading(f"Section {s + 1}", 1)
+        for _ in range(6):
+            p = doc.add_paragraph(" ".join(rng.choice(WORDS) for _ in range(rng.randint(40, 120))) + " ")
+            p.add_run("Defined term").bold = True
+        table = doc.add_table(rows=6, cols=4)
+        for r, row in enumerate(table.rows):
+            for c, cell in enumerate(row.cells):
+                cell.text = f"column {c}" if r == 0 else f"{rng.random() * 1000:.2f}"
+    doc.save(path)
+
+
+def make_photo(path: Path, width: int, height: int, fmt: str, frames: int = 1):
+    """A smooth colour gradient with some grain, which compresses like a photo or scan."""
+    rng = random.Random(0)
+    images = []
+    for f in range(frames):
+        gradient = Image.linear_gradient("L").resize((width, height))
+        grain = Image.frombytes("L", (width, height), rng.randbytes(width * height))
+        rgb = Image.merge("RGB", (gradient, Image.blend(gradient, grain, 0.2), Image.new("L", (width, height), 40 * f)))
+        images.append(rgb)
+    options = {"JPEG": {"quality": 90}, "TIFF": {"compression": "tiff_lzw"}}.get(fmt, {})
+    if frames > 1:
+        options.update(save_all=True, append_images=images[1:])
+    images[0].save(path, fmt, **options)
+
+
+def make_pdf(path: Path, pages: int, images: int = 8, section_pages: int = 20):
+    """Text pages sharing a few images, with a bookmark every `section_pages` pages.
+
+    Written with reportlab's invariant mode, so the bytes only depend on the
+    arguments.
+    """
+    rng = random.Random(pages)
+    readers = []
+    for _ in range(images):
+        buf = io.BytesIO()
+        Image.frombytes("RGB", (128, 128), rng.randbytes(128 * 128 * 3)).save(buf, "PNG")
+        readers.append(ImageReader(io.BytesIO(buf.getvalue())))
+
+    c = canvas.Canvas(str(path), invariant=1)
+    for i in range(pages):
+        if i % section_pages == 0:
+            key = f"section{i // section_pages}"
+            c.bookmarkPage(key)
+            c.addOutlineEntry(f"Section {i // section_pages + 1}", key, level=0)
+        c.setFont(("Helvetica", "Times-Roman", "Courier")[i % 3], 11)
+        c.drawString(72, 750, f"Page {i + 1}")
+        text = c.beginText(72, 720)
+        for _ in range(30):
+            text.textLine(" ".join(rng.choice(WORDS) for _ in range(12)))
+        c.drawText(text)
+        c.drawImage(readers[i % images], 72, 72, 128, 128)
+        c.showPage()
+    c.save()
+
+
+def make_corpus(directory: Path, scale: float = 1.0) -> dict[str, Path]:
+    """Write every fixture into `directory`. Returns {name: path}.
+
+    A directory that already holds a corpus of the same scale is reused.
+    """
+    directory.mkdir(parents=True, exist_ok=True)
+    manifest_path = directory / MANIFEST
+    if manifest_path.exists():
+        manifest = json.loads(manifest_path.read_text())
+        if manifest["scale"] == scale and all((directory / file).exists() for file in manifest["files"].values()):
+            return {name: directory / file for name, file in manifest["files"].items()}
+
+    def sized(base: int) -> int:
+        return max(int(base * scale), 1)
+
+    files = {
+        "txt": "log.txt",
+        "md": "report.md",
+        "html": "report.html",
+        "csv": "table.csv",
+        "xlsx": "workbook.xlsx",
+        "docx": "contract.docx",
+        "pptx": "deck.pptx",
+        "jpg": "photo.jpg",
+        "png": "scan.png",
+        "tiff": "scan.tiff",
+        "pdf": "document.pdf",
+    }
+    make_log(directory / files["txt"], 5 * scale)
+    make_markdown(directory / files["md"], 0.5 * scale)
+    make_html(directory / files["md"], directory / files["html"])
+    make_csv(directory / files["csv"], sized(20_000), 12)
+    make_workbook(directory / files["xlsx"], 4, sized(2_500))
+    make_docx(directory / files["docx"], sized(60))
+    make_deck(directory / files["pptx"], sized(60))
+    make_photo(directory / files["jpg"], 3000, 2000, "JPEG")
+    make_photo(directory / files["png"], 1700, 2200, "PNG")
+    make_photo(directory / files["tiff"], 1700, 2200, "TIFF", frames=4)
+    make_pdf(directory / files["pdf"], sized(300))
+    for i in range(8):
+        files[f"merge_{i}"] = f"merge_{i}.pdf"
+        make_pdf(directory / files[f"merge_{i}"], sized(25) + i)
+
+    manifest_path.write_text(json.dumps({"scale": scale, "files": files}, indent=2))
+    return {name: directory / file for name, file in files.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scale", type=float, default=1.0, help="multiplier for every fixture's size")
+    parser.add_argument("--out", type=Path, required=True, help="directory to write the corpus to")
+    args = parser.parse_args()
+
+    for name, path in make_corpus(args.out, args.scale).items():
+        print(f"{name:<8} {path.stat().st_size / 1e6:8.2f}MB  {path}")
+
+
+if __name__ == "__main__":
+    main()
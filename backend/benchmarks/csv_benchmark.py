@@ -0,0 +1,59 @@
+"""Benchmark CSV to PDF conversion throughput and peak memory.
+
+Each size runs in a fresh process so its peak RSS is its own. Peak memory
+should stay roughly flat as the row count grows. Run from backend/:
+
+    python -m benchmarks.csv_benchmark --rows 20000 100000 --cols 12
+"""
+import csv
+import time
+import argparse
+import resource
+import tempfile
+import multiprocessing
+from pathlib import Path
+
+
+def make_csv(path: Path, rows: int, cols: int):
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow([f"column_{c}" for c in range(cols)])
+        for r in range(rows):
+            writer.writerow([r if c == 0 else f"value {r}-{c}" for c in range(cols)])
+
+
+def convert(path: Path, output_path: Path, results):
+    from services.converter import convert_to_pdf
+
+    started = time.perf_counter()
+    convert_to_pdf(path, output_path)
+    elapsed = time.perf_counter() - started
+    results.put((elapsed, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024))  # KB on Linux
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, nargs="+", default=[20_000, 100_000])
+    parser.add_argument("--cols", type=int, default=12)
+    args = parser.parse_args()
+
+    ctx = multiprocessing.get_context("spawn")
+    print(f"{'rows':>10} {'seconds':>9} {'rows/s':>9} {'peak RSS':>10} {'output':>10}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for rows in args.rows:
+            path = Path(tmp) / f"{rows}.csv"
+            output_path = Path(tmp) / f"{rows}.pdf"
+            make_csv(path, rows, args.cols)
+
+            results = ctx.Queue()
+            worker = ctx.Process(target=convert, args=(path, output_path, results))
+            worker.start()
+            elapsed, peak = results.get()
+            worker.join()
+
+            print(f"{rows:>10} {elapsed:>9.2f} {rows / elapsed:>9.0f} {peak / 1e6:>8.0f}MB "
+                  f"{output_path.stat().st_size / 1e6:>8.1f}MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""Benchmark HTML and Markdown to PDF conversion against the old tag-stripping path.
+
+The old path (a regex over the whole document, then a Paragraph and a
+Spacer per line) is kept here as a reference; it drops all structure, so
+compare MB/s and peak memory rather than page counts. Each run happens in
+a fresh process so peak RSS is its own. Run from backend/:
+
+    python -m benchmarks.html_benchmark --mb 5
+"""
+import re
+import time
+import random
+import argparse
+import resource
+import tempfile
+import multiprocessing
+from pathlib import Path
+
+from pypdf import PdfReader
+
+WORDS = ("convert", "merge", "split", "page", "document", "worker", "stream", "table", "memory", "output",
+         "request", "layout", "render", "archive", "upload", "result", "cache", "queue")
+
+
+def _sentence(rng: random.Random) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(rng.randint(8, 30))).capitalize() + "."
+
+
+def make_markdown(path: Path, megabytes: float):
+    """A long report: sections of prose, lists, a table and a code block each."""
+    rng = random.Random(0)
+    target = int(megabytes * 1024 * 1024)
+    with open(path, "w") as f:
+        section = 0
+        while f.tell() < target:
+            section += 1
+            f.write(f"## Section {section}\n\n")
+            for _ in range(rng.randint(2, 5)):
+                f.write(" ".join(_sentence(rng) for _ in range(rng.randint(2, 6))) + " **Bold** and `code`.\n\n")
+            f.write("".join(f"- {_sentence(rng)}\n" for _ in range(rng.randint(3, 8))) + "\n")
+            f.write("| id | name | status | duration |\n|---|---|---|---|\n")
+            f.write("".join(f"| {i} | {rng.choice(WORDS)} | ok | {rng.random() * 900:.1f}ms |\n"
+                            for i in range(rng.randint(5, 30))) + "\n")
+            f.write("```python\n" + "".join(f"result_{i} = convert(page_{i})\n" for i in range(rng.randint(3, 15)))
+                    + "```\n\n")
+
+
+def make_html(markdown_path: Path, path: Path):
+    import markdown
+    body = markdown.markdown(markdown_path.read_text(), extensions=["tables", "fenced_code"])
+    path.write_text(f"<html><head><title>Report</title></head><body>\n{body}\n</body></html>\n")
+
+
+def make_inputs(tmp: Path, megabytes: float):
+    make_markdown(tmp / "report.md", megabytes)
+    make_html(tmp / "report.md", tmp / "report.html")
+
+
+def convert_regex(input_path: Path, output_path: Path):
+    """The HTML converter as it was before the streaming renderer."""
+    from reportlab.lib.pagesizes import letter
+    from reportlab.lib.styles import getSampleStyleSheet
+    from reportlab.platypus import Paragraph, SimpleDocTemplate, Spacer
+
+    clean = re.sub(r"<[^>]+>", " ", input_path.read_text(encoding="utf-8", errors="replace"))
+    clean = clean.replace("&nbsp;", " ").replace("&amp;", "&")
+    clean = clean.replace("&lt;", "<").replace("&gt;", ">")
+    styles = getSampleStyleSheet()
+    doc = SimpleDocTemplate(str(output_path), pagesize=letter)
+    story = []
+    for line in clean.split("\n"):
+        line = line.strip()
+        if line:
+            safe = line.replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;")
+            story.append(Paragraph(safe, styles["Normal"]))
+            story.append(Spacer(1, 6))
+    doc.build(story)
+
+
+def convert_streaming(input_path: Path, output_path: Path):
+    from services.converter import convert_to_pdf
+    convert_to_pdf(input_path, output_path)
+
+
+def timed(convert, input_path: Path, output_path: Path, results):
+    started = time.perf_counter()
+    convert(input_path, output_path)
+    results.put((time.perf_counter() - started, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024))
+
+
+def run(name: str, convert, input_path: Path, output_path: Path):
+    ctx = multiprocessing.get_context("spawn")
+    results = ctx.Queue()
+    worker = ctx.Process(target=timed, args=(convert, input_path, output_path, results))
+    worker.start()
+    elapsed, peak = results.get()
+    worker.join()
+
+    pages = len(PdfReader(str(output_path)).pages)
+    size = input_path.stat().st_size
+    print(f"{name:<16} {size / 1e6:6.1f}MB in {elapsed:7.2f}s {pages:7} pages {pages / elapsed:7.0f} pages/s "
+          f"{size / 1e6 / elapsed:6.2f}MB/s  peak RSS {peak / 1e6:.0f}MB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--mb", type=float, default=5, help="size of the generated Markdown source")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        # Generate inputs in a child too: a child's peak RSS starts from the
+        # parent's (Linux keeps ru_maxrss across exec), so the parent stays small
+        generator = multiprocessing.get_context("spawn").Process(target=make_inputs, args=(tmp, args.mb))
+        generator.start()
+        generator.join()
+        run("html regex", convert_regex, tmp / "report.html", tmp / "regex.pdf")
+        run("html streaming", convert_streaming, tmp / "report.html", tmp / "html.pdf")
+        run("md streaming", convert_streaming, tmp / "report.md", tmp / "md.pdf")
+
+
+if __name__ == "__main__":
+    main()
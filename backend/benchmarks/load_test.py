@@ -0,0 +1,120 @@
+"""Load-test the API in-process with a mix of convert, split and merge requests.
+
+Requests go through httpx's ASGI transport straight into the FastAPI app
+(no sockets, no server), with the app's lifespan and process pool running
+as they would under uvicorn. The result cache is off unless --cache is
+given, so every request does the work. With --admission-budget, more
+clients than the budget admits at once show how throughput holds up under
+overload: requests over budget come back as 429. Needs httpx (pip install
+httpx). Run from backend/:
+
+    python -m benchmarks.load_test --requests 200 --concurrency 8
+    python -m benchmarks.load_test --requests 200 --concurrency 32 --admission-budget 100000000
+"""
+import os
+import json
+import time
+import asyncio
+import argparse
+import tempfile
+from collections import Counter, defaultdict
+from pathlib import Path
+
+from benchmarks.suite import percentile
+
+
+# (name, endpoint, upload field, corpus fixtures to upload, form fields), sent in turn
+SCENARIOS = [
+    ("convert.txt", "/api/convert", "files", ["txt"], {}),
+    ("convert.docx", "/api/convert", "files", ["docx"], {}),
+    ("convert.jpg", "/api/convert", "files", ["jpg"], {}),
+    ("convert.batch", "/api/convert", "files", ["md", "csv", "pptx"], {}),
+    ("split.chunks", "/api/split", "file", ["pdf"], {"mode": "chunks", "chunk_size": "10"}),
+    ("merge.low_memory", "/api/merge", "files", ["merge_0", "merge_1", "merge_2"], {"low_memory": "true"}),
+]
+
+
+async def run(args, corpus: dict[str, Path]) -> dict:
+    import httpx
+    from main import app
+
+    uploads = {name: (corpus[name].name, corpus[name].read_bytes()) for *_, names, _ in SCENARIOS for name in names}
+    latencies = defaultdict(list)
+    statuses = defaultdict(Counter)
+    issued = iter(range(args.requests))
+
+    async def send(client: httpx.AsyncClient, url: str, field: str, names: list[str], data: dict):
+        return await client.post(url, files=[(field, uploads[n]) for n in names], data=data)
+
+    async def client_loop(client: httpx.AsyncClient):
+        for i in issued:
+            name, *request = SCENARIOS[i % len(SCENARIOS)]
+            started = time.perf_counter()
+            response = await send(client, *request)
+            latencies[name].append(time.perf_counter() - started)
+            statuses[name][response.status_code] += 1
+
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test", timeout=None) as client:
+            # One warm-up request per kind, so pool start-up isn't counted
+            for _, *request in SCENARIOS:
+                await send(client, *request)
+
+            started = time.perf_counter()
+            await asyncio.gather(*(client_loop(client) for _ in range(args.concurrency)))
+            elapsed = time.perf_counter() - started
+
+    return {
+        "requests": args.requests,
+        "concurrency": args.concurrency,
+        "cache": args.cache,
+        "elapsed_s": round(elapsed, 3),
+        "requests_per_s": round(args.requests / elapsed, 2),
+        "ok_per_s": round(sum(s[200] for s in statuses.values()) / elapsed, 2),
+        "scenarios": {name: _summary(latencies[name], statuses[name]) for name, *_ in SCENARIOS if latencies[name]},
+    }
+
+
+def _summary(times: list[float], statuses: Counter) -> dict:
+    return {
+        "requests": len(times),
+        "p50_s": round(percentile(times, 50), 4),
+        "p95_s": round(percentile(times, 95), 4),
+        "max_s": round(max(times), 4),
+        "statuses": {str(code): count for code, count in sorted(statuses.items())},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=120)
+    parser.add_argument("--concurrency", type=int, default=8, help="clients sending requests at the same time")
+    parser.add_argument("--scale", type=float, default=0.1, help="corpus size multiplier (see benchmarks.corpus)")
+    parser.add_argument("--cache", action="store_true", help="keep the result cache on")
+    parser.add_argument("--admission-budget", type=int, help="ADMISSION_BUDGET_BYTES for the run (0 admits all)")
+    parser.add_argument("--output", type=Path, help="also write the results as JSON")
+    args = parser.parse_args()
+
+    if not args.cache:
+        os.environ["RESULT_CACHE_MAX_BYTES"] = "0"  # read when the app is imported
+    if args.admission_budget is not None:
+        os.environ["ADMISSION_BUDGET_BYTES"] = str(args.admission_budget)
+
+    from benchmarks.corpus import make_corpus
+
+    with tempfile.TemporaryDirectory() as tmp:
+        results = asyncio.run(run(args, make_corpus(Path(tmp), args.scale)))
+
+    print(f"{args.requests} requests, {args.concurrency} concurrent: {results['elapsed_s']:.2f}s, "
+          f"{results['requests_per_s']:.1f} requests/s, {results['ok_per_s']:.1f} successful/s\n")
+    print(f"{'scenario':<20} {'requests':>8} {'p50':>9} {'p95':>9} {'max':>9}  statuses")
+    for name, s in results["scenarios"].items():
+        print(f"{name:<20} {s['requests']:>8} {s['p50_s']:>8.3f}s {s['p95_s']:>8.3f}s {s['max_s']:>8.3f}s  "
+              + ", ".join(f"{code}: {count}" for code, count in s["statuses"].items()))
+    if args.output:
+        args.output.write_text(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""Benchmark /api/pipeline against the same workflow as three separate requests.
+
+The workflow converts a DOCX, a PNG and a JPEG, merges them with a PDF
+and extracts a page range. Separately, that is /api/convert (a ZIP), then
+/api/merge with the unzipped PDFs plus the original PDF, then /api/split
+of the merged file, each re-uploading and re-parsing the previous result.
+The pipeline does it in one request. Requests go through httpx's ASGI
+transport into the app, with the result cache off. Needs httpx (pip install
+httpx). Run from backend/:
+
+    python -m benchmarks.pipeline_benchmark --scale 0.5 --repeat 5
+"""
+import io
+import os
+import json
+import time
+import asyncio
+import zipfile
+import argparse
+import tempfile
+from pathlib import Path
+
+from benchmarks.suite import percentile
+
+CONVERT = ("docx", "png", "jpg")
+PDF = "merge_0"
+SPLIT = {"mode": "range", "start": 2, "end": 12}
+
+
+async def run(args, corpus: dict[str, Path]) -> dict:
+    import httpx
+    from main import app
+
+    converts = [(corpus[name].name, corpus[name].read_bytes()) for name in CONVERT]
+    pdf = (corpus[PDF].name, corpus[PDF].read_bytes())
+    times = {"round_trips": [], "pipeline": []}
+    transferred = {}
+
+    async def round_trips(client: httpx.AsyncClient) -> tuple[bytes, int]:
+        sent = sum(len(data) for _, data in converts)
+        r = await client.post("/api/convert", files=[("files", f) for f in converts])
+        r.raise_for_status()
+        with zipfile.ZipFile(io.BytesIO(r.content)) as zf:
+            converted = [(name, zf.read(name)) for name in zf.namelist()]
+        received = len(r.content)
+
+        merge_files = converted + [pdf]
+        sent += sum(len(data) for _, data in merge_files)
+        r = await client.post("/api/merge", files=[("files", f) for f in merge_files])
+        r.raise_for_status()
+        received += len(r.content)
+
+        sent += len(r.content)
+        r = await client.post("/api/split", files={"file": ("merged.pdf", r.content)},
+                              data={k: str(v) for k, v in SPLIT.items()})
+        r.raise_for_status()
+        return r.content, sent + received + len(r.content)
+
+    async def pipeline(client: httpx.AsyncClient) -> tuple[bytes, int]:
+        steps = [{"op": "convert"}, {"op": "merge"}, {"op": "split", **SPLIT}]
+        files = converts + [pdf]
+        r = await client.post("/api/pipeline", files=[("files", f) for f in files], data={"steps": json.dumps(steps)})
+        r.raise_for_status()
+        return r.content, sum(len(data) for _, data in files) + len(r.content)
+
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test", timeout=None) as client:
+            # Warm up the pool and each converter's imports outside the timing
+            await round_trips(client)
+            await pipeline(client)
+            for _ in range(args.repeat):
+                for name, flow in (("round_trips", round_trips), ("pipeline", pipeline)):
+                    started = time.perf_counter()
+                    _, transferred[name] = await flow(client)
+                    times[name].append(time.perf_counter() - started)
+
+    return {
+        name: {
+            "p50_s": round(percentile(samples, 50), 4),
+            "min_s": round(min(samples), 4),
+            "transferred_bytes": transferred[name],
+        }
+        for name, samples in times.items()
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scale", type=float, default=0.5, help="corpus size multiplier (see benchmarks.corpus)")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--output", type=Path, help="also write the results as JSON")
+    args = parser.parse_args()
+
+    os.environ["RESULT_CACHE_MAX_BYTES"] = "0"  # read when the app is imported
+    from benchmarks.corpus import make_corpus
+
+    with tempfile.TemporaryDirectory() as tmp:
+        results = asyncio.run(run(args, make_corpus(Path(tmp), args.scale)))
+
+    print(f"{'workflow':<14} {'p50':>9} {'min':>9} {'transferred':>12}")
+    for name, r in results.items():
+        print(f"{name:<14} {r['p50_s']:>8.3f}s {r['min_s']:>8.3f}s {r['transferred_bytes'] / 1e6:>10.1f}MB")
+    base, new = results["round_trips"], results["pipeline"]
+    print(f"\npipeline: {base['p50_s'] / new['p50_s']:.2f}x faster, "
+          f"{base['transferred_bytes'] / new['transferred_bytes']:.1f}x less data sent and received")
+    if args.output:
+        args.output.write_text(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""Benchmark PPTX to PDF conversion: slides in one process vs. spread over the pool.
+
+The deck is converted once part by part in one process, and once a part
+per pool worker the way /api/convert does it. Wall time should drop with
+the number of workers (PDF_POOL_WORKERS, default: one per core). Run
+from backend/:
+
+    python -m benchmarks.pptx_benchmark --slides 300
+"""
+import io
+import time
+import asyncio
+import argparse
+import tempfile
+from pathlib import Path
+
+from PIL import Image
+from pptx import Presentation
+from pptx.util import Inches
+
+from services.converter import convert_part, convert_to_pdf, count_parts, join_parts
+from utils.executor import MAX_WORKERS, map_in_pool, shutdown_pool
+
+
+def make_deck(path: Path, slides: int):
+    """Title and bullets on every slide, plus a photo-sized JPEG and a table on some."""
+    prs = Presentation()
+    for i in range(slides):
+        slide = prs.slides.add_slide(prs.slide_layouts[1])
+        slide.shapes.title.text = f"Quarterly review, part {i + 1}"
+        body = slide.placeholders[1].text_frame
+        body.text = "Revenue grew in every region this quarter"
+        for level in (1, 1, 2):
+            p = body.add_paragraph()
+            p.text = "Details that explain the headline number in a sentence or two"
+            p.level = level
+        if i % 2 == 0:
+            photo = io.BytesIO()
+            Image.new("RGB", (2400, 1600), (i % 256, 120, 180)).save(photo, "JPEG", quality=90)
+            photo.seek(0)
+            slide.shapes.add_picture(photo, Inches(5), Inches(4.5), Inches(4))
+        if i % 3 == 0:
+            table = slide.shapes.add_table(5, 4, Inches(0.5), Inches(4.5), Inches(4.2), Inches(2)).table
+            for r in range(5):
+                for c in range(4):
+                    table.cell(r, c).text = f"{r * c * 1000:,}"
+    prs.save(path)
+
+
+async def convert_parallel(path: Path, output_path: Path) -> float:
+    await map_in_pool(count_parts, [(path,)] * MAX_WORKERS)  # start the workers outside the timing
+
+    started = time.perf_counter()
+    count = count_parts(path, MAX_WORKERS)
+    parts = [(path, output_path.with_name(f"part_{i}.pdf"), i, count) for i in range(count)]
+    part_paths = await map_in_pool(convert_part, parts)
+    join_parts(part_paths, output_path)
+    return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--slides", type=int, default=300)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        deck = tmp / "deck.pptx"
+        make_deck(deck, args.slides)
+
+        started = time.perf_counter()
+        convert_to_pdf(deck, tmp / "sequential.pdf")
+        sequential = time.perf_counter() - started
+
+        parallel = asyncio.run(convert_parallel(deck, tmp / "parallel.pdf"))
+
+        print(f"{args.slides} slides ({deck.stat().st_size / 1e6:.1f}MB, {count_parts(deck, MAX_WORKERS)} parts): "
+              f"sequential {sequential:.2f}s, {MAX_WORKERS} workers {parallel:.2f}s ({sequential / parallel:.1f}x)")
+    shutdown_pool()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""Benchmark splitting a large PDF into single pages.
+
+Compares the old path (one process, every page copied with all the
+resources it inherits) against the pooled, sharded split with and without
+strip_unused. Run from backend/:
+
+    python -m benchmarks.split_benchmark --pages 600
+"""
+import io
+import os
+import time
+import asyncio
+import argparse
+import tempfile
+from pathlib import Path
+
+from PIL import Image
+from pypdf import PdfReader, PdfWriter
+from pypdf.generic import DictionaryObject, NameObject
+from reportlab.lib.utils import ImageReader
+from reportlab.pdfgen import canvas
+
+from routers.split import shard_pages
+from services.splitter import split_all_pages, split_specific_pages
+from utils.executor import MAX_WORKERS, map_in_pool, shutdown_pool
+
+
+def make_document(path: Path, pages: int, images: int):
+    """Write a PDF whose pages share one resource dictionary with every image and font.
+
+    This is how many generators lay out long documents, and it is the case
+    where a plain page copy carries far more than the page draws.
+    """
+    readers = []
+    for _ in range(images):
+        buf = io.BytesIO()
+        Image.frombytes("RGB", (256, 256), os.urandom(256 * 256 * 3)).save(buf, "PNG")
+        readers.append(ImageReader(io.BytesIO(buf.getvalue())))
+
+    buf = io.BytesIO()
+    c = canvas.Canvas(buf)
+    for i in range(pages):
+        c.setFont(("Helvetica", "Times-Roman", "Courier")[i % 3], 12)
+        c.drawString(72, 720, f"Page {i + 1}")
+        c.drawImage(readers[i * images // pages], 72, 360, 256, 256)
+        c.showPage()
+    c.save()
+
+    writer = PdfWriter(clone_from=PdfReader(buf))
+    shared = DictionaryObject()
+    for page in writer.pages:
+        for category, entries in page["/Resources"].get_object().items():
+            entries = entries.get_object()
+            if isinstance(entries, DictionaryObject):
+                shared.setdefault(NameObject(category), DictionaryObject()).update(entries)
+            else:
+                shared[NameObject(category)] = entries
+    shared_ref = writer._add_object(shared)
+    for page in writer.pages:
+        page[NameObject("/Resources")] = shared_ref
+    with open(path, "wb") as f:
+        writer.write(f)
+
+
+def sequential(path: Path, output_dir: Path, strip_unused: bool) -> list[Path]:
+    return split_all_pages(path, output_dir, strip_unused)
+
+
+def pooled(path: Path, output_dir: Path, strip_unused: bool) -> list[Path]:
+    total = len(PdfReader(str(path)).pages)
+    args = [(path, output_dir, shard, strip_unused) for shard in shard_pages(list(range(1, total + 1)))]
+    results = asyncio.run(map_in_pool(split_specific_pages, args))
+    return [pdf for shard in results for pdf in shard]
+
+
+def run(name: str, split, path: Path, strip_unused: bool, pages: int) -> tuple[float, int]:
+    with tempfile.TemporaryDirectory() as tmp:
+        started = time.perf_counter()
+        files = split(path, Path(tmp), strip_unused)
+        elapsed = time.perf_counter() - started
+        size = sum(f.stat().st_size for f in files)
+    print(f"{name:<28} {elapsed:8.2f}s {pages / elapsed:9.1f} pages/s {size / 1e6:10.1f} MB")
+    return elapsed, size
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pages", type=int, default=600)
+    parser.add_argument("--images", type=int, default=12)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "input.pdf"
+        make_document(path, args.pages, args.images)
+        shards = len(shard_pages(list(range(args.pages))))
+        print(f"{args.pages} pages, {path.stat().st_size / 1e6:.1f} MB input, "
+              f"{MAX_WORKERS} workers, {shards} shards\n")
+
+        base_time, base_size = run("sequential (old)", sequential, path, False, args.pages)
+        run("sequential, strip_unused", sequential, path, True, args.pages)
+        run("pooled", pooled, path, False, args.pages)
+        best_time, best_size = run("pooled, strip_unused", pooled, path, True, args.pages)
+
+    print(f"\npooled + strip_unused: {base_time / best_time:.1f}x faster, "
+          f"{base_size / max(best_size, 1):.1f}x smaller output")
+    shutdown_pool()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,214 @@
+"""Run every converter and every split/merge mode over the synthetic corpus.
+
+Each case runs in a fresh process (so peak RSS is its own) and is timed
+--repeat times. Results are written as JSON: p50/p95 latency, throughput
+and peak RSS per case. Each case is then compared against the baseline
+(benchmarks/baseline.json, a committed reference run; --save-baseline
+re-records it) and the run exits with status 1 if any case is slower or
+bigger than the tolerance allows. Run from backend/:
+
+    python -m benchmarks.suite --scale 1 --repeat 5
+    python -m benchmarks.suite --only 'convert.*' --baseline benchmarks/baseline.json
+"""
+import sys
+import json
+import math
+import time
+import fnmatch
+import argparse
+import platform
+import resource
+import tempfile
+import functools
+import multiprocessing
+from pathlib import Path
+
+BENCHMARKS_DIR = Path(__file__).parent
+DEFAULT_BASELINE = BENCHMARKS_DIR / "baseline.json"
+
+CONVERT_FIXTURES = ("txt", "md", "html", "csv", "xlsx", "docx", "pptx", "jpg", "png", "tiff")
+SPLIT_MODES = {
+    "all": {"mode": "all"},
+    "all_strip_unused": {"mode": "all", "strip_unused": True},
+    "specific": {"mode": "specific", "pages": list(range(1, 301, 3))},
+    "range": {"mode": "range", "start": 10, "end": 150},
+    "ranges": {"mode": "ranges", "ranges": [[1, 20], [50, 50], [100, 250]]},
+    "chunks": {"mode": "chunks", "chunk_size": 25},
+    "bookmarks": {"mode": "bookmarks"},
+}
+MERGE_FIXTURES = tuple(f"merge_{i}" for i in range(8))
+
+
+def convert(inputs: list[Path], output_dir: Path) -> list[Path]:
+    from services.converter import convert_to_pdf
+    return [convert_to_pdf(inputs[0], output_dir / "output.pdf")]
+
+
+def split(params: dict, inputs: list[Path], output_dir: Path) -> list[Path]:
+    from services.splitter import get_pdf_info, split_by_mode
+    # Clamp page numbers to the document, so every mode runs at every scale
+    total = get_pdf_info(inputs[0])["page_count"]
+    params = dict(params)
+    if "pages" in params:
+        params["pages"] = [p for p in params["pages"] if p <= total] or [1]
+    if "end" in params:
+        params["start"], params["end"] = min(params["start"], total), min(params["end"], total)
+    if "ranges" in params:
+        params["ranges"] = [[min(a, total), min(b, total)] for a, b in params["ranges"]]
+    return split_by_mode(inputs[0], output_dir, params)
+
+
+def merge(low_memory: bool, inputs: list[Path], output_dir: Path) -> list[Path]:
+    from services.merger import merge_pdfs, merge_pdfs_low_memory
+    output_path = output_dir / "merged.pdf"
+    if low_memory:
+        merge_pdfs_low_memory(inputs, output_path)
+    else:
+        merge_pdfs(inputs, output_path)
+    return [output_path]
+
+
+def cases() -> list[tuple]:
+    """(name, operation, corpus fixtures it reads) for every benchmark case."""
+    found = [(f"convert.{name}", convert, (name,)) for name in CONVERT_FIXTURES]
+    found += [(f"split.{name}", functools.partial(split, params), ("pdf",)) for name, params in SPLIT_MODES.items()]
+    found += [("merge.standard", functools.partial(merge, False), MERGE_FIXTURES),
+              ("merge.low_memory", functools.partial(merge, True), MERGE_FIXTURES)]
+    return found
+
+
+def run_case(operation, inputs: list[Path], repeat: int, results):
+    """Child process: time `repeat` runs of the operation, then report."""
+    from pypdf import PdfReader
+
+    with tempfile.TemporaryDirectory() as tmp:
+        operation(inputs, Path(tmp))  # import and warm up outside the timing
+    timings = []
+    for _ in range(repeat):
+        with tempfile.TemporaryDirectory() as tmp:
+            started = time.perf_counter()
+            outputs = operation(inputs, Path(tmp))
+            timings.append(time.perf_counter() - started)
+            pages = sum(len(PdfReader(str(p)).pages) for p in outputs)
+            output_bytes = sum(p.stat().st_size for p in outputs)
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024  # KB on Linux
+    results.put((timings, pages, output_bytes, peak))
+
+
+def percentile(values: list[float], p: float) -> float:
+    """Nearest-rank percentile."""
+    ordered = sorted(values)
+    return ordered[max(math.ceil(p / 100 * len(ordered)) - 1, 0)]
+
+
+def measure(operation, inputs: list[Path], repeat: int) -> dict:
+    ctx = multiprocessing.get_context("spawn")
+    results = ctx.Queue()
+    worker = ctx.Process(target=run_case, args=(operation, inputs, repeat, results))
+    worker.start()
+    timings, pages, output_bytes, peak = results.get()
+    worker.join()
+
+    input_bytes = sum(p.stat().st_size for p in inputs)
+    p50 = percentile(timings, 50)
+    return {
+        "p50_s": round(p50, 4),
+        "p95_s": round(percentile(timings, 95), 4),
+        "mean_s": round(sum(timings) / len(timings), 4),
+        "runs": len(timings),
+        "input_bytes": input_bytes,
+        "output_bytes": output_bytes,
+        "output_pages": pages,
+        "mb_per_s": round(input_bytes / 1e6 / p50, 3),
+        "pages_per_s": round(pages / p50, 1),
+        "peak_rss_bytes": peak,
+    }
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list[str]:
+    """Print each case against the baseline. Returns the names of regressed cases."""
+    regressions = []
+    print(f"\n{'case':<26} {'p50':>9} {'baseline':>9} {'change':>8} {'peak RSS':>9} {'baseline':>9} {'change':>8}")
+    for name, case in results["cases"].items():
+        base = baseline["cases"].get(name)
+        if base is None:
+            print(f"{name:<26} {case['p50_s']:>8.3f}s {'(new)':>9}")
+            continue
+        time_change = case["p50_s"] / base["p50_s"] - 1
+        rss_change = case["peak_rss_bytes"] / base["peak_rss_bytes"] - 1
+        regressed = time_change > tolerance or rss_change > tolerance
+        if regressed:
+            regressions.append(name)
+        print(f"{name:<26} {case['p50_s']:>8.3f}s {base['p50_s']:>8.3f}s {time_change:>+8.0%} "
+              f"{case['peak_rss_bytes'] / 1e6:>7.0f}MB {base['peak_rss_bytes'] / 1e6:>7.0f}MB {rss_change:>+8.0%}"
+              + ("  REGRESSION" if regressed else ""))
+    if baseline.get("scale") != results["scale"]:
+        print(f"\nwarning: baseline was recorded at scale {baseline.get('scale')}, this run used {results['scale']}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scale", type=float, default=1.0, help="corpus size multiplier (see benchmarks.corpus)")
+    parser.add_argument("--repeat", type=int, default=3, help="timed runs per case")
+    parser.add_argument("--only", nargs="+", default=["*"], metavar="PATTERN",
+                        help="glob patterns of cases to run, e.g. 'convert.*' split.all")
+    parser.add_argument("--corpus", type=Path, help="directory to keep the corpus in between runs")
+    parser.add_argument("--output", type=Path, default=BENCHMARKS_DIR / "results.json")
+    parser.add_argument("--baseline", type=Path, default=DEFAULT_BASELINE, help="compare against this results file")
+    parser.add_argument("--save-baseline", action="store_true", help="also write this run as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.15,
+                        help="allowed slowdown or memory growth before a case counts as regressed")
+    args = parser.parse_args()
+
+    selected = [case for case in cases() if any(fnmatch.fnmatch(case[0], p) for p in args.only)]
+    if not selected:
+        parser.error(f"no cases match {args.only}")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        corpus_dir = args.corpus or Path(tmp)
+        # Build the corpus in a child too: a child's peak RSS starts from the
+        # parent's (Linux keeps ru_maxrss across exec), so the parent stays small
+        ctx = multiprocessing.get_context("spawn")
+        generator = ctx.Process(target=_make_corpus, args=(corpus_dir, args.scale))
+        generator.start()
+        generator.join()
+        corpus = json.loads((corpus_dir / "corpus.json").read_text())["files"]
+
+        results = {
+            "scale": args.scale,
+            "repeat": args.repeat,
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": multiprocessing.cpu_count(),
+            "recorded_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "cases": {},
+        }
+        print(f"{'case':<26} {'p50':>9} {'p95':>9} {'MB/s':>8} {'pages/s':>9} {'peak RSS':>9}")
+        for name, operation, fixtures in selected:
+            inputs = [corpus_dir / corpus[f] for f in fixtures]
+            case = results["cases"][name] = measure(operation, inputs, args.repeat)
+            print(f"{name:<26} {case['p50_s']:>8.3f}s {case['p95_s']:>8.3f}s {case['mb_per_s']:>8.2f} "
+                  f"{case['pages_per_s']:>9.1f} {case['peak_rss_bytes'] / 1e6:>7.0f}MB")
+
+    args.output.write_text(json.dumps(results, indent=2))
+    print(f"\nresults written to {args.output}")
+    if args.save_baseline:
+        args.baseline.write_text(json.dumps(results, indent=2))
+        print(f"baseline written to {args.baseline}")
+    elif args.baseline.exists():
+        regressions = compare(results, json.loads(args.baseline.read_text()), args.tolerance)
+        if regressions:
+            print(f"\n{len(regressions)} case(s) regressed beyond {args.tolerance:.0%}: {', '.join(regressions)}")
+            sys.exit(1)
+    else:
+        print(f"no baseline at {args.baseline}; record one with --save-baseline")
+
+
+def _make_corpus(directory: Path, scale: float):
+    from benchmarks.corpus import make_corpus
+    make_corpus(directory, scale)
+
+
+if __name__ == "__main__":
+    main()
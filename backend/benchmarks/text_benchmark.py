@@ -0,0 +1,96 @@
+"""Benchmark .txt to PDF conversion against the old platypus path.
+
+The old path (a Paragraph per line through SimpleDocTemplate) is kept here
+as a reference. It is far too slow for 100MB inputs, so it runs on a
+smaller sample; pages/second is what to compare. Each run happens in a
+fresh process so peak RSS is its own. Run from backend/:
+
+    python -m benchmarks.text_benchmark --mb 100 --baseline-mb 2
+"""
+import time
+import random
+import argparse
+import resource
+import tempfile
+import multiprocessing
+from pathlib import Path
+
+from pypdf import PdfReader
+
+LEVELS = ("INFO", "INFO", "INFO", "DEBUG", "WARN", "ERROR")
+
+
+def make_log(path: Path, megabytes: float):
+    rng = random.Random(0)
+    target = int(megabytes * 1024 * 1024)
+    with open(path, "w") as f:
+        written = 0
+        while written < target:
+            line = (f"2024-05-{rng.randint(1, 28):02d} 12:{rng.randint(0, 59):02d}:{rng.randint(0, 59):02d} "
+                    f"{rng.choice(LEVELS):<5} worker-{rng.randint(1, 16)} request id={rng.getrandbits(64):016x} "
+                    f"path=/api/{rng.choice(('convert', 'split', 'merge'))} status=200 "
+                    f"duration={rng.random() * 900:.1f}ms" + " payload" * rng.randint(0, 12) + "\n")
+            f.write(line)
+            written += len(line)
+
+
+def convert_platypus(input_path: Path, output_path: Path):
+    """The text converter as it was before the direct-to-PDF engine."""
+    from reportlab.lib.pagesizes import letter
+    from reportlab.lib.styles import ParagraphStyle, getSampleStyleSheet
+    from reportlab.platypus import Paragraph, SimpleDocTemplate
+
+    text = input_path.read_text(encoding="utf-8", errors="replace")
+    styles = getSampleStyleSheet()
+    style = ParagraphStyle("Body", parent=styles["Normal"], fontSize=10, leading=14, fontName="Courier")
+    doc = SimpleDocTemplate(str(output_path), pagesize=letter)
+    story = []
+    for line in text.split("\n"):
+        line = line.replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;")
+        line = line.replace(" ", "&nbsp;") if line.strip() == "" else line
+        story.append(Paragraph(line or "&nbsp;", style))
+    doc.build(story)
+
+
+def convert_fast(input_path: Path, output_path: Path):
+    from services.converter import convert_to_pdf
+    convert_to_pdf(input_path, output_path)
+
+
+def timed(convert, input_path: Path, output_path: Path, results):
+    started = time.perf_counter()
+    convert(input_path, output_path)
+    results.put((time.perf_counter() - started, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024))
+
+
+def run(name: str, convert, input_path: Path, output_path: Path):
+    ctx = multiprocessing.get_context("spawn")
+    results = ctx.Queue()
+    worker = ctx.Process(target=timed, args=(convert, input_path, output_path, results))
+    worker.start()
+    elapsed, peak = results.get()
+    worker.join()
+
+    pages = len(PdfReader(str(output_path)).pages)
+    size = input_path.stat().st_size
+    print(f"{name:<10} {size / 1e6:7.1f}MB in {elapsed:8.2f}s {pages:8} pages {pages / elapsed:9.0f} pages/s "
+          f"{size / 1e6 / elapsed:7.1f}MB/s  peak RSS {peak / 1e6:.0f}MB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--mb", type=float, default=100, help="input size for the new engine")
+    parser.add_argument("--baseline-mb", type=float, default=2, help="input size for the old platypus path")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        make_log(tmp / "baseline.txt", args.baseline_mb)
+        make_log(tmp / "large.txt", args.mb)
+        run("platypus", convert_platypus, tmp / "baseline.txt", tmp / "baseline.pdf")
+        run("direct", convert_fast, tmp / "baseline.txt", tmp / "baseline_fast.pdf")
+        run("direct", convert_fast, tmp / "large.txt", tmp / "large.pdf")
+
+
+if __name__ == "__main__":
+    main()
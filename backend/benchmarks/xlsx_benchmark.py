@@ -0,0 +1,86 @@
+"""Benchmark XLSX to PDF conversion: memory on a long sheet, and parallel sheets.
+
+The long sheet converts in a fresh process so its peak RSS is its own. The
+multi-sheet workbook is converted once sheet by sheet in one process, and
+once a sheet per pool worker the way /api/convert does it. Run from backend/:
+
+    python -m benchmarks.xlsx_benchmark --rows 100000 --sheets 8
+"""
+import time
+import asyncio
+import argparse
+import resource
+import tempfile
+import multiprocessing
+from pathlib import Path
+
+from openpyxl import Workbook
+
+from services.converter import convert_part, convert_to_pdf, count_parts, join_parts
+from utils.executor import MAX_WORKERS, map_in_pool, shutdown_pool
+
+
+def make_workbook(path: Path, sheets: int, rows: int, cols: int = 8):
+    wb = Workbook(write_only=True)
+    for s in range(sheets):
+        ws = wb.create_sheet(f"Sheet {s + 1}")
+        ws.append([f"column_{c}" for c in range(cols)])
+        for r in range(rows):
+            ws.append([r] + [f"value {r}-{c}" for c in range(1, cols)])
+    wb.save(path)
+
+
+def convert_in_child(path: Path, output_path: Path, results):
+    started = time.perf_counter()
+    convert_to_pdf(path, output_path)
+    results.put((time.perf_counter() - started, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024))
+
+
+async def convert_parallel(path: Path, output_path: Path) -> float:
+    await map_in_pool(count_parts, [(path,)] * MAX_WORKERS)  # start the workers outside the timing
+
+    started = time.perf_counter()
+    parts = [(path, output_path.with_name(f"part_{i}.pdf"), i) for i in range(count_parts(path))]
+    part_paths = await map_in_pool(convert_part, parts)
+    join_parts(part_paths, output_path)
+    return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=100_000, help="rows in the long sheet")
+    parser.add_argument("--sheets", type=int, default=8, help="sheets in the multi-sheet workbook")
+    parser.add_argument("--sheet-rows", type=int, default=5_000, help="rows per sheet in the multi-sheet workbook")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+
+        long_path = tmp / "long.xlsx"
+        make_workbook(long_path, 1, args.rows)
+        results = multiprocessing.get_context("spawn").Queue()
+        worker = multiprocessing.get_context("spawn").Process(
+            target=convert_in_child, args=(long_path, tmp / "long.pdf", results),
+        )
+        worker.start()
+        elapsed, peak = results.get()
+        worker.join()
+        print(f"1 sheet x {args.rows} rows: {elapsed:.2f}s, {args.rows / elapsed:.0f} rows/s, "
+              f"peak RSS {peak / 1e6:.0f}MB")
+
+        sheets_path = tmp / "sheets.xlsx"
+        make_workbook(sheets_path, args.sheets, args.sheet_rows)
+
+        started = time.perf_counter()
+        convert_to_pdf(sheets_path, tmp / "sequential.pdf")
+        sequential = time.perf_counter() - started
+
+        parallel = asyncio.run(convert_parallel(sheets_path, tmp / "parallel.pdf"))
+
+        print(f"{args.sheets} sheets x {args.sheet_rows} rows: sequential {sequential:.2f}s, "
+              f"{MAX_WORKERS} workers {parallel:.2f}s ({sequential / parallel:.1f}x)")
+    shutdown_pool()
+
+
+if __name__ == "__main__":
+    main()
@@ -4,18 +4,31 @@ from contextlib import asynccontextmanager
 
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
 
-from routers import convert, split, merge
+from routers import convert, split, merge, jobs, documents, pipeline
+from services.converter import warm_up
+from utils.admission import AdmissionMiddleware, admission
+from utils.executor import MAX_WORKERS, WARM_UP, pending_jobs, shutdown_pool, warm_up_pool
 from utils.file_cleanup import periodic_cleanup, ensure_temp_dir
+from utils.job_store import job_store
+from utils.metrics import MetricsMiddleware, metrics
+from utils.result_cache import result_cache
+from utils.uploads import MAX_FILE_SIZE
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Startup and shutdown lifecycle."""
     ensure_temp_dir()
-    cleanup_task = asyncio.create_task(periodic_cleanup())
+    cleanup_task = asyncio.create_task(periodic_cleanup(job_store.sweep))
+    # In the background: the app serves requests while the workers start
+    warm_up_task = asyncio.create_task(warm_up_pool(warm_up)) if WARM_UP else None
     yield
     cleanup_task.cancel()
+    if warm_up_task:
+        warm_up_task.cancel()
+    shutdown_pool()
 
 
 app = FastAPI(
@@ -36,19 +49,47 @@ frontend_url = os.environ.get("FRONTEND_URL")
 if frontend_url:
     allowed_origins.append(frontend_url)
 
+# Inside CORS, so browsers can read a 429
+app.add_middleware(AdmissionMiddleware, max_body=MAX_FILE_SIZE)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=allowed_origins,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Merge-Bytes-Saved", "X-Merge-Peak-Memory", "Retry-After", "Server-Timing"],
 )
+app.add_middleware(MetricsMiddleware)
 
 # Routes
 app.include_router(convert.router)
 app.include_router(split.router)
 app.include_router(merge.router)
+app.include_router(jobs.router)
+app.include_router(documents.router)
+app.include_router(pipeline.router)
 
 
 @app.get("/api/health")
 async def health():
     return {"status": "ok"}
+
+
+@app.get("/api/cache/stats")
+async def cache_stats():
+    return await result_cache.stats()
+
+
+@app.get("/api/metrics", response_class=PlainTextResponse)
+async def prometheus_metrics():
+    """Stage timings, bytes in/out, in-flight work and temp/ usage in the Prometheus text format."""
+    # Sizes the job store and result cache already track; nothing is walked per scrape
+    temp_bytes, temp_files = job_store.usage()
+    metrics.temp_bytes.set(temp_bytes)
+    metrics.temp_files.set(temp_files)
+    metrics.pool_workers.set(MAX_WORKERS)
+    metrics.pool_jobs_in_flight.set(pending_jobs())
+    metrics.jobs_running.set(job_store.running())
+    metrics.cache_bytes.set((await result_cache.stats())["bytes"])
+    metrics.admission_cost_bytes.set(admission.in_use)
+    metrics.admission_queued.set(admission.queued())
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
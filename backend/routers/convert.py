@@ -1,68 +1,242 @@
-import zipfile
+import json
+import asyncio
+from contextlib import aclosing
 from pathlib import Path
 
-from fastapi import APIRouter, UploadFile, File, HTTPException
+from fastapi import APIRouter, UploadFile, File, Form, HTTPException
 from fastapi.responses import FileResponse
 
-from services.converter import convert_to_pdf, is_supported
-from utils.file_cleanup import create_job_dir
+from services.converter import (
+    CONVERTER_VERSION, IMAGE_MAX_DPI, count_parts, convert_part, join_parts, is_image, is_supported,
+)
+from services.merger import StreamingMerger
+from utils.executor import MAX_WORKERS, iter_in_pool, run_in_pool
+from utils.job_store import Job, job_store
+from utils.metrics import file_type, measured, metrics
+from utils.result_cache import make_key, result_cache
+from utils.uploads import SavedUpload, UploadRoute, safe_filename, save_upload
+from utils.zip_stream import file_entries, zip_response, write_zip
 
-router = APIRouter(prefix="/api", tags=["convert"])
+router = APIRouter(prefix="/api", tags=["convert"], route_class=UploadRoute)
 
-MAX_FILE_SIZE = 50 * 1024 * 1024  # 50MB
+ERROR_MODES = {"fail", "report"}
 
 
 @router.post("/convert")
-async def convert_files(files: list[UploadFile] = File(...)):
-    """Convert uploaded files to PDF. Returns a single PDF or ZIP of PDFs."""
+async def convert_files(
+    files: list[UploadFile] = File(...),
+    on_error: str = Form(default="fail"),  # "fail" aborts the batch, "report" lists failures in manifest.json
+    combine: bool = Form(default=False),  # images only: one multi-page PDF instead of a ZIP
+):
+    """Convert uploaded files to PDF. Returns a single PDF or ZIP of PDFs.
+
+    Files in a batch are converted in parallel; output order always follows
+    upload order.
+    """
+    job = job_store.create()
+    items = await _save_inputs(job, files, on_error, combine)
+
+    if combine and len(items) > 1:
+        combined = await _combine(job, items)
+        return FileResponse(combined, media_type="application/pdf", filename=combined.name)
+
+    # Report mode: stream each PDF as soon as it and the ones before it are
+    # converted, then finish the archive with the manifest.
+    if on_error == "report" and len(items) > 1:
+        return zip_response(_report_entries(job, items), "converted.zip", "convert")
+
+    # Fail mode: every file must convert before any bytes are sent
+    converted = await convert_all(job, items)
+
+    # Single file — return directly
+    if len(converted) == 1:
+        return FileResponse(
+            converted[0],
+            media_type="application/pdf",
+            filename=converted[0].name,
+        )
+
+    # Multiple files — stream as ZIP
+    return zip_response(file_entries(converted), "converted.zip", "convert")
+
+
+@router.post("/jobs/convert", status_code=202)
+async def submit_convert_job(
+    files: list[UploadFile] = File(...),
+    on_error: str = Form(default="fail"),
+    combine: bool = Form(default=False),
+):
+    """Same as /convert, but runs in the background. Poll /jobs/{job_id} for progress."""
+    job = job_store.create()
+    items = await _save_inputs(job, files, on_error, combine)
+    job_store.submit(job, _run_job(job, items, on_error, combine))
+    return job.to_dict()
+
+
+async def _save_inputs(job: Job, files: list[UploadFile], on_error: str, combine: bool = False) -> list[tuple]:
+    """Validate and store uploads. Returns (filename, input path, output path, cache key) per file."""
     if not files:
         raise HTTPException(400, "No files uploaded")
-
-    job_dir = create_job_dir()
-    input_dir = job_dir / "input"
-    output_dir = job_dir / "output"
+    if on_error not in ERROR_MODES:
+        raise HTTPException(400, f"Invalid on_error: {on_error}")
+    if combine:
+        if on_error != "fail":
+            raise HTTPException(400, "combine requires on_error=fail")
+        not_images = [f.filename for f in files if not is_image(f.filename)]
+        if not_images:
+            raise HTTPException(400, f"combine only accepts images: {not_images[0]}")
+
+    input_dir = job.dir / "input"
+    output_dir = job.dir / "output"
     input_dir.mkdir()
     output_dir.mkdir()
 
-    converted = []
+    items = []
+    used_names = set()
 
-    for f in files:
+    for i, f in enumerate(files):
         if not is_supported(f.filename):
             raise HTTPException(400, f"Unsupported file type: {f.filename}")
 
-        # Read and check size
-        content = await f.read()
-        if len(content) > MAX_FILE_SIZE:
-            raise HTTPException(400, f"File too large: {f.filename} (max 50MB)")
+        name = safe_filename(f.filename)
+        with metrics.stage("convert", "upload", file_type(name)):
+            saved = await save_upload(f, input_dir / f"{i}_{name}")
+        metrics.bytes_in.inc(saved.size, "convert", file_type(name))
 
-        input_path = input_dir / f.filename
-        input_path.write_bytes(content)
+        output_path = output_dir / unique_pdf_name(Path(name).stem, used_names)
+        items.append(conversion_item(f.filename, saved, output_path))
 
-        stem = Path(f.filename).stem
-        output_path = output_dir / f"{stem}.pdf"
+    job.total = len(items)
+    return items
 
-        try:
-            convert_to_pdf(input_path, output_path)
-            converted.append(output_path)
-        except Exception as e:
-            raise HTTPException(500, f"Failed to convert {f.filename}: {str(e)}")
 
-    # Single file — return directly
-    if len(converted) == 1:
-        return FileResponse(
-            converted[0],
-            media_type="application/pdf",
-            filename=converted[0].name,
-        )
+def conversion_item(filename: str, saved: SavedUpload, output_path: Path) -> tuple:
+    """The (filename, input path, output path, cache key) tuple that conversions work on."""
+    params = {"ext": saved.path.suffix.lower(), "image_max_dpi": IMAGE_MAX_DPI}
+    key = make_key("convert", CONVERTER_VERSION, [saved.sha256], params)
+    return filename, saved.path, output_path, key
+
+
+async def _run_job(job: Job, items: list[tuple], on_error: str, combine: bool = False):
+    if combine and len(items) > 1:
+        job.set_result(await _combine(job, items))
+        return
+    if on_error == "report" and len(items) > 1:
+        job.set_result(await write_zip(_report_entries(job, items), job.dir / "converted.zip", "convert"))
+        return
 
-    # Multiple files — return as ZIP
-    zip_path = job_dir / "converted.zip"
-    with zipfile.ZipFile(zip_path, "w") as zf:
-        for pdf in converted:
-            zf.write(pdf, pdf.name)
-
-    return FileResponse(
-        zip_path,
-        media_type="application/zip",
-        filename="converted.zip",
-    )
+    converted = await convert_all(job, items)
+    if len(converted) == 1:
+        job.set_result(converted[0])
+    else:
+        job.set_result(await write_zip(file_entries(converted), job.dir / "converted.zip", "convert"))
+
+
+async def _iter_conversions(job: Job, items: list[tuple]):
+    """Yield (item, error or None) in upload order as conversions finish.
+
+    Cached results are linked straight into output/; only misses go to the
+    process pool. Files with several independent parts (workbook sheets,
+    runs of slides) are rendered a part per worker and joined once all
+    parts are done.
+    """
+    output_dir = job.dir / "output"
+    cached = [await result_cache.get(key, output_dir, [output_path.name]) is not None
+              for _, _, output_path, key in items]
+    misses = [item for item, hit in zip(items, cached) if not hit]
+    # No more parts than workers: every presentation part re-opens the whole deck
+    part_counts = await asyncio.to_thread(lambda: [count_parts(item[1], MAX_WORKERS) for item in misses])
+
+    args = []
+    for (_, input_path, output_path, _), count in zip(misses, part_counts):
+        if count == 1:
+            args.append((convert_part, input_path, output_path, None))
+            continue
+        parts_dir = job.dir / "parts"
+        parts_dir.mkdir(exist_ok=True)
+        args.extend((convert_part, input_path, parts_dir / f"{output_path.stem}_{i}.pdf", i, count)
+                    for i in range(count))
+
+    counts = iter(part_counts)
+    async with aclosing(iter_in_pool(measured, args, return_exceptions=True)) as results:
+        for item, hit in zip(items, cached):
+            error = None
+            if not hit:
+                kind = file_type(item[0])
+                parts = [await anext(results) for _ in range(next(counts))]
+                error = next((p for p in parts if isinstance(p, Exception)), None)
+                if error is None:
+                    metrics.observe("convert", "convert", kind, sum(seconds for _, seconds in parts))
+                if error is None and len(parts) > 1:
+                    try:
+                        _, seconds = await run_in_pool(measured, join_parts, [path for path, _ in parts], item[2])
+                        metrics.observe("convert", "join", kind, seconds)
+                    except Exception as e:
+                        error = e
+                if error is None:
+                    metrics.bytes_out.inc(item[2].stat().st_size, "convert", kind)
+                    await result_cache.put(item[3], [item[2]])
+            job.advance()
+            yield item, error
+
+
+async def convert_all(job: Job, items: list[tuple]) -> list[Path]:
+    """Convert every file, failing on the first error in upload order."""
+    converted = []
+    async with aclosing(_iter_conversions(job, items)) as conversions:
+        async for (filename, _, output_path, _), error in conversions:
+            _raise_conversion_error(filename, error)
+            converted.append(output_path)
+    return converted
+
+
+def _raise_conversion_error(filename: str, error: Exception | None):
+    if isinstance(error, HTTPException):
+        raise error
+    if error:
+        raise HTTPException(500, f"Failed to convert {filename}: {str(error)}")
+
+
+async def _combine(job: Job, items: list[tuple]) -> Path:
+    """Convert every image and append its pages to one PDF, in upload order.
+
+    Images are still converted in parallel (and cached) one per worker. Each
+    finished page is copied into the shared output as soon as the ones
+    before it are in, then its single-image PDF is deleted, so neither
+    memory nor scratch space grows with the number of images.
+    """
+    output_path = job.dir / "combined.pdf"
+    with open(output_path, "wb") as f:
+        merger = StreamingMerger(f)
+        async with aclosing(_iter_conversions(job, items)) as conversions:
+            async for (filename, _, pdf_path, _), error in conversions:
+                _raise_conversion_error(filename, error)
+                with metrics.stage("convert", "combine", file_type(filename)):
+                    await asyncio.to_thread(merger.add_file, pdf_path)
+                pdf_path.unlink()
+        await asyncio.to_thread(merger.finish)
+    return output_path
+
+
+async def _report_entries(job: Job, items: list[tuple]):
+    manifest = []
+    async for (filename, _, output_path, _), error in _iter_conversions(job, items):
+        if error:
+            detail = error.detail if isinstance(error, HTTPException) else str(error)
+            manifest.append({"filename": filename, "status": "error", "error": detail})
+            continue
+        manifest.append({"filename": filename, "status": "ok", "output": output_path.name})
+        yield output_path.name, output_path
+
+    yield "manifest.json", json.dumps({"files": manifest}, indent=2).encode()
+
+
+def unique_pdf_name(stem: str, used: set[str]) -> str:
+    """Return `<stem>.pdf`, suffixed with a counter if another file in the batch took it."""
+    name = f"{stem}.pdf"
+    n = 2
+    while name in used:
+        name = f"{stem}_{n}.pdf"
+        n += 1
+    used.add(name)
+    return name
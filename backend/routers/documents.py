@@ -0,0 +1,126 @@
+import tempfile
+from pathlib import Path
+
+from fastapi import APIRouter, UploadFile, File, Form, HTTPException
+from fastapi.responses import FileResponse
+
+from routers.split import parse_split_request, split_in_pool, split_response
+from services.splitter import SPLITTER_VERSION, get_pdf_info, split_by_mode, extract_pages
+from utils import admission
+from utils.document_sessions import DOCUMENT_FILE, Document, document_sessions
+from utils.job_store import job_store
+from utils.result_cache import make_key, result_cache
+from utils.uploads import UploadRoute, save_upload
+
+router = APIRouter(prefix="/api", tags=["documents"], route_class=UploadRoute)
+
+
+@router.post("/documents", status_code=201)
+async def create_document(file: UploadFile = File(...)):
+    """Upload a PDF once and get a handle for info, split and extract calls.
+
+    Returns the handle along with the same info as /split/info.
+    """
+    if not file.filename.lower().endswith(".pdf"):
+        raise HTTPException(400, "Only PDF files are accepted")
+
+    job = job_store.create()
+    saved = await save_upload(file, job.dir / DOCUMENT_FILE)
+    doc = await document_sessions.add(job, saved.filename, saved.size, saved.sha256)
+
+    info = await _run(doc, "Failed to read PDF", get_pdf_info)
+    return {"document_id": doc.id, "filename": doc.filename, **info}
+
+
+@router.get("/documents/{document_id}")
+async def document_info(document_id: str):
+    """Page count and metadata for an uploaded document."""
+    doc = await _get_document(document_id)
+    info = await _run(doc, "Failed to read PDF", get_pdf_info)
+    return {"document_id": doc.id, "filename": doc.filename, **info}
+
+
+@router.post("/documents/{document_id}/split")
+async def split_document(
+    document_id: str,
+    mode: str = Form(...),  # same modes and fields as /split
+    pages: str = Form(default=""),
+    start: int = Form(default=1),
+    end: int = Form(default=1),
+    chunk_size: int = Form(default=0),
+    strip_unused: bool = Form(default=False),
+):
+    """Split an uploaded document. Same modes and response as /split.
+
+    A range is cut from the cached reader. Modes with several outputs go
+    through /split's process pool and streamed ZIP, reading the stored file.
+    """
+    doc = await _get_document(document_id)
+    params = parse_split_request(mode, pages, start, end, chunk_size, strip_unused)
+
+    # Shares cache entries with /split for the same file and parameters
+    key = make_key("split", SPLITTER_VERSION, [doc.sha256], params)
+    if mode != "range":
+        document_sessions.use(doc)
+        job = job_store.create()
+        (job.dir / "output").mkdir()
+        return await split_in_pool(job, doc.path, key, params)
+
+    output_dir = _output_dir(doc, "split_")
+    result_files = await result_cache.get(key, output_dir)
+    if result_files is None:
+        result_files = await _run(doc, "Failed to split PDF", split_by_mode, output_dir, params)
+        await result_cache.put(key, result_files)
+
+    return split_response(result_files)
+
+
+@router.post("/documents/{document_id}/extract")
+async def extract_document_pages(
+    document_id: str,
+    pages: str = Form(...),  # comma-separated page numbers, in output order
+):
+    """Copy the given pages of an uploaded document into a single PDF."""
+    doc = await _get_document(document_id)
+    try:
+        page_list = [int(p.strip()) for p in pages.split(",") if p.strip()]
+    except ValueError as e:
+        raise HTTPException(400, str(e))
+    if not page_list:
+        raise HTTPException(400, "No pages specified")
+
+    output_path = _output_dir(doc, "extract_") / "extracted.pdf"
+    key = make_key("extract", SPLITTER_VERSION, [doc.sha256], {"pages": page_list})
+    if await result_cache.get(key, output_path.parent, [output_path.name]) is None:
+        await _run(doc, "Failed to extract pages", extract_pages, output_path, page_list)
+        await result_cache.put(key, [output_path])
+
+    return FileResponse(
+        output_path,
+        media_type="application/pdf",
+        filename=output_path.name,
+    )
+
+
+async def _get_document(document_id: str) -> Document:
+    doc = await document_sessions.get(document_id)
+    if doc is None:
+        raise HTTPException(404, "Document not found or expired")
+    admission.charge(doc.filename, doc.size)  # the work is on the stored document, not the request body
+    return doc
+
+
+def _output_dir(doc: Document, prefix: str) -> Path:
+    """A fresh directory per operation, so concurrent calls on one document don't collide."""
+    return Path(tempfile.mkdtemp(prefix=prefix, dir=doc.job.dir))
+
+
+async def _run(doc: Document, failure: str, func, *args):
+    try:
+        return await document_sessions.run(doc, func, *args)
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(400, str(e))
+    except Exception as e:
+        raise HTTPException(500, f"{failure}: {str(e)}")
@@ -0,0 +1,31 @@
+from fastapi import APIRouter, HTTPException
+
+from utils.job_store import job_store
+
+router = APIRouter(prefix="/api", tags=["jobs"])
+
+# Jobs are submitted through /api/jobs/convert, /api/jobs/split and
+# /api/jobs/merge, defined next to their synchronous counterparts.
+
+
+@router.get("/jobs/{job_id}")
+async def job_status(job_id: str):
+    """Status and progress of a background job."""
+    job = await job_store.find(job_id)
+    if job is None:
+        raise HTTPException(404, "Job not found or expired")
+    return job.to_dict()
+
+
+@router.get("/jobs/{job_id}/result")
+async def job_result(job_id: str):
+    """Download the result of a finished job."""
+    job = await job_store.find(job_id)
+    if job is None:
+        raise HTTPException(404, "Job not found or expired")
+    if job.status == "failed":
+        raise HTTPException(409, f"Job failed: {job.error}")
+    if job.status != "done":
+        raise HTTPException(409, "Job is not finished yet")
+
+    return job_store.result_response(job)
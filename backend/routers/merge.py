@@ -1,59 +1,122 @@
+import json
 from pathlib import Path
 
 from fastapi import APIRouter, UploadFile, File, Form, HTTPException
 from fastapi.responses import FileResponse
 
-from services.merger import merge_pdfs
-from utils.file_cleanup import create_job_dir
+from services.merger import MERGER_VERSION, merge_pdfs, merge_pdfs_low_memory
+from utils.executor import run_in_pool
+from utils.job_store import Job, job_store
+from utils.metrics import measured, metrics
+from utils.result_cache import make_key, result_cache
+from utils.uploads import SavedUpload, UploadRoute, safe_filename, save_upload
 
-router = APIRouter(prefix="/api", tags=["merge"])
-
-MAX_FILE_SIZE = 50 * 1024 * 1024
+router = APIRouter(prefix="/api", tags=["merge"], route_class=UploadRoute)
 
 
 @router.post("/merge")
 async def merge(
     files: list[UploadFile] = File(...),
     order: str = Form(default=""),  # comma-separated indices for custom ordering
+    low_memory: bool = Form(default=False),  # stream to disk and share identical fonts/images
 ):
     """Merge multiple PDFs into one. Optional `order` param for custom ordering."""
+    job = job_store.create()
+    saved = await _save_inputs(job, files, order)
+    output_path = await _merge(job, saved, low_memory)
+
+    headers = {}
+    if job.stats:
+        headers["X-Merge-Bytes-Saved"] = str(job.stats["bytes_saved"])
+        if job.stats.get("peak_memory_bytes") is not None:
+            headers["X-Merge-Peak-Memory"] = str(job.stats["peak_memory_bytes"])
+    return FileResponse(
+        output_path,
+        media_type="application/pdf",
+        filename="merged.pdf",
+        headers=headers,
+    )
+
+
+@router.post("/jobs/merge", status_code=202)
+async def submit_merge_job(
+    files: list[UploadFile] = File(...),
+    order: str = Form(default=""),
+    low_memory: bool = Form(default=False),
+):
+    """Same as /merge, but runs in the background. Poll /jobs/{job_id} for progress."""
+    job = job_store.create()
+    saved = await _save_inputs(job, files, order)
+    job_store.submit(job, _run_job(job, saved, low_memory))
+    return job.to_dict()
+
+
+async def _save_inputs(job: Job, files: list[UploadFile], order: str) -> list[SavedUpload]:
+    """Validate and store uploads, returned in merge order."""
     if len(files) < 2:
         raise HTTPException(400, "At least 2 PDF files are required")
 
-    job_dir = create_job_dir()
-    input_dir = job_dir / "input"
+    input_dir = job.dir / "input"
     input_dir.mkdir()
 
-    saved_paths = []
+    saved = []
     for f in files:
         if not f.filename.lower().endswith(".pdf"):
             raise HTTPException(400, f"Only PDF files accepted, got: {f.filename}")
 
-        content = await f.read()
-        if len(content) > MAX_FILE_SIZE:
-            raise HTTPException(400, f"File too large: {f.filename} (max 50MB)")
-
-        path = input_dir / f"{len(saved_paths)}_{f.filename}"
-        path.write_bytes(content)
-        saved_paths.append(path)
+        with metrics.stage("merge", "upload", "pdf"):
+            saved.append(await save_upload(f, input_dir / f"{len(saved)}_{safe_filename(f.filename)}"))
+        metrics.bytes_in.inc(saved[-1].size, "merge", "pdf")
 
     # Apply custom ordering if provided
     if order.strip():
         try:
             indices = [int(i.strip()) for i in order.split(",")]
-            saved_paths = [saved_paths[i] for i in indices]
+            saved = [saved[i] for i in indices]
         except (IndexError, ValueError):
             raise HTTPException(400, "Invalid order parameter")
 
-    output_path = job_dir / "merged.pdf"
+    job.total = len(saved)
+    return saved
+
+
+async def _merge(job: Job, saved: list[SavedUpload], low_memory: bool) -> Path:
+    """Merge into job.dir/merged.pdf. Low-memory merges also record their stats on the job."""
+    output_path = job.dir / "merged.pdf"
+    stats_path = job.dir / "merge_stats.json"
+    inputs = [s.path for s in saved]
+
+    if not low_memory:
+        key = make_key("merge", MERGER_VERSION, [s.sha256 for s in saved], {})
+        if await result_cache.get(key, job.dir, [output_path.name]) is None:
+            await _run_merge(merge_pdfs, inputs, output_path)
+            await result_cache.put(key, [output_path])
+    else:
+        # Stats are cached next to the PDF so repeat requests still report them,
+        # except peak memory: a cache hit runs no merge to measure
+        key = make_key("merge", MERGER_VERSION, [s.sha256 for s in saved], {"low_memory": True})
+        if await result_cache.get(key, job.dir, [output_path.name, stats_path.name]) is None:
+            job.stats = await _run_merge(merge_pdfs_low_memory, inputs, output_path)
+            stats_path.write_text(json.dumps({k: v for k, v in job.stats.items() if k != "peak_memory_bytes"}))
+            await result_cache.put(key, [output_path, stats_path])
+        else:
+            job.stats = json.loads(stats_path.read_text())
+
+    job.advance(len(saved))
+    return output_path
+
 
+async def _run_merge(func, inputs: list[Path], output_path: Path):
     try:
-        merge_pdfs(saved_paths, output_path)
+        result, seconds = await run_in_pool(measured, func, inputs, output_path)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(500, f"Failed to merge PDFs: {str(e)}")
+    metrics.observe("merge", "merge", "pdf", seconds)
+    metrics.bytes_out.inc(output_path.stat().st_size, "merge", "pdf")
+    return result
 
-    return FileResponse(
-        output_path,
-        media_type="application/pdf",
-        filename="merged.pdf",
-    )
+
+async def _run_job(job: Job, saved: list[SavedUpload], low_memory: bool):
+    job.set_result(await _merge(job, saved, low_memory))
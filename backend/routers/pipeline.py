@@ -0,0 +1,174 @@
+import json
+import time
+from pathlib import Path
+
+from fastapi import APIRouter, UploadFile, File, Form, HTTPException
+from fastapi.responses import FileResponse, Response
+
+from routers.convert import conversion_item, convert_all, unique_pdf_name
+from routers.split import parse_split_request
+from services.converter import is_supported
+from services.pipeline import PDF_STEPS, run_pdf_steps
+from utils.executor import run_in_pool
+from utils.job_store import Job, job_store
+from utils.metrics import file_type, measured, metrics
+from utils.uploads import UploadRoute, safe_filename, save_upload
+from utils.zip_stream import attachment, zip_response
+
+router = APIRouter(prefix="/api", tags=["pipeline"], route_class=UploadRoute)
+
+MAX_STEPS = 16
+
+
+@router.post("/pipeline")
+async def run_pipeline(
+    files: list[UploadFile] = File(...),
+    steps: str = Form(...),  # JSON list of operations, run in order (see parse_steps)
+):
+    """Run convert, merge and split steps in order in one request.
+
+    Files are converted as by /convert (PDF uploads pass through unchanged);
+    merge and split steps then run together in one worker, handing PDFs from
+    step to step in memory. Returns a single PDF or a ZIP of PDFs, with the
+    time of each step in a Server-Timing header.
+    """
+    steps = parse_steps(steps)
+    convert = steps[0]["op"] == "convert"
+    pdf_steps = steps[1:] if convert else steps
+    timings = []
+
+    started = time.perf_counter()
+    job = job_store.create()
+    docs, items = await _save_inputs(job, files, convert)
+    timings.append(("upload", None, time.perf_counter() - started))
+
+    if convert:
+        started = time.perf_counter()
+        await convert_all(job, items)
+        timings.append(("convert", 1, time.perf_counter() - started))
+
+    if pdf_steps:
+        try:
+            (docs, seconds), _ = await run_in_pool(measured, run_pdf_steps, docs, pdf_steps)
+        except HTTPException:
+            raise
+        except ValueError as e:
+            raise HTTPException(400, str(e))
+        except Exception as e:
+            raise HTTPException(500, f"Pipeline failed: {str(e)}")
+        first = len(steps) - len(pdf_steps) + 1
+        for n, (step, step_seconds) in enumerate(zip(pdf_steps, seconds), first):
+            metrics.observe("pipeline", step["op"], "pdf", step_seconds)
+            timings.append((step["op"], n, step_seconds))
+        metrics.bytes_out.inc(sum(len(data) for _, data in docs), "pipeline", "pdf")
+
+    response = _response(docs)
+    response.headers["Server-Timing"] = _server_timing(timings)
+    return response
+
+
+def parse_steps(raw: str) -> list[dict]:
+    """Validate the `steps` form field into the step dicts run_pdf_steps() takes.
+
+    A step is {"op": "convert"} (first step only), {"op": "merge"} with an
+    optional "order" list of document indices, or {"op": "split"} with the
+    same fields as the /split form.
+    """
+    try:
+        steps = json.loads(raw)
+    except ValueError:
+        raise HTTPException(400, "steps must be a JSON list of operations")
+    if not isinstance(steps, list) or not steps:
+        raise HTTPException(400, "steps must be a non-empty JSON list of operations")
+    if len(steps) > MAX_STEPS:
+        raise HTTPException(400, f"At most {MAX_STEPS} steps are allowed")
+
+    parsed = []
+    for n, step in enumerate(steps, 1):
+        op = step.get("op") if isinstance(step, dict) else None
+        if op == "convert":
+            if n != 1:
+                raise HTTPException(400, "convert must be the first step")
+            parsed.append({"op": "convert"})
+        elif op == "merge":
+            order = step.get("order")
+            if order is not None and (not isinstance(order, list) or not all(type(i) is int for i in order)):
+                raise HTTPException(400, f"Step {n}: order must be a list of document indices")
+            parsed.append({"op": "merge", "order": order})
+        elif op == "split":
+            parsed.append({"op": op, "params": _split_params(n, step)})
+        else:
+            raise HTTPException(400, f"Step {n}: op must be one of convert, {', '.join(PDF_STEPS)}")
+    return parsed
+
+
+def _split_params(n: int, step: dict) -> dict:
+    pages = step.get("pages", "")
+    if isinstance(pages, list):
+        pages = ",".join(str(p) for p in pages)
+    try:
+        start, end, chunk_size = (int(step.get(k, default)) for k, default in (("start", 1), ("end", 1), ("chunk_size", 0)))
+    except (TypeError, ValueError):
+        raise HTTPException(400, f"Step {n}: start, end and chunk_size must be integers")
+    try:
+        return parse_split_request(
+            str(step.get("mode", "")), str(pages), start, end, chunk_size, bool(step.get("strip_unused", False)),
+        )
+    except HTTPException as e:
+        raise HTTPException(400, f"Step {n}: {e.detail}")
+
+
+async def _save_inputs(job: Job, files: list[UploadFile], convert: bool) -> tuple[list[tuple[str, Path]], list[tuple]]:
+    """Store uploads. Returns the pipeline's input PDFs as (name, path), and the conversions that produce some of them."""
+    input_dir = job.dir / "input"
+    output_dir = job.dir / "output"
+    input_dir.mkdir()
+    output_dir.mkdir()
+
+    docs = []
+    items = []
+    used_names = set()
+    for i, f in enumerate(files):
+        name = safe_filename(f.filename)
+        is_pdf = name.lower().endswith(".pdf")
+        if not is_pdf and not convert:
+            raise HTTPException(400, f"Only PDF files accepted without a convert step, got: {f.filename}")
+        if not is_pdf and not is_supported(name):
+            raise HTTPException(400, f"Unsupported file type: {f.filename}")
+
+        with metrics.stage("pipeline", "upload", file_type(name)):
+            saved = await save_upload(f, input_dir / f"{i}_{name}")
+        metrics.bytes_in.inc(saved.size, "pipeline", file_type(name))
+
+        pdf_name = unique_pdf_name(Path(name).stem, used_names)
+        if is_pdf:
+            docs.append((pdf_name, saved.path))
+        else:
+            items.append(conversion_item(f.filename, saved, output_dir / pdf_name))
+            docs.append((pdf_name, output_dir / pdf_name))
+
+    job.total = len(items)
+    return docs, items
+
+
+def _response(docs: list[tuple[str, Path | bytes]]) -> Response:
+    if len(docs) == 1:
+        name, source = docs[0]
+        if isinstance(source, bytes):
+            return Response(source, media_type="application/pdf", headers=attachment(name))
+        return FileResponse(source, media_type="application/pdf", filename=name)
+    return zip_response(_entries(docs), "pipeline.zip", "pipeline")
+
+
+async def _entries(docs: list[tuple[str, Path | bytes]]):
+    for name, source in docs:
+        yield name, source
+
+
+def _server_timing(timings: list[tuple[str, int | None, float]]) -> str:
+    """Server-Timing header value: one metric per step, in milliseconds."""
+    entries = []
+    for name, n, seconds in timings:
+        desc = f';desc="step {n}"' if n is not None else ""
+        entries.append(f"{name}{desc};dur={seconds * 1000:.1f}")
+    return ", ".join(entries)
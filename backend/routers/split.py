@@ -1,16 +1,24 @@
-import zipfile
-import json
+from contextlib import aclosing
 from pathlib import Path
 
 from fastapi import APIRouter, UploadFile, File, Form, HTTPException
 from fastapi.responses import FileResponse
 
-from services.splitter import get_pdf_info, split_all_pages, split_specific_pages, split_page_range
-from utils.file_cleanup import create_job_dir
+from services.splitter import SPLITTER_VERSION, get_pdf_info, parse_page_ranges, split_by_mode, split_specific_pages
+from utils.executor import MAX_WORKERS, run_in_pool, iter_in_pool
+from utils.job_store import Job, job_store
+from utils.metrics import measured, metrics
+from utils.result_cache import make_key, result_cache
+from utils.uploads import UploadRoute, safe_filename, save_upload
+from utils.zip_stream import file_entries, zip_response, write_zip
 
-router = APIRouter(prefix="/api", tags=["split"])
+router = APIRouter(prefix="/api", tags=["split"], route_class=UploadRoute)
 
-MAX_FILE_SIZE = 50 * 1024 * 1024
+# Each worker job re-parses the PDF, so shards are page ranges sized to give
+# every worker a few of them — enough to keep the pool busy and the ZIP
+# streaming, few enough that parsing doesn't dominate on large documents.
+SHARD_PAGES = 20  # minimum pages per worker job
+SHARDS_PER_WORKER = 4
 
 
 @router.post("/split/info")
@@ -19,17 +27,14 @@ async def pdf_info(file: UploadFile = File(...)):
     if not file.filename.lower().endswith(".pdf"):
         raise HTTPException(400, "Only PDF files are accepted")
 
-    content = await file.read()
-    if len(content) > MAX_FILE_SIZE:
-        raise HTTPException(400, "File too large (max 50MB)")
-
-    job_dir = create_job_dir()
-    input_path = job_dir / file.filename
-    input_path.write_bytes(content)
+    job = job_store.create()
+    input_path = (await save_upload(file, job.dir / safe_filename(file.filename))).path
 
     try:
-        info = get_pdf_info(input_path)
+        info = await run_in_pool(get_pdf_info, input_path)
         return info
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(500, f"Failed to read PDF: {str(e)}")
 
@@ -37,49 +42,190 @@ async def pdf_info(file: UploadFile = File(...)):
 @router.post("/split")
 async def split_pdf(
     file: UploadFile = File(...),
-    mode: str = Form(...),          # "all", "specific", "range"
-    pages: str = Form(default=""),  # comma-separated page numbers for "specific"
-    start: int = Form(default=1),   # start page for "range"
-    end: int = Form(default=1),     # end page for "range"
+    mode: str = Form(...),              # "all", "specific", "range", "ranges", "chunks", "bookmarks"
+    pages: str = Form(default=""),      # "specific": "1, 3, 5"; "ranges": "1-3,7,10-40"
+    start: int = Form(default=1),       # start page for "range"
+    end: int = Form(default=1),         # end page for "range"
+    chunk_size: int = Form(default=0),  # pages per file for "chunks"
+    strip_unused: bool = Form(default=False),  # drop fonts/images each output doesn't use
 ):
     """Split a PDF according to the specified mode."""
-    if not file.filename.lower().endswith(".pdf"):
-        raise HTTPException(400, "Only PDF files are accepted")
+    job = job_store.create()
+    params = parse_split_request(mode, pages, start, end, chunk_size, strip_unused)
+    input_path, key = await _save_input(job, file, params)
+    return await split_in_pool(job, input_path, key, params)
+
+
+@router.post("/jobs/split", status_code=202)
+async def submit_split_job(
+    file: UploadFile = File(...),
+    mode: str = Form(...),
+    pages: str = Form(default=""),
+    start: int = Form(default=1),
+    end: int = Form(default=1),
+    chunk_size: int = Form(default=0),
+    strip_unused: bool = Form(default=False),
+):
+    """Same as /split, but runs in the background. Poll /jobs/{job_id} for progress."""
+    job = job_store.create()
+    params = parse_split_request(mode, pages, start, end, chunk_size, strip_unused)
+    input_path, key = await _save_input(job, file, params)
+    job_store.submit(job, _run_job(job, input_path, key, params))
+    return job.to_dict()
 
-    content = await file.read()
-    if len(content) > MAX_FILE_SIZE:
-        raise HTTPException(400, "File too large (max 50MB)")
 
-    job_dir = create_job_dir()
-    output_dir = job_dir / "output"
-    output_dir.mkdir()
+async def _save_input(job: Job, file: UploadFile, params: dict) -> tuple[Path, str]:
+    """Store the upload for a validated request. Returns (input path, cache key)."""
+    if not file.filename.lower().endswith(".pdf"):
+        raise HTTPException(400, "Only PDF files are accepted")
 
-    input_path = job_dir / file.filename
-    input_path.write_bytes(content)
+    (job.dir / "output").mkdir()
+    with metrics.stage("split", "upload", "pdf"):
+        saved = await save_upload(file, job.dir / safe_filename(file.filename))
+    metrics.bytes_in.inc(saved.size, "split", "pdf")
+
+    key = make_key("split", SPLITTER_VERSION, [saved.sha256], params)
+    return saved.path, key
+
+
+async def split_in_pool(job: Job, input_path: Path, key: str, params: dict):
+    """Split `input_path` in the process pool into job.dir/output and return the response.
+
+    `key` is the request's result cache key.
+    """
+    result_files, shards = await _split(job, input_path, key, params)
+    if result_files is not None:
+        return split_response(result_files)
+
+    # Multiple results — stream each shard into the ZIP as it lands
+    return zip_response(_split_entries(job, input_path, shards, params["strip_unused"], key), "split.zip", "split")
+
+
+def parse_split_request(
+    mode: str, pages: str, start: int, end: int, chunk_size: int, strip_unused: bool = False,
+) -> dict:
+    """Validate split form fields into the params dict that split_by_mode() takes.
+
+    The same dict is part of the result cache key, so it only holds what
+    the chosen mode uses.
+    """
+    return {**_mode_params(mode, pages, start, end, chunk_size), "strip_unused": strip_unused}
+
+
+def _mode_params(mode: str, pages: str, start: int, end: int, chunk_size: int) -> dict:
+    if mode == "all" or mode == "bookmarks":
+        return {"mode": mode}
+    if mode == "range":
+        return {"mode": mode, "start": start, "end": end}
+    if mode == "chunks":
+        if chunk_size < 1:
+            raise HTTPException(400, "chunk_size must be at least 1")
+        return {"mode": mode, "chunk_size": chunk_size}
+    if mode == "ranges":
+        try:
+            return {"mode": mode, "ranges": parse_page_ranges(pages)}
+        except ValueError as e:
+            raise HTTPException(400, str(e))
+    if mode == "specific":
+        try:
+            page_list = list(dict.fromkeys(int(p.strip()) for p in pages.split(",") if p.strip()))
+        except ValueError as e:
+            raise HTTPException(400, str(e))
+        if not page_list:
+            raise HTTPException(400, "No pages specified")
+        return {"mode": mode, "pages": page_list}
+    raise HTTPException(400, f"Invalid mode: {mode}")
+
+
+async def _split(job: Job, input_path: Path, key: str, params: dict) -> tuple[list[Path] | None, list[list[int]]]:
+    """Do the part of a split that must finish before any bytes are sent.
+
+    Returns (result files, []) when the result is already complete — a cache
+    hit, a single-pass mode or a single page — or (None, shards) when pages
+    of "all"/"specific" still have to be split shard by shard.
+    """
+    mode = params["mode"]
+    output_dir = job.dir / "output"
+
+    # Repeat requests are answered from the result cache without parsing the PDF
+    cached = await result_cache.get(key, output_dir)
+    if cached is not None:
+        job.total = len(cached)
+        job.advance(len(cached))
+        return cached, []
 
     try:
+        # Range-based modes write every output from one parse in one worker
+        if mode not in ("all", "specific"):
+            job.total = 1
+            result_files = await _run_split(split_by_mode, input_path, output_dir, params)
+            await result_cache.put(key, result_files)
+            job.advance()
+            return result_files, []
+
+        info, seconds = await run_in_pool(measured, get_pdf_info, input_path)
+        metrics.observe("split", "inspect", "pdf", seconds)
+        total = info["page_count"]
         if mode == "all":
-            result_files = split_all_pages(input_path, output_dir)
-        elif mode == "specific":
-            page_list = [int(p.strip()) for p in pages.split(",") if p.strip()]
-            if not page_list:
-                raise HTTPException(400, "No pages specified")
-            result_files = split_specific_pages(input_path, output_dir, page_list)
-        elif mode == "range":
-            result_path = split_page_range(input_path, output_dir, start, end)
-            return FileResponse(
-                result_path,
-                media_type="application/pdf",
-                filename=result_path.name,
-            )
+            page_list = list(range(1, total + 1))
         else:
-            raise HTTPException(400, f"Invalid mode: {mode}")
+            page_list = params["pages"]
+            # Validate up front — once the ZIP starts streaming we can't send a 400
+            for page_num in page_list:
+                if page_num < 1 or page_num > total:
+                    raise ValueError(f"Page {page_num} out of range (1-{total})")
+        job.total = len(page_list)
+
+        # Single result — split it here
+        if len(page_list) == 1:
+            result_files = await _run_split(
+                split_specific_pages, input_path, output_dir, page_list, params["strip_unused"],
+            )
+            await result_cache.put(key, result_files)
+            job.advance()
+            return result_files, []
 
+    except HTTPException:
+        raise
     except ValueError as e:
         raise HTTPException(400, str(e))
     except Exception as e:
         raise HTTPException(500, f"Failed to split PDF: {str(e)}")
 
+    return None, shard_pages(page_list)
+
+
+async def _run_split(func, *args) -> list[Path]:
+    """Run one split function in the pool, recording its time and output size."""
+    result_files, seconds = await run_in_pool(measured, func, *args)
+    _record_split(result_files, seconds)
+    return result_files
+
+
+def _record_split(result_files: list[Path], seconds: float):
+    metrics.observe("split", "split", "pdf", seconds)
+    metrics.bytes_out.inc(sum(p.stat().st_size for p in result_files), "split", "pdf")
+
+
+async def _run_job(job: Job, input_path: Path, key: str, params: dict):
+    result_files, shards = await _split(job, input_path, key, params)
+    if result_files is None:
+        entries = _split_entries(job, input_path, shards, params["strip_unused"], key)
+        job.set_result(await write_zip(entries, job.dir / "split.zip", "split"))
+    elif len(result_files) == 1:
+        job.set_result(result_files[0])
+    else:
+        job.set_result(await write_zip(file_entries(result_files), job.dir / "split.zip", "split"))
+
+
+def shard_pages(page_list: list[int]) -> list[list[int]]:
+    """Cut a page list into consecutive shards for the process pool."""
+    size = max(SHARD_PAGES, -(-len(page_list) // (MAX_WORKERS * SHARDS_PER_WORKER)))
+    return [page_list[i:i + size] for i in range(0, len(page_list), size)]
+
+
+def split_response(result_files: list[Path]):
+    """Return split output as a single PDF or a streamed ZIP."""
     # Single result — return directly
     if len(result_files) == 1:
         return FileResponse(
@@ -89,13 +235,20 @@ async def split_pdf(
         )
 
     # Multiple results — ZIP
-    zip_path = job_dir / "split.zip"
-    with zipfile.ZipFile(zip_path, "w") as zf:
-        for pdf in result_files:
-            zf.write(pdf, pdf.name)
-
-    return FileResponse(
-        zip_path,
-        media_type="application/zip",
-        filename="split.zip",
-    )
+    return zip_response(file_entries(result_files), "split.zip", "split")
+
+
+async def _split_entries(
+    job: Job, input_path: Path, shards: list[list[int]], strip_unused: bool, cache_key: str,
+):
+    output_dir = job.dir / "output"
+    args = [(split_specific_pages, input_path, output_dir, shard, strip_unused) for shard in shards]
+    written = []
+    async with aclosing(iter_in_pool(measured, args)) as results:
+        async for result_files, seconds in results:
+            _record_split(result_files, seconds)
+            job.advance(len(result_files))
+            for pdf in result_files:
+                yield pdf.name, pdf
+            written.extend(result_files)
+    await result_cache.put(cache_key, written)
@@ -1,29 +1,154 @@
 import csv
+import functools
+import hashlib
 import io
+import os
+import zlib
+import tempfile
+import zipfile
+from itertools import islice
 from pathlib import Path
+from typing import Iterable
 
-from PIL import Image
-from reportlab.lib.pagesizes import letter, A4
-from reportlab.lib.units import inch
-from reportlab.pdfgen import canvas
-from reportlab.lib.utils import ImageReader
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.lib import colors
+from services.merger import concat_pdfs
+from services.pdf_writer import PdfStreamWriter
 
-import markdown as md
+# reportlab, Pillow, markdown and the office formats' parsers are imported by
+# the functions that use them: the API process only needs is_supported()
+# and count_parts(), and a worker loads what its first file type needs
+# (or everything at once in warm_up()).
+
+# Bump when output changes so cached results from older code are not reused
+CONVERTER_VERSION = "9"
+
+# Page sizes in points
+LETTER = (612.0, 792.0)
+A4 = (595.2755905511812, 841.8897637795277)
+
+# Tabular output (CSV, XLSX): cells too long for their column wrap, and each
+# row's height is measured so a page is filled without overflowing; column
+# groups are paged across extra pages instead of cut off, and rows are
+# rendered into part PDFs of bounded size that are concatenated at the end —
+# reportlab keeps a whole document in memory until it is saved.
+TABLE_FONT_SIZE = 8
+TABLE_LEADING = 9.6  # the line spacing reportlab assumes when it splits a cell across pages
+TABLE_ROW_HEIGHT = 14  # a row of single-line cells
+TABLE_CELL_PADDING = (12, 6)  # horizontal, vertical: reportlab's default cell padding
+TABLE_COLUMNS_PER_PAGE = 8
+TABLE_ROWS_PER_PART = 5000
+
+# Plain text: Courier on letter paper, written straight to PDF objects.
+# Courier advances 0.6 em per glyph, so line capacity is fixed up front.
+TEXT_FONT_SIZE = 10
+TEXT_LEADING = 14
+TEXT_MARGIN = 72  # 1 inch
+TEXT_READ_SIZE = 1024 * 1024  # characters read from the input at a time
+
+# Documents laid out by platypus (HTML, Markdown, DOCX) are saved every
+# STORY_PAGES_PER_PART pages; HTML and Markdown are read this many
+# characters at a time.
+STORY_PAGES_PER_PART = 50
+RICH_TEXT_READ_SIZE = 256 * 1024
+
+# Images placed at a higher resolution than this are downsampled; 0 keeps
+# every pixel. JPEGs that need no downsampling are embedded untouched.
+IMAGE_MAX_DPI = int(os.environ.get("IMAGE_MAX_DPI", 0))
+IMAGE_JPEG_QUALITY = 85  # for re-encoding downsampled JPEGs
+
+# Presentations are rendered in parts of at least PPTX_SLIDES_PER_PART
+# slides. Each part opens the whole package, so callers cap the number of
+# parts (count_parts' max_parts) at what they can run at once.
+PPTX_SLIDES_PER_PART = 10
+PPTX_MAX_PARTS = 16  # when the caller doesn't say
+SLIDE_FONT_SIZE = 18  # for text without an explicit size
+SLIDE_TITLE_FONT_SIZE = 32
 
 SUPPORTED_EXTENSIONS = {
     ".docx", ".doc", ".xlsx", ".xls", ".csv",
     ".pptx", ".ppt", ".png", ".jpg", ".jpeg",
-    ".bmp", ".tiff", ".txt", ".md", ".html",
+    ".bmp", ".tiff", ".tif", ".txt", ".md", ".html",
 }
 
 
+IMAGE_EXTENSIONS = {".png", ".jpg", ".jpeg", ".bmp", ".tiff", ".tif"}
+
+
 def is_supported(filename: str) -> bool:
     return Path(filename).suffix.lower() in SUPPORTED_EXTENSIONS
 
 
+def is_image(filename: str) -> bool:
+    return Path(filename).suffix.lower() in IMAGE_EXTENSIONS
+
+
+def count_parts(input_path: Path, max_parts: int | None = None) -> int:
+    """How many pieces convert_part() can render independently.
+
+    One per sheet for workbooks; for presentations one per
+    PPTX_SLIDES_PER_PART slides, but no more than `max_parts`; else 1.
+    """
+    ext = input_path.suffix.lower()
+    if ext in (".pptx", ".ppt"):
+        parts = -(-_count_slides(input_path) // PPTX_SLIDES_PER_PART)
+        return max(min(parts, max_parts or PPTX_MAX_PARTS), 1)
+    if ext not in (".xlsx", ".xls"):
+        return 1
+    try:
+        from openpyxl import load_workbook
+        wb = load_workbook(str(input_path), read_only=True)
+        count = len(wb.worksheets)
+        wb.close()
+        return max(count, 1)
+    except Exception:
+        return 1  # let the conversion itself report the problem
+
+
+def convert_part(input_path: Path, output_path: Path, part: int | None = None, parts: int | None = None) -> Path:
+    """Render piece `part` of `parts` (as returned by count_parts), or the whole file when it is None.
+
+    Pieces are joined in order with join_parts().
+    """
+    if part is None:
+        return convert_to_pdf(input_path, output_path)
+    if input_path.suffix.lower() in (".pptx", ".ppt"):
+        return _convert_pptx_slides(input_path, output_path, part, parts or count_parts(input_path))
+    return _convert_xlsx_sheet(input_path, output_path, part)
+
+
+def join_parts(part_paths: list[Path], output_path: Path) -> Path:
+    """Concatenate rendered pieces into the final PDF, removing them."""
+    if len(part_paths) == 1:
+        os.replace(part_paths[0], output_path)
+        return output_path
+    concat_pdfs(part_paths, output_path)
+    for path in part_paths:
+        path.unlink(missing_ok=True)
+    return output_path
+
+
+def warm_up():
+    """Import every format's libraries and build the shared styles and font metrics.
+
+    Run in each pool worker at startup with PDF_POOL_WARMUP=1, so no
+    request pays for it. Otherwise a worker loads a format's libraries
+    with its first file of that type.
+    """
+    import markdown  # noqa: F401
+    import openpyxl  # noqa: F401
+    import pptx  # noqa: F401
+    from lxml import etree  # noqa: F401
+    from PIL import Image
+    from reportlab.pdfgen.canvas import Canvas  # noqa: F401
+    from services.html_story import html_flowables
+    from services.layout import load_fonts
+
+    Image.init()  # Pillow registers its format plugins on first open otherwise
+    load_fonts()
+    list(html_flowables(["<h1>a</h1><p>a</p><table><tr><th>a</th></tr><tr><td>a</td></tr></table>"]))
+    _docx_styles()
+    _table_styles()
+
+
 def convert_to_pdf(input_path: Path, output_path: Path) -> Path:
     """Convert a file to PDF. Returns the output PDF path."""
     ext = input_path.suffix.lower()
@@ -37,6 +162,7 @@ def convert_to_pdf(input_path: Path, output_path: Path) -> Path:
         ".jpeg": _convert_image,
         ".bmp": _convert_image,
         ".tiff": _convert_image,
+        ".tif": _convert_image,
         ".docx": _convert_docx,
         ".doc": _convert_docx,
         ".xlsx": _convert_xlsx,
@@ -54,231 +180,847 @@ def convert_to_pdf(input_path: Path, output_path: Path) -> Path:
 
 
 def _convert_text(input_path: Path, output_path: Path) -> Path:
-    """Convert plain text to PDF."""
-    text = input_path.read_text(encoding="utf-8", errors="replace")
-    styles = getSampleStyleSheet()
-    style = ParagraphStyle(
-        "Body", parent=styles["Normal"], fontSize=10,
-        leading=14, fontName="Courier"
+    """Convert plain text to PDF, streaming the input and writing each page as it fills.
+
+    Bypasses platypus entirely: lines are wrapped to a fixed character
+    count, spacing is kept as is, and a form feed starts a new page.
+    """
+    page_width, page_height = LETTER
+    chars_per_line = int((page_width - 2 * TEXT_MARGIN) / (TEXT_FONT_SIZE * 0.6))
+    lines_per_page = int((page_height - 2 * TEXT_MARGIN) / TEXT_LEADING)
+    # Start one leading above the first baseline; every line is drawn with ' (next line, show)
+    page_start = (
+        f"BT /F1 {TEXT_FONT_SIZE} Tf {TEXT_LEADING} TL "
+        f"{TEXT_MARGIN:g} {page_height - TEXT_MARGIN - TEXT_FONT_SIZE + TEXT_LEADING:g} Td\n"
+    ).encode()
+    page_dict = (
+        f"<< /Type /Page /Parent {{parent}} 0 R /MediaBox [0 0 {page_width:g} {page_height:g}] "
+        f"/Resources << /Font << /F1 {{font}} 0 R >> >> /Contents {{contents}} 0 R >>"
     )
 
-    doc = SimpleDocTemplate(str(output_path), pagesize=letter)
-    story = []
-    for line in text.split("\n"):
-        line = line.replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;")
-        line = line.replace(" ", "&nbsp;") if line.strip() == "" else line
-        story.append(Paragraph(line or "&nbsp;", style))
+    with open(input_path, "r", encoding="utf-8", errors="replace") as src, open(output_path, "wb") as f:
+        writer = PdfStreamWriter(f)
+        font = writer.reserve()
+        writer.write_raw(font, b"<< /Type /Font /Subtype /Type1 /BaseFont /Courier /Encoding /WinAnsiEncoding >>")
+
+        def write_page(lines: list[bytes]):
+            data = zlib.compress(page_start + b"".join(lines) + b"ET")
+            contents, page = writer.reserve(), writer.reserve()
+            writer.write_stream(contents, f"<< /Length {len(data)} /Filter /FlateDecode >>".encode(), data)
+            writer.write_raw(page, page_dict.format(parent=writer.pages_root, font=font, contents=contents).encode())
+            writer.pages.append(page)
+
+        lines = []
+        for line in _text_lines(src, chars_per_line):
+            if line is None or len(lines) == lines_per_page:  # form feed or full page
+                write_page(lines)
+                lines = []
+                if line is None:
+                    continue
+            lines.append(b"(" + _pdf_string(line) + b") '\n")
+        if lines or not writer.pages:
+            write_page(lines)
+        writer.finish()
 
-    doc.build(story)
     return output_path
 
 
+def _text_lines(src, width: int):
+    """Yield display lines of at most `width` characters, or None for a form feed.
+
+    The input is read in TEXT_READ_SIZE blocks so a huge file, or a huge
+    single line, never has to fit in memory. Long lines break at the last
+    space in their second half, or hard at `width`.
+    """
+    pending = ""
+    while True:
+        block = src.read(TEXT_READ_SIZE)
+        text = pending + block
+        lines = text.split("\n")
+        if block:
+            pending = lines.pop()
+        elif lines[-1] == "":
+            lines.pop()  # text ends with a newline
+        if len(pending) > TEXT_READ_SIZE:  # a single line longer than a block
+            cut = len(pending) - len(pending) % width
+            lines.append(pending[:cut])
+            pending = pending[cut:]
+
+        for line in lines:
+            pages = line.split("\f")
+            for i, part in enumerate(pages):
+                if i:
+                    yield None
+                part = part.rstrip("\r").expandtabs(8)
+                if not part:
+                    if len(pages) == 1:
+                        yield ""
+                    continue
+                while len(part) > width:
+                    cut = part.rfind(" ", width // 2, width + 1)
+                    cut = cut + 1 if cut > 0 else width
+                    yield part[:cut]
+                    part = part[cut:]
+                yield part
+        if not block:
+            return
+
+
+# Control characters have no glyphs in Courier; drop them
+_CONTROL_CHARS = dict.fromkeys(c for c in range(32) if c != 9)
+
+
+def _pdf_string(text: str) -> bytes:
+    """Encode text for a literal PDF string in WinAnsi, escaping delimiters."""
+    data = text.translate(_CONTROL_CHARS).encode("cp1252", "replace")
+    return data.replace(b"\\", b"\\\\").replace(b"(", b"\\(").replace(b")", b"\\)")
+
+
 def _convert_markdown(input_path: Path, output_path: Path) -> Path:
-    """Convert Markdown to PDF via HTML intermediate."""
-    text = input_path.read_text(encoding="utf-8", errors="replace")
-    html_content = md.markdown(text, extensions=["tables", "fenced_code"])
-    return _html_to_pdf_reportlab(html_content, output_path)
+    """Convert Markdown to PDF, rendering it to HTML a block of paragraphs at a time."""
+    from services.html_story import html_flowables
+
+    with open(input_path, "r", encoding="utf-8", errors="replace") as f:
+        return _render_story_pdf(html_flowables(_markdown_html(f)), output_path, "(empty document)")
 
 
 def _convert_html(input_path: Path, output_path: Path) -> Path:
-    """Convert HTML file to PDF."""
-    html_content = input_path.read_text(encoding="utf-8", errors="replace")
-    return _html_to_pdf_reportlab(html_content, output_path)
+    """Convert HTML file to PDF, laying out elements as they are parsed."""
+    from services.html_story import html_flowables
 
+    with open(input_path, "r", encoding="utf-8", errors="replace") as f:
+        chunks = iter(lambda: f.read(RICH_TEXT_READ_SIZE), "")
+        return _render_story_pdf(html_flowables(chunks), output_path, "(empty document)")
 
-def _html_to_pdf_reportlab(html_content: str, output_path: Path) -> Path:
-    """Render HTML content to PDF using reportlab (basic)."""
-    # Strip tags for a simple text-based rendering
-    import re
-    clean = re.sub(r"<[^>]+>", " ", html_content)
-    clean = clean.replace("&nbsp;", " ").replace("&amp;", "&")
-    clean = clean.replace("&lt;", "<").replace("&gt;", ">")
 
-    styles = getSampleStyleSheet()
-    doc = SimpleDocTemplate(str(output_path), pagesize=letter)
-    story = []
-    for line in clean.split("\n"):
-        line = line.strip()
-        if line:
-            safe = line.replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;")
-            story.append(Paragraph(safe, styles["Normal"]))
-            story.append(Spacer(1, 6))
+def _markdown_html(lines: Iterable[str]):
+    """Yield HTML for Markdown source, converted in chunks of about RICH_TEXT_READ_SIZE characters.
+
+    Chunks end at a blank line outside fenced code, so every block is
+    converted whole. Reference-style links only resolve within their chunk.
+    """
+    import markdown
+
+    converter = markdown.Markdown(extensions=["tables", "fenced_code"])
+    chunk, size, fence = [], 0, None
+    for line in lines:
+        chunk.append(line)
+        size += len(line)
+        marker = line.lstrip()[:3]
+        if marker in ("```", "~~~"):
+            fence = None if fence == marker else (fence or marker)
+        if size >= RICH_TEXT_READ_SIZE and fence is None and not line.strip():
+            yield converter.reset().convert("".join(chunk))
+            chunk, size = [], 0
+    if chunk:
+        yield converter.reset().convert("".join(chunk))
+
+
+class _StoryFeed(list):
+    """Story for one part: pulls flowables from `source` as layout consumes them.
+
+    platypus lays a story out by taking flowables off the front of a list
+    until it is empty; this list is topped up on each check, and reads as
+    empty once its part is full, so the part ends on a page boundary and
+    what is left carries over to the next part.
+    """
+
+    def __init__(self, source, pending: list, doc):
+        super().__init__(pending)
+        self.source = source
+        self.doc = doc
+
+    def __len__(self):
+        if self.doc.part_full:
+            return 0
+        # A few flowables of lookahead for keepWithNext (headings)
+        while list.__len__(self) < 8:
+            flowable = next(self.source, None)
+            if flowable is None:
+                break
+            self.append(flowable)
+        return list.__len__(self)
+
 
-    if not story:
-        story.append(Paragraph("(empty document)", styles["Normal"]))
+def _render_story_pdf(flowables: Iterable, output_path: Path, empty_text: str) -> Path:
+    """Lay out flowables as they are produced, STORY_PAGES_PER_PART pages per part PDF.
 
-    doc.build(story)
+    reportlab keeps a whole document in memory until it is saved, so long
+    documents are written as parts that are concatenated at the end. Parts
+    break only where a page ends anyway, so the output reads as one layout.
+    """
+    from reportlab.platypus import Paragraph, SimpleDocTemplate
+    from services.layout import PartDocTemplate, sample_styles
+
+    source = iter(flowables)
+    pending = []
+    with tempfile.TemporaryDirectory(dir=output_path.parent) as tmp:
+        parts = []
+        while True:
+            if not pending:
+                first = next(source, None)
+                if first is None:
+                    break
+                pending = [first]
+            part = Path(tmp) / f"part_{len(parts)}.pdf"
+            doc = PartDocTemplate(str(part), STORY_PAGES_PER_PART, pagesize=LETTER)
+            story = _StoryFeed(source, pending, doc)
+            doc.build(story)
+            parts.append(part)
+            pending = list(story)
+
+        if not parts:
+            SimpleDocTemplate(str(output_path), pagesize=LETTER).build(
+                [Paragraph(empty_text, sample_styles()["Normal"])]
+            )
+        elif len(parts) == 1:
+            os.replace(parts[0], output_path)
+        else:
+            concat_pdfs(parts, output_path)
     return output_path
 
 
 def _convert_image(input_path: Path, output_path: Path) -> Path:
-    """Convert an image file to a PDF page."""
-    img = Image.open(input_path)
-    if img.mode in ("RGBA", "P"):
-        img = img.convert("RGB")
+    """Convert an image to PDF pages: one per frame, centred on a letter page.
 
-    img_width, img_height = img.size
-    page_width, page_height = letter
-    margin = 0.5 * inch
+    JPEGs are embedded as they are (DCTDecode) without being decoded;
+    other images are decoded one frame at a time and Flate-compressed.
+    Images placed at more than IMAGE_MAX_DPI are downsampled first.
+    """
+    from PIL import Image, ImageSequence
 
+    page_width, page_height = LETTER
+    margin = 36  # half an inch
     available_w = page_width - 2 * margin
     available_h = page_height - 2 * margin
 
-    scale = min(available_w / img_width, available_h / img_height, 1.0)
-    draw_w = img_width * scale
-    draw_h = img_height * scale
+    with Image.open(input_path) as img, open(output_path, "wb") as f:
+        writer = PdfStreamWriter(f)
+        # Only TIFFs are paged; other multi-frame formats (GIF, MPO) use their first frame
+        frames = ImageSequence.Iterator(img) if img.format == "TIFF" else [img]
+        for frame in frames:
+            img_width, img_height = frame.size
+            scale = min(available_w / img_width, available_h / img_height, 1.0)
+            draw_w = img_width * scale
+            draw_h = img_height * scale
+            x = (page_width - draw_w) / 2
+            y = (page_height - draw_h) / 2
+
+            # Pixels per inch at the drawn size; 1 pixel is drawn as 1 point at most
+            max_pixels = None
+            if IMAGE_MAX_DPI and 72 / scale > IMAGE_MAX_DPI:
+                max_pixels = (round(draw_w / 72 * IMAGE_MAX_DPI), round(draw_h / 72 * IMAGE_MAX_DPI))
+
+            image = writer.reserve()
+            writer.write_stream(image, *_image_xobject(frame, input_path, max_pixels))
+
+            contents = writer.reserve()
+            data = f"q {draw_w:.4f} 0 0 {draw_h:.4f} {x:.4f} {y:.4f} cm /Im0 Do Q".encode()
+            writer.write_stream(contents, f"<< /Length {len(data)} >>".encode(), data)
+
+            page = writer.reserve()
+            writer.write_raw(page, (
+                f"<< /Type /Page /Parent {writer.pages_root} 0 R /MediaBox [0 0 {page_width:g} {page_height:g}] "
+                f"/Resources << /XObject << /Im0 {image} 0 R >> >> /Contents {contents} 0 R >>"
+            ).encode())
+            writer.pages.append(page)
+        writer.finish()
 
-    c = canvas.Canvas(str(output_path), pagesize=letter)
-    x = (page_width - draw_w) / 2
-    y = (page_height - draw_h) / 2
-    c.drawImage(ImageReader(img), x, y, draw_w, draw_h)
-    c.save()
     return output_path
 
 
+# Colour spaces that image data can be written in without conversion
+_IMAGE_COLOR_SPACES = {"L": "/DeviceGray", "RGB": "/DeviceRGB", "CMYK": "/DeviceCMYK"}
+
+
+def _image_xobject(frame, path: Path, max_pixels: tuple[int, int] | None) -> tuple[bytes, bytes]:
+    """Serialized image XObject dictionary and data for one frame."""
+    from PIL import Image
+
+    if frame.format == "JPEG" and frame.mode in _IMAGE_COLOR_SPACES:
+        if max_pixels:
+            # Let libjpeg decode at 1/2, 1/4 or 1/8 scale first, then finish the resize
+            frame.draft(frame.mode, max_pixels)
+            resized = frame.resize(max_pixels, Image.LANCZOS)
+            buf = io.BytesIO()
+            resized.save(buf, "JPEG", quality=IMAGE_JPEG_QUALITY)
+            return _image_dict(resized, "/DCTDecode", len(buf.getvalue())), buf.getvalue()
+
+        data = path.read_bytes()
+        extra = ""
+        if frame.mode == "CMYK" and "adobe" in frame.info:
+            extra = " /Decode [1 0 1 0 1 0 1 0]"  # Adobe writes CMYK JPEGs inverted
+        return _image_dict(frame, "/DCTDecode", len(data), extra), data
+
+    if frame.mode not in _IMAGE_COLOR_SPACES:
+        frame = frame.convert("L" if frame.mode in ("1", "LA", "I", "I;16", "F") else "RGB")
+    if max_pixels:
+        frame = frame.resize(max_pixels, Image.LANCZOS)
+    data = zlib.compress(frame.tobytes())
+    return _image_dict(frame, "/FlateDecode", len(data)), data
+
+
+def _image_dict(img, filter_name: str, length: int, extra: str = "") -> bytes:
+    return (
+        f"<< /Type /XObject /Subtype /Image /Width {img.width} /Height {img.height} "
+        f"/ColorSpace {_IMAGE_COLOR_SPACES[img.mode]} /BitsPerComponent 8 "
+        f"/Filter {filter_name} /Length {length}{extra} >>"
+    ).encode()
+
+
 def _convert_csv(input_path: Path, output_path: Path) -> Path:
-    """Convert CSV to a table-based PDF."""
-    with open(input_path, "r", encoding="utf-8", errors="replace") as f:
-        reader = csv.reader(f)
-        data = [row for row in reader]
+    """Convert CSV to a table-based PDF, reading rows as it renders them."""
+    with open(input_path, "r", encoding="utf-8", errors="replace", newline="") as f:
+        return _render_table_pdf(csv.reader(f), output_path, "(empty file)")
+
+
+def _render_table_pdf(rows: Iterable[list], output_path: Path, empty_text: str, title: str | None = None) -> Path:
+    """Render rows (the first one is the header) as paged tables.
+
+    Rows are pulled TABLE_ROWS_PER_PART at a time, so memory depends on the
+    part size rather than the row count. A title is repeated in every
+    page's caption.
+    """
+    from reportlab.platypus import Paragraph, SimpleDocTemplate
+    from services.layout import sample_styles
 
-    if not data:
-        data = [["(empty file)"]]
+    rows = iter(rows)
+    header = next(rows, None)
+    if header is None:
+        styles = sample_styles()
+        story = [Paragraph(_escape(title), styles["Heading2"])] if title else []
+        doc = SimpleDocTemplate(str(output_path), pagesize=A4)
+        doc.build(story + [Paragraph(empty_text, styles["Normal"])])
+        return output_path
 
-    # Truncate very wide tables
-    max_cols = 10
-    data = [row[:max_cols] for row in data]
+    with tempfile.TemporaryDirectory(dir=output_path.parent) as tmp:
+        parts = []
+        first_row = 1
+        while True:
+            batch = list(islice(rows, TABLE_ROWS_PER_PART))
+            if parts and not batch:
+                break
+            part = Path(tmp) / f"part_{len(parts)}.pdf"
+            doc = SimpleDocTemplate(str(part), pagesize=A4)
+            doc.build(_table_story(header, batch, first_row, doc.width - 12, doc.height - 12, title))
+            parts.append(part)
+            first_row += len(batch)
+            if len(batch) < TABLE_ROWS_PER_PART:
+                break
+
+        if len(parts) == 1:
+            os.replace(parts[0], output_path)
+        else:
+            concat_pdfs(parts, output_path)
+    return output_path
+
+
+def _table_story(
+    header: list, rows: list[list], first_row: int, width: float, height: float, title: str | None = None,
+) -> list:
+    """Flowables for one part: a page per block of rows and group of columns.
+
+    Each block is laid out across (all column groups), then down (next
+    rows). Every page repeats the header; pages of wide tables get a
+    caption saying which rows and columns they hold. A block takes as many
+    rows as fit the page in the tallest of its column groups, so every
+    group of a block holds the same rows.
+    """
+    from reportlab.platypus import PageBreak, Paragraph, Spacer, Table
+
+    caption_style, table_style = _table_styles()
+    column_count = max([len(header)] + [len(row) for row in rows]) or 1
+    paged = column_count > TABLE_COLUMNS_PER_PAGE
+    captioned = paged or title is not None
+    groups = [
+        (col, min(TABLE_COLUMNS_PER_PAGE, column_count - col))
+        for col in range(0, column_count, TABLE_COLUMNS_PER_PAGE)
+    ]
+    widths = [width / cols for _, cols in groups]
+
+    # cells[g][i] and heights[i] for the header (i = 0) and every row
+    cells = [[] for _ in groups]
+    heights = []
+    for row in [header] + rows:
+        row_height = TABLE_ROW_HEIGHT
+        for g, (col, cols) in enumerate(groups):
+            row_cells, cells_height = _table_cells(row, col, cols, widths[g])
+            cells[g].append(row_cells)
+            row_height = max(row_height, cells_height)
+        heights.append(row_height)
 
-    styles = getSampleStyleSheet()
-    doc = SimpleDocTemplate(str(output_path), pagesize=A4)
     story = []
+    for start, end in _table_blocks(heights, height - (18 if captioned else 0)):
+        for g, (col, cols) in enumerate(groups):
+            if story:
+                story.append(PageBreak())
+            if captioned:
+                caption = [f"<b>{_escape(title)}</b>"] if title else []
+                if paged:
+                    last_row = first_row + max(end - 1, start)
+                    caption.append(f"Rows {first_row + start}–{last_row}, columns {col + 1}–{col + cols} of {column_count}")
+                story.append(Paragraph(" · ".join(caption), caption_style))
+                story.append(Spacer(1, 6))
+            # A row taller than a whole page is split across pages rather than overflowing it
+            t = Table(
+                [cells[g][0]] + cells[g][start + 1:end + 1], colWidths=[widths[g]] * cols,
+                rowHeights=[heights[0]] + heights[start + 1:end + 1], repeatRows=1, splitInRow=1,
+            )
+            t.setStyle(table_style)
+            story.append(t)
+    return story
+
+
+def _table_blocks(heights: list[float], available: float):
+    """Yield (start, end) row ranges, each filling one page under the header row.
+
+    `heights` starts with the header's. Every block holds at least one row,
+    even one taller than the page.
+    """
+    available -= heights[0]
+    start = used = 0
+    for i, h in enumerate(heights[1:]):
+        if i > start and used + h > available:
+            yield start, i
+            start, used = i, 0
+        used += h
+    yield start, len(heights) - 1
+
 
-    # Style the table
+@functools.cache
+def _table_styles():
+    """Caption and table styles for _table_story, built once per process."""
+    from reportlab.lib import colors
+    from reportlab.lib.styles import ParagraphStyle
+    from reportlab.platypus import TableStyle
+    from services.layout import sample_styles
+
+    caption_style = ParagraphStyle("Caption", parent=sample_styles()["Normal"], fontSize=TABLE_FONT_SIZE, leading=12)
     table_style = TableStyle([
         ("BACKGROUND", (0, 0), (-1, 0), colors.HexColor("#334155")),
         ("TEXTCOLOR", (0, 0), (-1, 0), colors.white),
-        ("FONTSIZE", (0, 0), (-1, -1), 8),
+        ("FONTSIZE", (0, 0), (-1, -1), TABLE_FONT_SIZE),
+        ("LEADING", (0, 0), (-1, -1), TABLE_LEADING),
         ("GRID", (0, 0), (-1, -1), 0.5, colors.grey),
         ("ROWBACKGROUNDS", (0, 1), (-1, -1), [colors.white, colors.HexColor("#f1f5f9")]),
         ("VALIGN", (0, 0), (-1, -1), "TOP"),
     ])
+    return caption_style, table_style
 
-    # Split into chunks of 50 rows per table to fit pages
-    chunk_size = 50
-    for i in range(0, len(data), chunk_size):
-        chunk = data[i:i + chunk_size]
-        t = Table(chunk)
-        t.setStyle(table_style)
-        story.append(t)
-        story.append(Spacer(1, 12))
 
-    doc.build(story)
-    return output_path
+def _trimmed_rows(rows: Iterable[tuple]):
+    """Drop trailing empty cells from each row and empty rows from the end.
+
+    Spreadsheets often declare a used range far beyond their data, and
+    read-only mode pads rows out to it.
+    """
+    blank_rows = 0
+    for row in rows:
+        row = list(row)
+        while row and row[-1] in (None, ""):
+            row.pop()
+        if not row:
+            blank_rows += 1
+            continue
+        for _ in range(blank_rows):
+            yield []
+        blank_rows = 0
+        yield row
+
+
+def _escape(text: str) -> str:
+    return text.replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;")
+
+
+def _table_cells(row: list, start: int, count: int, col_width: float) -> tuple[list[str], float]:
+    """One column group's cells of a row, wrapped to the column, and the height they need."""
+    cells = [_wrap_cell("" if value is None else str(value), col_width - TABLE_CELL_PADDING[0]) for value in row[start:start + count]]
+    lines = max([cell.count("\n") + 1 for cell in cells] + [1])
+    height = TABLE_ROW_HEIGHT if lines == 1 else lines * TABLE_LEADING + TABLE_CELL_PADDING[1]
+    return cells + [""] * (count - len(cells)), height
+
+
+def _wrap_cell(text: str, width: float) -> str:
+    """Break text into lines no wider than `width`: at spaces where possible, inside words too long for a line.
+
+    Table cells are kept as plain strings, which reportlab draws line by line
+    and can split across pages, because they are much cheaper than Paragraphs.
+    """
+    from reportlab.lib.utils import simpleSplit
+    from reportlab.pdfbase.pdfmetrics import stringWidth
+
+    if "\n" not in text and stringWidth(text, "Helvetica", TABLE_FONT_SIZE) <= width:
+        return text
+    lines = []
+    for paragraph in text.replace("\r\n", "\n").split("\n"):
+        for line in simpleSplit(paragraph, "Helvetica", TABLE_FONT_SIZE, width) or [""]:
+            while len(line) > 1 and stringWidth(line, "Helvetica", TABLE_FONT_SIZE) > width:
+                lo, hi = 1, len(line) - 1  # longest prefix that fits, at least one character
+                while lo < hi:
+                    mid = (lo + hi + 1) // 2
+                    if stringWidth(line[:mid], "Helvetica", TABLE_FONT_SIZE) <= width:
+                        lo = mid
+                    else:
+                        hi = mid - 1
+                lines.append(line[:lo])
+                line = line[lo:]
+            lines.append(line)
+    return "\n".join(lines)
 
 
 def _convert_docx(input_path: Path, output_path: Path) -> Path:
-    """Convert DOCX to PDF using python-docx + reportlab."""
-    from docx import Document
+    """Convert DOCX to PDF, reading the document body element by element.
 
-    doc = Document(str(input_path))
-    styles = getSampleStyleSheet()
+    word/document.xml is parsed incrementally and each paragraph or table
+    is dropped from the tree once it has been turned into flowables, so
+    memory doesn't depend on document length. Heading styles map to the
+    matching reportlab heading; tables keep their rows and columns.
+    """
+    with zipfile.ZipFile(input_path) as zf:
+        style_names = _docx_style_names(zf)
+        with zf.open("word/document.xml") as body:
+            return _render_story_pdf(_docx_flowables(body, style_names), output_path, "(empty document)")
+
+
+_W = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
 
-    pdf = SimpleDocTemplate(str(output_path), pagesize=letter)
-    story = []
 
-    for para in doc.paragraphs:
-        text = para.text.strip()
-        if not text:
-            story.append(Spacer(1, 6))
+def _docx_style_names(zf: zipfile.ZipFile) -> dict[str, str]:
+    """Paragraph style id -> style name, e.g. "Heading1" -> "Heading 1"."""
+    from lxml import etree
+
+    try:
+        root = etree.fromstring(zf.read("word/styles.xml"))
+    except KeyError:
+        return {}
+    names = {}
+    for style in root.iter(f"{_W}style"):
+        name = style.find(f"{_W}name")
+        if name is not None:
+            # Word stores built-in names in lower case ("heading 1"); python-docx shows them capitalised
+            value = name.get(f"{_W}val", "")
+            names[style.get(f"{_W}styleId")] = value[:1].upper() + value[1:]
+    return names
+
+
+def _docx_flowables(body, style_names: dict[str, str]):
+    from lxml import etree
+
+    styles = _docx_styles()
+    depth = 0
+    for event, el in etree.iterparse(body, events=("start", "end")):
+        if event == "start":
+            depth += 1
+            continue
+        depth -= 1
+        if depth != 2:  # only direct children of <w:body>
             continue
+        yield from _docx_block(el, style_names, styles)
+        # Free what has been rendered, including the parent's references to it
+        el.clear()
+        while el.getprevious() is not None:
+            del el.getparent()[0]
+
+
+@functools.cache
+def _docx_styles() -> dict:
+    """Paragraph styles for DOCX paragraphs by name: Normal and Heading1 to Heading6."""
+    from services.layout import sample_styles
+
+    sample = sample_styles()
+    return {name: sample[name] for name in ["Normal"] + [f"Heading{level}" for level in range(1, 7)]}
+
+
+def _docx_block(el, style_names: dict[str, str], styles: dict):
+    from reportlab.platypus import Paragraph, Spacer
 
-        safe = text.replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;")
+    if el.tag == f"{_W}p":
+        text, markup = _docx_paragraph(el)
+        if not text.strip():
+            yield Spacer(1, 6)
+            return
 
-        style_name = para.style.name if para.style and para.style.name else ""
+        style_id = el.find(f"{_W}pPr/{_W}pStyle")
+        style_name = style_names.get(style_id.get(f"{_W}val"), "") if style_id is not None else ""
         if style_name.startswith("Heading"):
             level = style_name[-1] if style_name[-1].isdigit() else "1"
             style_name = f"Heading{min(int(level), 6)}"
             if style_name in styles:
-                story.append(Paragraph(safe, styles[style_name]))
+                yield Paragraph(markup, styles[style_name])
             else:
-                story.append(Paragraph(f"<b>{safe}</b>", styles["Normal"]))
+                yield Paragraph(f"<b>{markup}</b>", styles["Normal"])
         else:
-            story.append(Paragraph(safe, styles["Normal"]))
+            yield Paragraph(markup, styles["Normal"])
+    elif el.tag == f"{_W}tbl":
+        yield from _docx_table(el)
+    elif el.tag == f"{_W}sdt":  # content control wrapping ordinary body content
+        for child in el.iterfind(f"{_W}sdtContent/*"):
+            yield from _docx_block(child, style_names, styles)
 
-    if not story:
-        story.append(Paragraph("(empty document)", styles["Normal"]))
 
-    pdf.build(story)
-    return output_path
+def _docx_paragraph(p) -> tuple[str, str]:
+    """Plain text and Paragraph markup (bold, italic, underline, line breaks) of a <w:p>."""
+    text, markup = [], []
+    for run in p.iter(f"{_W}r"):
+        rpr = run.find(f"{_W}rPr")
+        tags = [tag for tag, prop in (("b", "b"), ("i", "i"), ("u", "u"))
+                if rpr is not None and _docx_on(rpr.find(f"{_W}{prop}"))]
+        pieces = []
+        for child in run:
+            if child.tag == f"{_W}t":
+                text.append(child.text or "")
+                pieces.append(_escape(child.text or ""))
+            elif child.tag == f"{_W}tab":
+                text.append("\t")
+                pieces.append(" ")
+            elif child.tag in (f"{_W}br", f"{_W}cr"):
+                text.append("\n")
+                pieces.append("<br/>")
+        if pieces:
+            markup.append("".join(f"<{t}>" for t in tags) + "".join(pieces) + "".join(f"</{t}>" for t in reversed(tags)))
+    return "".join(text), "".join(markup)
+
+
+def _docx_on(prop) -> bool:
+    """Whether a toggle run property (<w:b/>, <w:i w:val="0"/>...) is switched on."""
+    if prop is None:
+        return False
+    if prop.tag == f"{_W}u":
+        return prop.get(f"{_W}val", "single") != "none"
+    return prop.get(f"{_W}val", "true") not in ("0", "false", "off")
+
+
+def _docx_table(tbl):
+    """Flowables for a <w:tbl>, TABLE_ROWS_PER_FLOWABLE rows at a time.
+
+    Rows marked as header rows repeat on every page; horizontally merged
+    cells keep their columns, with the text in the first one. Nested
+    tables are flattened into their cell's text.
+    """
+    from services.html_story import TABLE_ROWS_PER_FLOWABLE, table_flowable
+
+    header, rows = None, []
+    for tr in tbl.iterfind(f"{_W}tr"):
+        row = []
+        for tc in tr.iterfind(f"{_W}tc"):
+            paragraphs = [_docx_paragraph(p)[1] for p in tc.iter(f"{_W}p")]
+            row.append("<br/>".join(m for m in paragraphs if m))
+            span = tc.find(f"{_W}tcPr/{_W}gridSpan")
+            if span is not None and span.get(f"{_W}val", "1").isdigit():
+                row.extend([""] * (int(span.get(f"{_W}val")) - 1))
+        if not row:
+            continue
+        if header is None and not rows and tr.find(f"{_W}trPr/{_W}tblHeader") is not None:
+            header = row
+            continue
+        rows.append(row)
+        if len(rows) >= TABLE_ROWS_PER_FLOWABLE:
+            yield table_flowable(header, rows)
+            rows = []
+    if rows or header:
+        yield table_flowable(header, rows)
 
 
 def _convert_xlsx(input_path: Path, output_path: Path) -> Path:
-    """Convert XLSX to PDF table."""
+    """Convert every sheet of a workbook to paged tables, one sheet after another.
+
+    The convert router renders the sheets in parallel instead (count_parts
+    and convert_part); this is the same output produced in one process.
+    """
+    parts = []
+    with tempfile.TemporaryDirectory(dir=output_path.parent) as tmp:
+        for i in range(count_parts(input_path)):
+            parts.append(_convert_xlsx_sheet(input_path, Path(tmp) / f"sheet_{i}.pdf", i))
+        return join_parts(parts, output_path)
+
+
+def _convert_xlsx_sheet(input_path: Path, output_path: Path, index: int) -> Path:
+    """Render one sheet, streaming its rows from openpyxl's read-only mode."""
     from openpyxl import load_workbook
 
     wb = load_workbook(str(input_path), read_only=True, data_only=True)
-    styles = getSampleStyleSheet()
-    pdf = SimpleDocTemplate(str(output_path), pagesize=A4)
-    story = []
+    try:
+        if index >= len(wb.worksheets):  # only chart sheets
+            return _render_table_pdf([], output_path, "(empty workbook)")
+        sheet = wb.worksheets[index]
+        rows = _trimmed_rows(sheet.iter_rows(values_only=True))
+        return _render_table_pdf(rows, output_path, "(empty sheet)", f"Sheet: {sheet.title}")
+    finally:
+        wb.close()
 
-    for sheet in wb.worksheets:
-        story.append(Paragraph(f"<b>Sheet: {sheet.title}</b>", styles["Heading2"]))
-        story.append(Spacer(1, 8))
-
-        data = []
-        for row in sheet.iter_rows(max_row=200, max_col=10, values_only=True):
-            data.append([str(cell) if cell is not None else "" for cell in row])
-
-        if data:
-            table_style = TableStyle([
-                ("BACKGROUND", (0, 0), (-1, 0), colors.HexColor("#334155")),
-                ("TEXTCOLOR", (0, 0), (-1, 0), colors.white),
-                ("FONTSIZE", (0, 0), (-1, -1), 8),
-                ("GRID", (0, 0), (-1, -1), 0.5, colors.grey),
-                ("ROWBACKGROUNDS", (0, 1), (-1, -1), [colors.white, colors.HexColor("#f1f5f9")]),
-            ])
-            t = Table(data)
-            t.setStyle(table_style)
-            story.append(t)
-        else:
-            story.append(Paragraph("(empty sheet)", styles["Normal"]))
 
-        story.append(Spacer(1, 20))
+def _convert_pptx(input_path: Path, output_path: Path) -> Path:
+    """Convert every slide of a presentation, a part of slides after another.
 
-    wb.close()
-    if not story:
-        story.append(Paragraph("(empty workbook)", styles["Normal"]))
+    The convert router renders the parts in parallel instead (count_parts
+    and convert_part); this is the same output produced in one process.
+    """
+    from pptx import Presentation
 
-    pdf.build(story)
-    return output_path
+    prs = Presentation(str(input_path))
+    slides = list(prs.slides)
+    size = max(-(-len(slides) // count_parts(input_path)), 1)
+    parts = []
+    with tempfile.TemporaryDirectory(dir=output_path.parent) as tmp:
+        for start in range(0, max(len(slides), 1), size):
+            part = Path(tmp) / f"slides_{len(parts)}.pdf"
+            parts.append(_render_slides(prs, slides[start:start + size], part))
+        return join_parts(parts, output_path)
 
 
-def _convert_pptx(input_path: Path, output_path: Path) -> Path:
-    """Convert PPTX to PDF — one page per slide with text content."""
+def _count_slides(input_path: Path) -> int:
+    """Slides in a presentation, read from its slide list without loading the package."""
+    from lxml import etree
+
+    try:
+        with zipfile.ZipFile(input_path) as zf:
+            root = etree.fromstring(zf.read("ppt/presentation.xml"))
+    except (OSError, KeyError, zipfile.BadZipFile, etree.XMLSyntaxError):
+        return 1  # let the conversion itself report the problem
+    return len(root.findall("{*}sldIdLst/{*}sldId"))
+
+
+def _convert_pptx_slides(input_path: Path, output_path: Path, part: int, parts: int) -> Path:
+    """Render the slides of part `part` of `parts`, a page per slide at the slide's size.
+
+    Pictures, text boxes and tables are drawn where they sit on the slide.
+    Text that doesn't fit its box is shrunk until it does. Pictures follow
+    the same rules as image files: JPEGs are embedded untouched unless
+    IMAGE_MAX_DPI asks for downsampling.
+    """
     from pptx import Presentation
 
     prs = Presentation(str(input_path))
-    styles = getSampleStyleSheet()
-    pdf = SimpleDocTemplate(str(output_path), pagesize=letter)
-    story = []
+    slides = list(prs.slides)
+    size = -(-len(slides) // parts)
+    return _render_slides(prs, slides[part * size:(part + 1) * size], output_path)
 
-    for i, slide in enumerate(prs.slides, 1):
-        story.append(Paragraph(f"<b>Slide {i}</b>", styles["Heading2"]))
-        story.append(Spacer(1, 8))
 
-        for shape in slide.shapes:
-            if shape.has_text_frame:
-                for para in shape.text_frame.paragraphs:
-                    text = para.text.strip()
-                    if text:
-                        safe = text.replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;")
-                        story.append(Paragraph(safe, styles["Normal"]))
-                        story.append(Spacer(1, 4))
+def _render_slides(prs, slides: list, output_path: Path) -> Path:
+    from reportlab.pdfgen.canvas import Canvas
+    import services.layout  # noqa: F401  (reportlab settings)
 
-        story.append(Spacer(1, 20))
+    page_size = (prs.slide_width.pt, prs.slide_height.pt) if prs.slide_width else (720, 540)
+    canvas = Canvas(str(output_path), pagesize=page_size)
+    if not slides:
+        canvas.drawCentredString(page_size[0] / 2, page_size[1] / 2, "(empty presentation)")
+        canvas.showPage()
 
-    if not story:
-        story.append(Paragraph("(empty presentation)", styles["Normal"]))
-
-    pdf.build(story)
+    with tempfile.TemporaryDirectory(dir=output_path.parent) as image_dir:
+        for slide in slides:
+            for shape in slide.shapes:
+                _draw_slide_shape(canvas, shape, page_size, Path(image_dir))
+            canvas.showPage()
+    canvas.save()
     return output_path
+
+
+def _draw_slide_shape(canvas, shape, page_size: tuple[float, float], image_dir: Path):
+    from pptx.enum.shapes import MSO_SHAPE_TYPE
+    from reportlab.platypus import Frame, KeepInFrame
+    from services.html_story import table_flowable
+
+    if shape.shape_type == MSO_SHAPE_TYPE.GROUP:
+        for child in shape.shapes:
+            _draw_slide_shape(canvas, child, page_size, image_dir)
+        return
+
+    # Placeholders look their geometry up in the layout on every access, so read it once
+    left, top, width, height = shape.left, shape.top, shape.width, shape.height
+    if None in (left, top, width, height):
+        box = (0.0, 0.0) + page_size  # position inherited from nowhere: use the whole slide
+    else:
+        box = (left.pt, page_size[1] - top.pt - height.pt, width.pt, height.pt)
+    if box[2] <= 0 or box[3] <= 0:
+        return
+
+    image = None
+    if hasattr(shape, "image"):
+        try:
+            image = shape.image.blob
+        except (ValueError, KeyError):
+            pass  # linked rather than embedded
+    if image:
+        source = _slide_image(image, box[2], box[3], image_dir)
+        if source:
+            canvas.drawImage(source, *box, mask="auto")
+        return
+
+    flowables = []
+    if getattr(shape, "has_table", False) and shape.has_table:
+        rows = [[_escape(cell.text) for cell in row.cells] for row in shape.table.rows]
+        if rows:
+            flowables.append(table_flowable(rows[0], rows[1:]))
+    elif shape.has_text_frame:
+        flowables = _slide_paragraphs(shape)
+    if flowables:
+        frame = Frame(*box, leftPadding=4, rightPadding=4, topPadding=4, bottomPadding=4)
+        frame.addFromList([KeepInFrame(box[2] - 8, box[3] - 8, flowables, mode="shrink")], canvas)
+
+
+def _slide_paragraphs(shape) -> list:
+    from pptx.enum.shapes import PP_PLACEHOLDER
+    from pptx.enum.text import PP_ALIGN
+    from reportlab.lib.enums import TA_CENTER, TA_JUSTIFY, TA_LEFT, TA_RIGHT
+    from reportlab.platypus import Paragraph
+
+    is_title = shape.is_placeholder and shape.placeholder_format.type in (PP_PLACEHOLDER.TITLE, PP_PLACEHOLDER.CENTER_TITLE)
+    alignments = {PP_ALIGN.CENTER: TA_CENTER, PP_ALIGN.RIGHT: TA_RIGHT, PP_ALIGN.JUSTIFY: TA_JUSTIFY}
+    flowables = []
+    for para in shape.text_frame.paragraphs:
+        markup, size = [], None
+        for run in para.runs:
+            if run.font.size and size is None:
+                size = run.font.size.pt
+            text = _escape(run.text).replace("\v", "<br/>")
+            markup.append(f"<b>{text}</b>" if run.font.bold and not is_title else text)
+        if not "".join(r.text for r in para.runs).strip():
+            continue
+        size = size or (SLIDE_TITLE_FONT_SIZE if is_title else SLIDE_FONT_SIZE)
+        style = _slide_style(size, is_title, para.level, alignments.get(para.alignment, TA_LEFT))
+        flowables.append(Paragraph("".join(markup), style))
+    return flowables
+
+
+@functools.cache
+def _slide_style(size: float, is_title: bool, level: int, alignment: int):
+    """Paragraph style for slide text; decks reuse a handful, so each is built once."""
+    from reportlab.lib.styles import ParagraphStyle
+    from services.layout import sample_styles
+
+    return ParagraphStyle(
+        "Slide", parent=sample_styles()["Normal"], fontSize=size, leading=size * 1.2, spaceAfter=size * 0.3,
+        fontName="Helvetica-Bold" if is_title else "Helvetica", leftIndent=level * size, alignment=alignment,
+    )
+
+
+def _slide_image(blob: bytes, draw_w: float, draw_h: float, image_dir: Path):
+    """What to hand drawImage for a slide picture; downsampled if it would print above IMAGE_MAX_DPI.
+
+    JPEGs are passed as files: reportlab then embeds them without decoding
+    and names them by path, so a picture repeated across slides is stored
+    once. For an ImageReader it decodes the whole image just to name it.
+    """
+    from PIL import Image
+    from reportlab.lib.utils import ImageReader
+
+    try:
+        img = Image.open(io.BytesIO(blob))
+        img_w, img_h = img.size
+    except Exception:
+        return None  # EMF/WMF and other formats Pillow can't draw
+    max_pixels = None
+    if IMAGE_MAX_DPI and img_w / (draw_w / 72) > IMAGE_MAX_DPI:
+        max_pixels = (max(round(draw_w / 72 * IMAGE_MAX_DPI), 1), max(round(draw_h / 72 * IMAGE_MAX_DPI), 1))
+    if img.format != "JPEG":
+        return ImageReader(img.resize(max_pixels, Image.LANCZOS) if max_pixels else img)
+
+    path = image_dir / f"{hashlib.sha1(blob).hexdigest()}_{max_pixels}.jpg"
+    if not path.exists():
+        if max_pixels:
+            # Same as image files: downsampled JPEGs stay JPEGs
+            img.draft(img.mode, max_pixels)
+            img.resize(max_pixels, Image.LANCZOS).save(path, "JPEG", quality=IMAGE_JPEG_QUALITY)
+        else:
+            path.write_bytes(blob)
+    return str(path)
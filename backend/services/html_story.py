@@ -0,0 +1,426 @@
+import functools
+from html.parser import HTMLParser
+from typing import Iterable
+
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import letter
+from reportlab.lib.styles import ParagraphStyle
+from reportlab.lib.units import inch
+from reportlab.pdfbase.pdfmetrics import stringWidth
+from reportlab.platypus import Paragraph, Preformatted, Table, TableStyle
+from reportlab.platypus.flowables import HRFlowable
+
+from services.layout import sample_styles
+
+# Limits that keep each flowable small, so layout cost and memory don't
+# depend on how long a paragraph, code block or table is in the source
+PARAGRAPH_MAX_CHARS = 4000
+CODE_LINES_PER_FLOWABLE = 60
+TABLE_ROWS_PER_FLOWABLE = 50
+TABLE_FONT_SIZE = 8
+
+CODE_FONT_SIZE = 8
+FRAME_WIDTH = letter[0] - 2 * inch - 12  # what SimpleDocTemplate's default margins and padding leave
+CODE_LINE_CHARS = int(FRAME_WIDTH / (CODE_FONT_SIZE * 0.6))  # Courier is 0.6em wide
+
+BLOCK_TAGS = {
+    "p", "div", "section", "article", "header", "footer", "nav", "main", "aside", "address",
+    "blockquote", "figure", "figcaption", "form", "fieldset", "details", "summary",
+    "h1", "h2", "h3", "h4", "h5", "h6", "ul", "ol", "li", "dl", "dt", "dd",
+    "pre", "table", "thead", "tbody", "tfoot", "tr", "td", "th", "caption", "hr", "body", "html",
+}
+SKIPPED_TAGS = {"script", "style", "title", "template", "svg", "noscript"}
+
+# Inline tags and the Paragraph markup they map to
+INLINE_MARKUP = {
+    "b": ("<b>", "</b>"), "strong": ("<b>", "</b>"),
+    "i": ("<i>", "</i>"), "em": ("<i>", "</i>"), "cite": ("<i>", "</i>"), "var": ("<i>", "</i>"),
+    "u": ("<u>", "</u>"), "ins": ("<u>", "</u>"),
+    "s": ("<strike>", "</strike>"), "strike": ("<strike>", "</strike>"), "del": ("<strike>", "</strike>"),
+    "code": ('<font face="Courier">', "</font>"), "kbd": ('<font face="Courier">', "</font>"),
+    "samp": ('<font face="Courier">', "</font>"), "tt": ('<font face="Courier">', "</font>"),
+    "sup": ("<super>", "</super>"), "sub": ("<sub>", "</sub>"),
+}
+LINK_SCHEMES = ("http://", "https://", "mailto:")
+BULLETS = ("•", "–", "·")
+
+
+def html_flowables(chunks: Iterable[str]):
+    """Yield reportlab flowables for HTML read a chunk at a time.
+
+    Flowables come out as soon as the elements they stand for are closed,
+    so a document never has to be in memory as a whole. Headings, lists,
+    tables, code blocks, quotes, rules and inline emphasis/code/links are
+    kept; images become their alt text and everything else its text.
+    """
+    parser = _StoryParser()
+    for chunk in chunks:
+        parser.feed(chunk)
+        yield from parser.take()
+    parser.close()
+    parser.end()
+    yield from parser.take()
+
+
+@functools.cache
+def _styles() -> dict[str, ParagraphStyle]:
+    """Styles by block kind, built once per process and shared by every parser."""
+    sample = sample_styles()
+    body = ParagraphStyle("Body", parent=sample["Normal"], spaceAfter=6)
+    styles = {
+        "body": body,
+        "quote": ParagraphStyle("Quote", parent=body, leftIndent=18, textColor=colors.HexColor("#475569")),
+        "item": ParagraphStyle("Item", parent=body, spaceAfter=2),
+        "code": ParagraphStyle(
+            "CodeBlock", parent=sample["Code"], fontSize=CODE_FONT_SIZE, leading=10, leftIndent=12,
+            spaceBefore=0, spaceAfter=0,
+        ),
+        "cell": ParagraphStyle("Cell", parent=sample["Normal"], fontSize=TABLE_FONT_SIZE, leading=10),
+        "header_cell": ParagraphStyle(
+            "HeaderCell", parent=sample["Normal"], fontSize=TABLE_FONT_SIZE, leading=10,
+            fontName="Helvetica-Bold", textColor=colors.white,
+        ),
+    }
+    for level in range(1, 7):
+        styles[f"h{level}"] = ParagraphStyle(f"H{level}", parent=sample[f"Heading{level}"], keepWithNext=1)
+    return styles
+
+
+@functools.cache
+def _item_style(depth: int, quotes: int) -> ParagraphStyle:
+    return ParagraphStyle(
+        f"Item{depth}", parent=_styles()["item"],
+        leftIndent=18 * depth + 18 * quotes, bulletIndent=18 * (depth - 1) + 4 + 18 * quotes,
+    )
+
+
+def _escape(text: str) -> str:
+    return text.replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;")
+
+
+class _StoryParser(HTMLParser):
+    """Turns HTML tokens into flowables; take() hands over the ones finished so far.
+
+    Unclosed <p>, <li>, <td> and <tr> are closed implicitly, as browsers do.
+    Inline formatting that is still open when a paragraph ends is carried
+    into the next one.
+    """
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.styles = _styles()
+        self.out = []
+        self._skipping = 0
+        self._text: list[str] = []  # markup of the paragraph being read
+        self._chars = 0
+        self._has_text = False
+        self._inline: list[tuple[str, str, str]] = []  # (tag, open, close) still open
+        self._carried = ""  # opening markup of inline tags carried in from the previous paragraph
+        self._block = "body"
+        self._bullet = None
+        self._lists: list[list] = []  # [ordered, next number] per open list
+        self._quotes = 0
+        self._pre: list[str] | None = None
+        self._pre_lines = 0
+        self._pre_started = False
+        self._table: dict | None = None
+        self._nested_tables = 0
+
+    def take(self) -> list:
+        out, self.out = self.out, []
+        return out
+
+    def end(self):
+        """Flush whatever the document left open."""
+        if self._pre is not None:
+            self._end_pre()
+        while self._table is not None:
+            self._end_table()
+        self._flush()
+
+    def handle_starttag(self, tag, attrs):
+        if tag in SKIPPED_TAGS:
+            self._skipping += 1
+            return
+        if self._skipping:
+            return
+        if self._pre is not None:
+            return  # tags inside a code block (<code>, highlighting spans) add nothing
+        attrs = dict(attrs)
+
+        if self._table is not None and self._nested_tables == 0 and tag in ("tr", "td", "th", "thead", "tbody", "tfoot"):
+            self._table_tag(tag)
+            return
+        if tag == "table":
+            if self._table is not None:
+                self._nested_tables += 1  # flattened into the enclosing cell
+                return
+            self._flush()
+            self._table = {"rows": [], "row": None, "cell": None, "header": None, "in_head": False}
+            return
+
+        if tag in INLINE_MARKUP:
+            opening, closing = INLINE_MARKUP[tag]
+            self._inline.append((tag, opening, closing))
+            self._text.append(opening)
+        elif tag == "a":
+            href = attrs.get("href") or ""
+            if href.startswith(LINK_SCHEMES):
+                opening = f'<a href="{_escape(href).replace(chr(34), "&quot;")}" color="blue">'
+                self._inline.append((tag, opening, "</a>"))
+                self._text.append(opening)
+        elif tag == "br":
+            self._text.append("<br/>")
+        elif tag == "img":
+            alt = (attrs.get("alt") or "").strip()
+            if alt:
+                self._data(f"[{alt}]")
+        elif tag in BLOCK_TAGS:
+            self._flush()
+            self._start_block(tag, attrs)
+
+    def handle_endtag(self, tag):
+        if tag in SKIPPED_TAGS:
+            self._skipping = max(self._skipping - 1, 0)
+            return
+        if self._skipping:
+            return
+        if self._pre is not None:
+            if tag == "pre":
+                self._end_pre()
+            return
+
+        if self._table is not None:
+            if tag == "table":
+                if self._nested_tables:
+                    self._nested_tables -= 1
+                else:
+                    self._end_table()
+                return
+            if self._nested_tables == 0 and tag in ("tr", "td", "th", "thead"):
+                self._close_cell()
+                if tag == "tr":
+                    self._close_row()
+                elif tag == "thead":
+                    self._table["in_head"] = False
+                return
+
+        if any(t == tag for t, _, _ in self._inline):
+            while self._inline:
+                t, _, closing = self._inline.pop()
+                self._text.append(closing)
+                if t == tag:
+                    break
+        elif tag in BLOCK_TAGS:
+            self._flush()
+            self._end_block(tag)
+
+    def handle_data(self, data):
+        if self._skipping:
+            return
+        if self._pre is not None:
+            if not self._pre_started:
+                data = data.removeprefix("\n")  # a newline right after <pre> is not content
+                self._pre_started = True
+            self._pre.append(data)
+            self._pre_lines += data.count("\n")
+            if self._pre_lines >= CODE_LINES_PER_FLOWABLE:
+                self._emit_code(final=False)
+            return
+        self._data(data)
+
+    def _data(self, data: str):
+        # Split runaway paragraphs at a space so no Paragraph gets huge
+        while data:
+            room = PARAGRAPH_MAX_CHARS - self._chars
+            if len(data) <= room:
+                piece, data = data, ""
+            else:
+                cut = data.rfind(" ", 0, room)
+                cut = cut if cut > 0 else max(room, 1)
+                piece, data = data[:cut], data[cut:]
+            self._text.append(_escape(piece))
+            self._chars += len(piece)
+            self._has_text = self._has_text or not piece.isspace()
+            if data:
+                self._flush()
+
+    # Blocks
+
+    def _start_block(self, tag: str, attrs: dict):
+        self._block = tag if tag in ("h1", "h2", "h3", "h4", "h5", "h6") else "body"
+        if tag in ("ul", "ol"):
+            start = attrs.get("start") or "1"
+            self._lists.append([tag == "ol", int(start) if start.lstrip("-").isdigit() else 1])
+            self._bullet = None
+        elif tag == "li":
+            if self._lists:
+                ordered, number = self._lists[-1]
+                if ordered:
+                    value = attrs.get("value") or ""
+                    number = int(value) if value.lstrip("-").isdigit() else number
+                    self._bullet = f"{number}."
+                    self._lists[-1][1] = number + 1
+                else:
+                    self._bullet = BULLETS[(len(self._lists) - 1) % len(BULLETS)]
+            else:
+                self._bullet = BULLETS[0]
+        elif tag == "blockquote":
+            self._quotes += 1
+        elif tag == "pre":
+            self._pre = []
+            self._pre_started = False
+        elif tag == "hr":
+            self.out.append(HRFlowable(width="100%", thickness=0.5, color=colors.grey, spaceBefore=4, spaceAfter=8))
+
+    def _end_block(self, tag: str):
+        if tag in ("ul", "ol"):
+            if self._lists:
+                self._lists.pop()
+        elif tag == "li":
+            self._bullet = None
+        elif tag == "blockquote":
+            self._quotes = max(self._quotes - 1, 0)
+        elif tag == self._block:
+            self._block = "body"
+
+    def _flush(self):
+        """Finish the paragraph being read, as a flowable or (inside a table) a cell."""
+        closing = "".join(c for _, _, c in reversed(self._inline))
+        markup = self._carried + "".join(self._text) + closing
+        has_text = self._has_text
+        self._carried = "".join(o for _, o, _ in self._inline)
+        self._text = []
+        self._chars = 0
+        self._has_text = False
+        if not has_text:
+            return
+
+        if self._table is not None and self._table["cell"] is not None:
+            self._table["cell"].append(markup)
+            self._bullet = None
+            return
+        # Text in a table but outside its cells lands above the table, as in browsers
+
+        style = self.styles[self._block if self._block != "body" else ("quote" if self._quotes else "body")]
+        if self._lists or self._bullet:
+            style = _item_style(max(len(self._lists), 1), self._quotes)
+        self.out.append(Paragraph(markup, style, bulletText=self._bullet))
+        self._bullet = None  # later paragraphs of the same item are not bulleted again
+
+    # Code blocks
+
+    def _end_pre(self):
+        self._emit_code(final=True)
+        self._pre = None
+
+    def _emit_code(self, final: bool):
+        text = "".join(self._pre)
+        if not final:
+            # Keep the unfinished last line for the next flowable
+            text, _, rest = text.rpartition("\n")
+            self._pre = [rest]
+        else:
+            text = text.removesuffix("\n")
+            self._pre = []
+        self._pre_lines = 0
+        if text:
+            self.out.append(Preformatted(
+                text.expandtabs(4), self.styles["code"], maxLineLength=CODE_LINE_CHARS, newLineChars="",
+            ))
+
+    # Tables
+
+    def _table_tag(self, tag: str):
+        self._flush()
+        table = self._table
+        if tag == "thead":
+            table["in_head"] = True
+        elif tag in ("tbody", "tfoot"):
+            table["in_head"] = False
+        elif tag == "tr":
+            self._close_cell()
+            self._close_row()
+            table["row"] = []
+        else:
+            self._close_cell()
+            if table["row"] is None:
+                table["row"] = []
+            table["cell"] = []
+            table["row_is_header"] = table.get("row_is_header", True) and (tag == "th" or table["in_head"])
+
+    def _close_cell(self):
+        table = self._table
+        if table["cell"] is None:
+            return
+        self._flush()
+        if table["row"] is None:
+            table["row"] = []
+        table["row"].append("<br/>".join(table["cell"]))
+        table["cell"] = None
+
+    def _close_row(self):
+        table = self._table
+        row, table["row"] = table["row"], None
+        is_header = table.pop("row_is_header", False)
+        if not row:
+            return
+        if is_header and table["header"] is None and not table["rows"]:
+            table["header"] = row
+            return
+        table["rows"].append(row)
+        if len(table["rows"]) >= TABLE_ROWS_PER_FLOWABLE:
+            self._emit_table()
+
+    def _end_table(self):
+        self._close_cell()
+        self._close_row()
+        if self._table["rows"] or self._table["header"]:
+            self._emit_table()
+        self._table = None
+        self._nested_tables = 0
+
+    def _emit_table(self):
+        """Add the rows read so far as a Table, repeating the header row on each one."""
+        table = self._table
+        self.out.append(table_flowable(table["header"], table["rows"], self.styles))
+        table["rows"] = []
+
+
+def table_flowable(header: list[str] | None, rows: list[list[str]], styles: dict | None = None) -> Table:
+    """A grid table of cell markup, with `header` (if any) styled and repeated on every page.
+
+    Rows may have different lengths; short ones are padded with empty cells.
+    """
+    styles = styles or _styles()
+    columns = max(len(row) for row in ([header] if header else []) + rows)
+    col_width = FRAME_WIDTH / columns
+
+    def cells(row, style):
+        return [_cell(markup, style, col_width) for markup in row] + [""] * (columns - len(row))
+
+    data = ([cells(header, styles["header_cell"])] if header else []) + [cells(r, styles["cell"]) for r in rows]
+    style = [
+        ("FONT", (0, 0), (-1, -1), "Helvetica", TABLE_FONT_SIZE, 10),
+        ("GRID", (0, 0), (-1, -1), 0.5, colors.grey),
+        ("VALIGN", (0, 0), (-1, -1), "TOP"),
+        ("ROWBACKGROUNDS", (0, 1 if header else 0), (-1, -1), [colors.white, colors.HexColor("#f1f5f9")]),
+    ]
+    if header:
+        style.append(("FONT", (0, 0), (-1, 0), "Helvetica-Bold", TABLE_FONT_SIZE, 10))
+        style.append(("TEXTCOLOR", (0, 0), (-1, 0), colors.white))
+        style.append(("BACKGROUND", (0, 0), (-1, 0), colors.HexColor("#334155")))
+    return Table(
+        data, colWidths=[col_width] * columns, repeatRows=1 if header else 0,
+        splitInRow=1, style=TableStyle(style), hAlign="LEFT", spaceAfter=6,
+    )
+
+
+def _cell(markup: str, style: ParagraphStyle, width: float):
+    """A table cell: plain text when it has no markup and fits on one line, which lays out
+    far faster than a Paragraph, else a wrapping Paragraph."""
+    if "<" not in markup and "&" not in markup:
+        text = " ".join(markup.split())
+        if stringWidth(text, style.fontName, style.fontSize) <= width - 12:  # 6pt padding each side
+            return text
+    return Paragraph(markup, style)
@@ -0,0 +1,45 @@
+import functools
+
+from reportlab import rl_config
+from reportlab.lib.styles import StyleSheet1, getSampleStyleSheet
+from reportlab.pdfbase import pdfmetrics
+from reportlab.platypus import SimpleDocTemplate
+
+# reportlab set-up and objects shared by every conversion in a process. Only
+# the converters that lay out pages import this, so a process that just
+# routes requests never loads reportlab.
+
+# Write reportlab streams as binary rather than ASCII85, which adds a
+# quarter to every image and page
+rl_config.useA85 = 0
+
+# Standard fonts the converters use; their metrics are parsed on first use
+FONTS = (
+    "Helvetica", "Helvetica-Bold", "Helvetica-Oblique", "Helvetica-BoldOblique",
+    "Courier", "Courier-Bold", "Times-Roman",
+)
+
+
+@functools.cache
+def sample_styles() -> StyleSheet1:
+    """reportlab's sample style sheet, built once per process. Derive from it; never modify it."""
+    return getSampleStyleSheet()
+
+
+def load_fonts():
+    """Parse the metrics of every font in FONTS now rather than during the first layout."""
+    for name in FONTS:
+        pdfmetrics.getFont(name)
+
+
+class PartDocTemplate(SimpleDocTemplate):
+    """Document template that reports when a part has reached `pages_per_part` pages."""
+
+    part_full = False
+
+    def __init__(self, filename: str, pages_per_part: int, **kw):
+        super().__init__(filename, **kw)
+        self.pages_per_part = pages_per_part
+
+    def afterPage(self):
+        self.part_full = self.page >= self.pages_per_part
@@ -1,17 +1,221 @@
+import os
+import re
+import hashlib
+import tracemalloc
+from io import BytesIO
 from pathlib import Path
 from pypdf import PdfReader, PdfWriter
+from pypdf.generic import (
+    ArrayObject, DictionaryObject, IndirectObject, NameObject, NullObject, NumberObject, StreamObject,
+)
+
+from services.pdf_writer import PdfStreamWriter
+
+MERGER_VERSION = "1"  # part of result cache keys — bump when output changes
+TRACE_MEMORY = os.environ.get("MERGE_TRACE_MEMORY", "0") == "1"
+
+# StreamingMerger reads two private pypdf attributes: StreamObject._data (a
+# stream's raw, still-encoded bytes) and PdfReader.resolved_objects (the
+# reader's object cache). requirements.txt pins pypdf exactly for this;
+# check both when upgrading it, and PdfWriter._add_object in splitter.py.
 
 
 def merge_pdfs(input_paths: list[Path], output_path: Path) -> Path:
     """Merge multiple PDFs in order into a single PDF."""
-    writer = PdfWriter()
+    writer = _merged_writer(PdfReader(str(pdf_path)) for pdf_path in input_paths)
+
+    with open(output_path, "wb") as f:
+        writer.write(f)
+
+    return output_path
+
+
+def merge_to_bytes(pdfs: list[bytes]) -> bytes:
+    """Merge PDFs held in memory, in order, into one PDF. Same output as merge_pdfs()."""
+    buf = BytesIO()
+    _merged_writer(PdfReader(BytesIO(data)) for data in pdfs).write(buf)
+    return buf.getvalue()
+
 
-    for pdf_path in input_paths:
-        reader = PdfReader(str(pdf_path))
+def _merged_writer(readers) -> PdfWriter:
+    writer = PdfWriter()
+    for reader in readers:
         for page in reader.pages:
             writer.add_page(page)
+    return writer
 
-    with open(output_path, "wb") as f:
-        writer.write(f)
 
+def merge_pdfs_low_memory(input_paths: list[Path], output_path: Path) -> dict:
+    """Merge PDFs in order, writing each object to disk as soon as it is copied.
+
+    Only one input is open at a time and it is read from disk on demand, so
+    peak memory follows the largest page rather than the whole batch.
+    Identical streams (fonts, logos, letterheads) are written once and shared
+    across inputs. Returns merge statistics.
+
+    peak_memory_bytes is how far this merge took the process's RSS above
+    where it started. On Linux the kernel's peak RSS counter is reset before
+    the merge, which costs nothing; elsewhere it is None. With
+    MERGE_TRACE_MEMORY=1 it is instead the peak Python allocation during
+    this merge, traced with tracemalloc, which makes the merge several times
+    slower: for benchmarks and debugging only.
+    """
+    tracing = TRACE_MEMORY and not tracemalloc.is_tracing()
+    start_rss = None if tracing else _reset_peak_rss()
+    if tracing:
+        tracemalloc.start()
+    try:
+        merger = _stream_merge(input_paths, output_path)
+        if tracing:
+            peak = tracemalloc.get_traced_memory()[1]
+        else:
+            peak = max(_proc_status("VmHWM") - start_rss, 0) if start_rss is not None else None
+    finally:
+        if tracing:
+            tracemalloc.stop()
+
+    return {
+        "input_bytes": sum(p.stat().st_size for p in input_paths),
+        "output_bytes": output_path.stat().st_size,
+        "pages": len(merger.pages),
+        "deduplicated_streams": merger.deduplicated,
+        "bytes_saved": merger.bytes_saved,
+        "peak_memory_bytes": peak,
+    }
+
+
+def _reset_peak_rss() -> int | None:
+    """Reset the process's peak RSS (Linux 4.0+) and return its current RSS, or None if unsupported."""
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+        return _proc_status("VmRSS")
+    except (OSError, ValueError):
+        return None
+
+
+def _proc_status(field: str) -> int:
+    """A memory figure from /proc/self/status, in bytes."""
+    with open("/proc/self/status") as f:
+        match = re.search(rf"^{field}:\s+(\d+) kB", f.read(), re.M)
+    if match is None:
+        raise ValueError(f"{field} not in /proc/self/status")
+    return int(match.group(1)) * 1024
+
+
+def concat_pdfs(input_paths: list[Path], output_path: Path) -> Path:
+    """Concatenate PDFs with the low-memory merger, for callers that don't need stats."""
+    _stream_merge(input_paths, output_path)
     return output_path
+
+
+def _stream_merge(input_paths: list[Path], output_path: Path) -> "StreamingMerger":
+    with open(output_path, "wb") as f:
+        merger = StreamingMerger(f)
+        for pdf_path in input_paths:
+            merger.add_file(pdf_path)
+        merger.finish()
+    return merger
+
+
+class StreamingMerger(PdfStreamWriter):
+    """Copies pages object by object into the output file.
+
+    Objects are renumbered as they are copied; the only state kept across
+    inputs is each object's file offset and a digest of every stream written.
+    Pages are always written by add_document() itself, with /Parent pointing
+    at the merged page tree, even when something else reaches them first.
+    Pages that are linked to but never reached (broken documents) end up as
+    null objects.
+    """
+
+    def __init__(self, f):
+        super().__init__(f)
+        self.deduplicated = 0
+        self.bytes_saved = 0
+        self._stream_digests: dict[bytes, int] = {}
+
+    def add_file(self, pdf_path: Path):
+        """Append every page of the PDF at `pdf_path`; the file is closed again afterwards."""
+        with open(pdf_path, "rb") as src:
+            self.add_document(PdfReader(src))
+
+    def add_document(self, reader: PdfReader):
+        self._reader = reader
+        self._numbers: dict[tuple[int, int], int] = {}  # source (id, generation) -> output number
+        self._copying: dict[tuple[int, int], int | None] = {}  # streams whose dict is being copied
+
+        for page in reader.pages:
+            num = self._number_for_page(page.indirect_reference)
+            copy = DictionaryObject({key: self._copy(value) for key, value in page.items() if key != "/Parent"})
+            copy[NameObject("/Parent")] = IndirectObject(self.pages_root, 0, None)
+            self.write(num, copy)
+            self.pages.append(num)
+            # Drop parsed objects as we go; everything copied so far is in _numbers
+            reader.resolved_objects.clear()  # private pypdf cache, see the pin note above
+
+        self._reader = self._numbers = self._copying = None
+
+    def _copy(self, value):
+        if isinstance(value, IndirectObject):
+            return IndirectObject(self._copy_indirect(value), 0, None)
+        if isinstance(value, DictionaryObject):
+            return DictionaryObject({key: self._copy(v) for key, v in value.items()})
+        if isinstance(value, ArrayObject):
+            return ArrayObject(self._copy(v) for v in value)
+        return value
+
+    def _copy_indirect(self, ref: IndirectObject) -> int:
+        key = (ref.idnum, ref.generation)
+        if key in self._numbers:
+            return self._numbers[key]
+        if key in self._copying:
+            # A stream reached from its own dictionary — give up on sharing it
+            if self._copying[key] is None:
+                self._copying[key] = self.reserve()
+            return self._copying[key]
+
+        obj = self._reader.get_object(ref)
+        if isinstance(obj, StreamObject):
+            return self._copy_stream(key, obj)
+        if isinstance(obj, DictionaryObject) and obj.get("/Type") == "/Page":
+            return self._number_for_page(ref)
+
+        num = self._numbers[key] = self.reserve()
+        self.write(num, NullObject() if obj is None else self._copy(obj))
+        return num
+
+    def _copy_stream(self, key: tuple[int, int], stream: StreamObject) -> int:
+        # Copy what the stream refers to first, so identical streams from
+        # different inputs serialize to identical bytes
+        self._copying[key] = None
+        copy = DictionaryObject({k: self._copy(v) for k, v in stream.items() if k != "/Length"})
+        # _data is private to pypdf: the encoded bytes, copied without decoding
+        copy[NameObject("/Length")] = NumberObject(len(stream._data))
+        num = self._copying.pop(key)
+
+        header = _serialize(copy)
+        if num is None:
+            digest = hashlib.sha256(header + stream._data).digest()
+            if digest in self._stream_digests:
+                self.deduplicated += 1
+                self.bytes_saved += len(header) + len(stream._data)
+                self._numbers[key] = self._stream_digests[digest]
+                return self._numbers[key]
+            num = self._stream_digests[digest] = self.reserve()
+
+        self._numbers[key] = num
+        self.write_stream(num, header, stream._data)
+        return num
+
+    def _number_for_page(self, ref: IndirectObject) -> int:
+        key = (ref.idnum, ref.generation)
+        if key not in self._numbers:
+            self._numbers[key] = self.reserve()
+        return self._numbers[key]
+
+
+def _serialize(obj) -> bytes:
+    buf = BytesIO()
+    obj.write_to_stream(buf)
+    return buf.getvalue()
@@ -0,0 +1,77 @@
+from pypdf.generic import ArrayObject, DictionaryObject, IndirectObject, NameObject, NullObject, NumberObject
+
+
+class PdfStreamWriter:
+    """Minimal PDF writer that sends each object to an open file as soon as it is written.
+
+    Nothing but object offsets and page numbers is kept in memory, so
+    output size doesn't affect memory use. Object numbers come from
+    reserve(); objects may be written in any order, and numbers that are
+    never written become null objects. Pages listed in `pages` form a flat
+    page tree whose root is `pages_root`.
+    """
+
+    def __init__(self, f):
+        self.f = f
+        self.offsets: list[int | None] = [None]  # by object number; 0 is the free-list head
+        self.pages: list[int] = []
+        self.pages_root = self.reserve()
+        f.write(b"%PDF-1.7\n%\xe2\xe3\xcf\xd3\n")
+
+    def reserve(self) -> int:
+        self.offsets.append(None)
+        return len(self.offsets) - 1
+
+    def write(self, num: int, obj):
+        """Write a pypdf object as object `num`."""
+        self._begin(num)
+        obj.write_to_stream(self.f)
+        self.f.write(b"\nendobj\n")
+
+    def write_raw(self, num: int, body: bytes):
+        """Write an already serialized object body as object `num`."""
+        self._begin(num)
+        self.f.write(body)
+        self.f.write(b"\nendobj\n")
+
+    def write_stream(self, num: int, dictionary: bytes, data: bytes):
+        """Write a stream; `dictionary` is serialized and must hold the right /Length."""
+        self._begin(num)
+        self.f.write(dictionary)
+        self.f.write(b"\nstream\n")
+        self.f.write(data)
+        self.f.write(b"\nendstream\nendobj\n")
+
+    def finish(self):
+        """Write the page tree, catalog, cross-reference table and trailer."""
+        kids = ArrayObject(IndirectObject(num, 0, None) for num in self.pages)
+        self.write(self.pages_root, DictionaryObject({
+            NameObject("/Type"): NameObject("/Pages"),
+            NameObject("/Kids"): kids,
+            NameObject("/Count"): NumberObject(len(self.pages)),
+        }))
+        root = self.reserve()
+        self.write(root, DictionaryObject({
+            NameObject("/Type"): NameObject("/Catalog"),
+            NameObject("/Pages"): IndirectObject(self.pages_root, 0, None),
+        }))
+
+        for num, offset in enumerate(self.offsets):
+            if num and offset is None:
+                self.write(num, NullObject())
+
+        xref = self.f.tell()
+        self.f.write(f"xref\n0 {len(self.offsets)}\n0000000000 65535 f \n".encode())
+        for offset in self.offsets[1:]:
+            self.f.write(f"{offset:010d} 00000 n \n".encode())
+        trailer = DictionaryObject({
+            NameObject("/Size"): NumberObject(len(self.offsets)),
+            NameObject("/Root"): IndirectObject(root, 0, None),
+        })
+        self.f.write(b"trailer\n")
+        trailer.write_to_stream(self.f)
+        self.f.write(f"\nstartxref\n{xref}\n%%EOF\n".encode())
+
+    def _begin(self, num: int):
+        self.offsets[num] = self.f.tell()
+        self.f.write(f"{num} 0 obj\n".encode())
@@ -0,0 +1,44 @@
+import time
+from pathlib import Path
+
+from services.merger import merge_to_bytes
+from services.splitter import split_to_bytes
+
+# Steps that run on PDFs in memory; "convert" runs before them, file by file
+PDF_STEPS = ("merge", "split")
+
+
+def run_pdf_steps(inputs: list[tuple[str, Path]], steps: list[dict]) -> tuple[list[tuple[str, bytes]], list[float]]:
+    """Run merge and split steps in order over a list of PDFs.
+
+    `inputs` are (file name, path) pairs; they are the only files read.
+    Every step takes and returns a list of (file name, PDF bytes), so
+    intermediate documents never touch the disk. Returns the last step's
+    documents and the seconds each step took.
+    """
+    docs = [(name, path.read_bytes()) for name, path in inputs]
+    seconds = []
+    for step in steps:
+        started = time.perf_counter()
+        docs = _merge(docs, step) if step["op"] == "merge" else _split(docs, step["params"])
+        seconds.append(time.perf_counter() - started)
+    return docs, seconds
+
+
+def _merge(docs: list[tuple[str, bytes]], step: dict) -> list[tuple[str, bytes]]:
+    order = step.get("order")
+    if order is not None:
+        if any(i < 0 or i >= len(docs) for i in order):
+            raise ValueError(f"Invalid merge order for {len(docs)} documents")
+        docs = [docs[i] for i in order]
+    return [(step.get("filename", "merged.pdf"), merge_to_bytes([data for _, data in docs]))]
+
+
+def _split(docs: list[tuple[str, bytes]], params: dict) -> list[tuple[str, bytes]]:
+    """Split every document; with several, output names are prefixed with the document's."""
+    if len(docs) == 1:
+        return split_to_bytes(docs[0][1], params)
+    outputs = []
+    for name, data in docs:
+        outputs.extend((f"{Path(name).stem}_{part}", part_data) for part, part_data in split_to_bytes(data, params))
+    return outputs
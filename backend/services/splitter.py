@@ -1,10 +1,32 @@
+import re
+from io import BytesIO
 from pathlib import Path
-from pypdf import PdfReader, PdfWriter
+from pypdf import PdfReader, PdfWriter, PageObject
+from pypdf.generic import DictionaryObject, IndirectObject, NameObject, PdfObject
 
+SPLITTER_VERSION = "2"  # part of result cache keys — bump when output changes
 
-def get_pdf_info(input_path: Path) -> dict:
+# Every function takes a path, the PDF's bytes or an already-parsed
+# PdfReader, so a reader kept by a document session can be reused without
+# parsing again.
+Source = Path | bytes | PdfReader
+
+# Resource categories that content streams refer to by name
+_NAMED_RESOURCES = ("/Font", "/XObject", "/ExtGState", "/ColorSpace", "/Pattern", "/Shading", "/Properties")
+_NAME_TOKEN = re.compile(rb"/([^\s/\[\]()<>{}%]+)")
+
+
+def open_pdf(source: Source) -> PdfReader:
+    if isinstance(source, PdfReader):
+        return source
+    if isinstance(source, bytes):
+        return PdfReader(BytesIO(source))
+    return PdfReader(str(source))
+
+
+def get_pdf_info(source: Source) -> dict:
     """Get page count and basic info about a PDF."""
-    reader = PdfReader(str(input_path))
+    reader = open_pdf(source)
     return {
         "page_count": len(reader.pages),
         "metadata": {
@@ -14,56 +36,294 @@ def get_pdf_info(input_path: Path) -> dict:
     }
 
 
-def split_all_pages(input_path: Path, output_dir: Path) -> list[Path]:
+def split_all_pages(source: Source, output_dir: Path, strip_unused: bool = False) -> list[Path]:
     """Split PDF into individual pages. Returns list of output paths."""
-    reader = PdfReader(str(input_path))
-    output_files = []
+    reader = open_pdf(source)
+    return split_specific_pages(reader, output_dir, list(range(1, len(reader.pages) + 1)), strip_unused)
 
-    for i, page in enumerate(reader.pages, 1):
-        writer = PdfWriter()
-        writer.add_page(page)
-        out_path = output_dir / f"page_{i}.pdf"
-        with open(out_path, "wb") as f:
-            writer.write(f)
-        output_files.append(out_path)
 
-    return output_files
+def split_specific_pages(
+    source: Source, output_dir: Path, pages: list[int], strip_unused: bool = False,
+) -> list[Path]:
+    """Extract specific pages (1-indexed). Returns list of output paths."""
+    reader = open_pdf(source)
+    return _write_ranges(reader, output_dir, _page_ranges(len(reader.pages), pages), strip_unused)
 
 
-def split_specific_pages(input_path: Path, output_dir: Path, pages: list[int]) -> list[Path]:
-    """Extract specific pages (1-indexed). Returns list of output paths."""
-    reader = PdfReader(str(input_path))
+def split_page_range(
+    source: Source, output_dir: Path, start: int, end: int, strip_unused: bool = False,
+) -> Path:
+    """Extract a range of pages (1-indexed, inclusive). Returns single output path."""
+    reader = open_pdf(source)
+    return _write_ranges(reader, output_dir, _single_range(len(reader.pages), start, end), strip_unused)[0]
+
+
+def extract_pages(source: Source, output_path: Path, pages: list[int]) -> Path:
+    """Copy the given pages (1-indexed, in the given order) into a single PDF."""
+    reader = open_pdf(source)
     total = len(reader.pages)
-    output_files = []
 
+    writer = PdfWriter()
     for page_num in pages:
         if page_num < 1 or page_num > total:
             raise ValueError(f"Page {page_num} out of range (1-{total})")
-
-        writer = PdfWriter()
         writer.add_page(reader.pages[page_num - 1])
-        out_path = output_dir / f"page_{page_num}.pdf"
-        with open(out_path, "wb") as f:
-            writer.write(f)
-        output_files.append(out_path)
 
-    return output_files
+    with open(output_path, "wb") as f:
+        writer.write(f)
+
+    return output_path
 
 
-def split_page_range(input_path: Path, output_dir: Path, start: int, end: int) -> Path:
-    """Extract a range of pages (1-indexed, inclusive). Returns single output path."""
-    reader = PdfReader(str(input_path))
+def parse_page_ranges(expression: str) -> list[tuple[int, int]]:
+    """Parse an expression like "1-3,7,10-40" into (start, end) pairs, 1-indexed and inclusive."""
+    ranges = []
+    for part in expression.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        match = re.fullmatch(r"(\d+)\s*(?:-\s*(\d+))?", part)
+        if not match:
+            raise ValueError(f"Invalid page range: {part}")
+        start = int(match.group(1))
+        end = int(match.group(2) or start)
+        if start < 1 or start > end:
+            raise ValueError(f"Invalid page range: {part}")
+        ranges.append((start, end))
+
+    if not ranges:
+        raise ValueError("No page ranges specified")
+    return list(dict.fromkeys(ranges))
+
+
+def split_ranges(
+    source: Source, output_dir: Path, ranges: list[tuple[int, int]], strip_unused: bool = False,
+) -> list[Path]:
+    """Write one PDF per (start, end) range, all from a single parse of the source."""
+    reader = open_pdf(source)
+    return _write_ranges(reader, output_dir, _named_ranges(len(reader.pages), ranges), strip_unused)
+
+
+def split_every_n_pages(
+    source: Source, output_dir: Path, chunk_size: int, strip_unused: bool = False,
+) -> list[Path]:
+    """Split into consecutive chunks of `chunk_size` pages (the last one may be shorter)."""
+    if chunk_size < 1:
+        raise ValueError("Chunk size must be at least 1")
+    reader = open_pdf(source)
+    return _write_ranges(reader, output_dir, _chunk_ranges(len(reader.pages), chunk_size), strip_unused)
+
+
+def split_by_bookmarks(source: Source, output_dir: Path, strip_unused: bool = False) -> list[Path]:
+    """Write one PDF per top-level bookmark, running up to the next top-level bookmark.
+
+    Pages before the first bookmark, if any, go into a "front matter" file.
+    """
+    reader = open_pdf(source)
+    return _write_ranges(reader, output_dir, _bookmark_ranges(reader), strip_unused)
+
+
+def split_by_mode(source: Source, output_dir: Path, params: dict) -> list[Path]:
+    """Run a split request against one parsed source.
+
+    `params` is the dict built by the split router (and used in its cache
+    key): a "mode" plus the fields that mode needs, and "strip_unused".
+    """
+    reader = open_pdf(source)
+    return _write_ranges(reader, output_dir, split_plan(reader, params), params.get("strip_unused", False))
+
+
+def split_to_bytes(source: Source, params: dict) -> list[tuple[str, bytes]]:
+    """Same as split_by_mode(), but returns (file name, PDF bytes) pairs instead of writing files."""
+    reader = open_pdf(source)
+    strip = params.get("strip_unused", False)
+    outputs = []
+    for name, start, end in split_plan(reader, params):
+        buf = BytesIO()
+        _range_writer(reader, start, end, strip).write(buf)
+        outputs.append((name, buf.getvalue()))
+    return outputs
+
+
+def split_plan(reader: PdfReader, params: dict) -> list[tuple[str, int, int]]:
+    """(file name, first page, last page) of every output a split request produces, 1-indexed."""
+    mode = params["mode"]
     total = len(reader.pages)
+    if mode == "all":
+        return _page_ranges(total, range(1, total + 1))
+    if mode == "specific":
+        return _page_ranges(total, params["pages"])
+    if mode == "range":
+        return _single_range(total, params["start"], params["end"])
+    if mode == "ranges":
+        return _named_ranges(total, [tuple(r) for r in params["ranges"]])
+    if mode == "chunks":
+        if params["chunk_size"] < 1:
+            raise ValueError("Chunk size must be at least 1")
+        return _chunk_ranges(total, params["chunk_size"])
+    if mode == "bookmarks":
+        return _bookmark_ranges(reader)
+    raise ValueError(f"Invalid mode: {mode}")
+
 
+def _page_ranges(total: int, pages) -> list[tuple[str, int, int]]:
+    ranges = []
+    for page_num in pages:
+        if page_num < 1 or page_num > total:
+            raise ValueError(f"Page {page_num} out of range (1-{total})")
+        ranges.append((f"page_{page_num}.pdf", page_num, page_num))
+    return ranges
+
+
+def _single_range(total: int, start: int, end: int) -> list[tuple[str, int, int]]:
     if start < 1 or end > total or start > end:
         raise ValueError(f"Invalid range {start}-{end} for PDF with {total} pages")
+    return [(f"pages_{start}-{end}.pdf", start, end)]
 
-    writer = PdfWriter()
-    for i in range(start - 1, end):
-        writer.add_page(reader.pages[i])
 
-    out_path = output_dir / f"pages_{start}-{end}.pdf"
-    with open(out_path, "wb") as f:
-        writer.write(f)
+def _named_ranges(total: int, ranges: list[tuple[int, int]]) -> list[tuple[str, int, int]]:
+    for start, end in ranges:
+        if end > total:
+            raise ValueError(f"Invalid range {start}-{end} for PDF with {total} pages")
+    return [(f"page_{start}.pdf" if start == end else f"pages_{start}-{end}.pdf", start, end)
+            for start, end in ranges]
+
+
+def _chunk_ranges(total: int, chunk_size: int) -> list[tuple[str, int, int]]:
+    return _named_ranges(total, [(start, min(start + chunk_size - 1, total))
+                                 for start in range(1, total + 1, chunk_size)])
+
+
+def _bookmark_ranges(reader: PdfReader) -> list[tuple[str, int, int]]:
+    total = len(reader.pages)
+    starts = {}  # first page index -> title; later bookmarks on the same page win
+    for item in reader.outline:
+        if isinstance(item, list):
+            continue  # children of the previous top-level item
+        page_index = reader.get_destination_page_number(item)
+        if page_index is not None and 0 <= page_index < total:
+            starts[page_index] = str(item.title or "").strip()
+    if not starts:
+        raise ValueError("PDF has no bookmarks to split by")
+
+    if 0 not in starts:
+        starts[0] = "Front matter"
+    sections = sorted(starts.items())
+
+    ranges = []
+    for i, (first, title) in enumerate(sections):
+        last = sections[i + 1][0] if i + 1 < len(sections) else total
+        ranges.append((f"{i + 1:02d}_{_safe_title(title) or 'section'}.pdf", first + 1, last))
+    return ranges
+
+
+def _write_ranges(
+    reader: PdfReader, output_dir: Path, ranges: list[tuple[str, int, int]], strip_unused: bool = False,
+) -> list[Path]:
+    return [_write_range(reader, start, end, output_dir / name, strip_unused) for name, start, end in ranges]
+
 
+def _write_range(reader: PdfReader, start: int, end: int, out_path: Path, strip_unused: bool = False) -> Path:
+    with open(out_path, "wb") as f:
+        _range_writer(reader, start, end, strip_unused).write(f)
     return out_path
+
+
+def _range_writer(reader: PdfReader, start: int, end: int, strip_unused: bool = False) -> PdfWriter:
+    writer = PdfWriter()
+    pages = [reader.pages[i] for i in range(start - 1, end)]
+    if strip_unused:
+        _ResourcePruner(writer, pages).add_pages()
+    else:
+        for page in pages:
+            writer.add_page(page)
+    return writer
+
+
+class _ResourcePruner:
+    """Adds pages to a writer with only the named resources the output uses.
+
+    Many PDFs hang one resource dictionary holding every font and image in
+    the document off the page tree, so a plain copy of one page carries all
+    of them. Each resource dictionary is filtered once per output, to the
+    names any of its pages refer to, and pages that shared it still share
+    the filtered copy. So an output is never bigger than without stripping.
+    Only the named entries are filtered — a kept form XObject keeps its own
+    resources whole. The reader's pages are never modified, since they may
+    belong to a cached document session.
+    """
+
+    def __init__(self, writer: PdfWriter, pages: list[PageObject]):
+        self.writer = writer
+        self.pages = []  # (page, names its content uses or None if unreadable)
+        self.used: dict[int, set[str]] = {}  # named resource dict -> names used by the output's pages
+        for page in pages:
+            resources = page.get("/Resources")
+            try:
+                names = _used_names(page) if resources is not None else None
+            except Exception:
+                names = None  # unreadable content stream — copy the page as is
+            self.pages.append((page, names))
+            if names is None:
+                continue
+            for category, entries in resources.get_object().items():
+                entries = entries.get_object()
+                if category in _NAMED_RESOURCES and isinstance(entries, DictionaryObject):
+                    self.used.setdefault(id(entries), set()).update(names)
+        self._copies: dict[int, PdfObject] = {}  # source object id -> filtered copy in the writer
+
+    def add_pages(self):
+        for page, names in self.pages:
+            resources = self._filtered_resources(page) if names is not None else None
+            if resources is None:
+                self.writer.add_page(page)
+            else:
+                copy = self.writer.add_page(page, excluded_keys=("/Resources",))
+                copy[NameObject("/Resources")] = resources
+
+    def _filtered_resources(self, page: PageObject) -> PdfObject | None:
+        """The page's resources filtered to what the output uses, or None if nothing is dropped."""
+        raw = page.raw_get("/Resources")
+        source = raw.get_object()
+        filtered = DictionaryObject()
+        changed = False
+        for category, entries in source.items():
+            names = entries.get_object()
+            if category in _NAMED_RESOURCES and isinstance(names, DictionaryObject):
+                keep = {name: ref for name, ref in names.items() if name in self.used[id(names)]}
+                if len(keep) < len(names):
+                    entries = self._copy(entries, DictionaryObject(keep))
+                    changed = True
+            filtered[NameObject(category)] = entries
+        if not changed:
+            return None
+        return self._copy(raw, filtered)
+
+    def _copy(self, original: PdfObject, filtered: DictionaryObject) -> PdfObject:
+        """`filtered` in the writer: once, and shared, if `original` is an indirect object.
+
+        Resources inherited from the page tree are copied onto each page as
+        the resolved object, which still has its indirect_reference.
+        """
+        if not isinstance(original, IndirectObject) and getattr(original, "indirect_reference", None) is None:
+            return filtered.clone(self.writer)
+        key = id(original.get_object())
+        if key not in self._copies:
+            self._copies[key] = self.writer._add_object(filtered.clone(self.writer))  # private, see the pypdf pin
+        return self._copies[key]
+
+
+def _used_names(page: PageObject) -> set[str]:
+    """Every /Name token in a page's content streams (a superset of the resources it uses)."""
+    contents = page.get_contents()
+    if contents is None:
+        return set()
+    names = set()
+    for token in _NAME_TOKEN.findall(contents.get_data()):
+        token = re.sub(rb"#([0-9A-Fa-f]{2})", lambda m: bytes([int(m.group(1), 16)]), token)
+        names.add("/" + token.decode("utf-8", "replace"))
+    return names
+
+
+def _safe_title(title: str) -> str:
+    return re.sub(r"[^\w\- ]+", "", title).strip().replace(" ", "_")[:60]
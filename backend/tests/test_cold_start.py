@@ -0,0 +1,25 @@
+"""Cold start budgets: `import main`, and launch to the first /api/convert response.
+
+Same measurements as benchmarks.cold_start, each in a fresh interpreter.
+Run from backend/ with `python -m pytest`.
+"""
+from benchmarks.cold_start import (
+    CONVERTER_MODULES, FIRST_RESPONSE_BUDGET_S, IMPORT_BUDGET_MS, import_profile, measure,
+)
+
+
+def test_import_main_within_budget():
+    total_ms, rows = import_profile(repeat=3)
+    assert total_ms <= IMPORT_BUDGET_MS
+
+    imported = {name.strip() for _, _, name in rows}
+    assert imported.isdisjoint(CONVERTER_MODULES)
+
+
+def test_first_convert_within_budget(tmp_path):
+    path = tmp_path / "hello.txt"
+    path.write_text("Hello, world\n")
+    for warm_up in (False, True):
+        result = measure(path, warm_up, idle=0)
+        assert result["status"] == 200
+        assert result["launch_s"] <= FIRST_RESPONSE_BUDGET_S
@@ -0,0 +1,53 @@
+"""Jobs that run past their timeout give their pool worker or thread back."""
+import time
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+from utils import executor
+from utils.executor import pending_jobs, run_in_pool, run_in_thread, shutdown_pool
+
+
+async def wait_for_pending(count: int, seconds: float = 10):
+    deadline = time.monotonic() + seconds
+    while pending_jobs() != count and time.monotonic() < deadline:
+        await asyncio.sleep(0.05)
+    return pending_jobs()
+
+
+def test_stuck_pool_job_is_killed_and_its_worker_replaced():
+    async def scenario():
+        try:
+            stuck = [asyncio.create_task(run_in_pool(time.sleep, 600, timeout=1)) for _ in range(executor.MAX_WORKERS)]
+            for task in stuck:
+                with pytest.raises(HTTPException) as e:
+                    await task
+                assert e.value.status_code == 504
+
+            # Every worker of the first pool was busy for good; a new one answers
+            assert await run_in_pool(pow, 2, 10, timeout=30) == 1024
+            assert await wait_for_pending(0) == 0
+        finally:
+            shutdown_pool()
+
+    asyncio.run(scenario())
+
+
+def test_stuck_thread_gives_its_slot_back():
+    async def scenario():
+        try:
+            stuck = [asyncio.create_task(run_in_thread(time.sleep, 3, timeout=0.2)) for _ in range(executor.MAX_WORKERS)]
+            for task in stuck:
+                with pytest.raises(HTTPException) as e:
+                    await task
+                assert e.value.status_code == 504
+            assert pending_jobs() == 0
+
+            started = time.monotonic()
+            assert await run_in_thread(pow, 2, 10, timeout=1) == 1024
+            assert time.monotonic() - started < 1
+        finally:
+            shutdown_pool()
+
+    asyncio.run(scenario())
@@ -0,0 +1,189 @@
+"""Jobs and documents shared between workers through a job backend.
+
+Each JobStore stands for one uvicorn worker or node: it has its own temp
+directory and only the object store in common with the others. Run from
+backend/ with `python -m pytest`.
+"""
+import asyncio
+from pathlib import Path
+
+import pytest
+from fastapi import HTTPException
+from pypdf import PdfReader, PdfWriter
+
+from utils.document_sessions import DOCUMENT_FILE, DocumentSessions
+from utils.job_storage import JobBackend, LocalObjectStore, ObjectStoreJobBackend
+from utils.job_store import JobStore
+
+
+def make_stores(tmp_path: Path) -> tuple[JobStore, JobStore]:
+    store = LocalObjectStore(tmp_path / "objects")
+    return (
+        JobStore(tmp_path / "node_a", max_age=600, backend=ObjectStoreJobBackend(store)),
+        JobStore(tmp_path / "node_b", max_age=600, backend=ObjectStoreJobBackend(store)),
+    )
+
+
+async def read_body(response) -> bytes:
+    return b"".join([chunk async for chunk in response.body_iterator])
+
+
+def test_job_status_and_result_from_another_store(tmp_path):
+    node_a, node_b = make_stores(tmp_path)
+
+    async def scenario():
+        job = node_a.create()
+        job.total = 2
+
+        async def work():
+            job.advance(2)
+            result = job.dir / "merged.pdf"
+            result.write_bytes(b"%PDF-1.4 result")
+            job.set_result(result)
+            job.stats = {"pages": 2}
+
+        node_a.submit(job, work())
+        while job.status != "done":
+            await asyncio.sleep(0.01)
+        await node_a.save(job)
+
+        found = await node_b.find(job.id)
+        assert found is not None
+        assert found.to_dict() == job.to_dict()
+        assert not found.result_path.exists()  # nothing on node B's disk
+        response = node_b.result_response(found)
+        assert response.headers["content-type"] == "application/pdf"
+        assert await read_body(response) == b"%PDF-1.4 result"
+
+        assert await node_b.find("0" * 32) is None
+
+    asyncio.run(scenario())
+
+
+def test_expired_job_is_removed_from_the_backend(tmp_path):
+    node_a, node_b = make_stores(tmp_path)
+
+    async def scenario():
+        job = node_a.create()
+        node_a.submit(job, asyncio.sleep(0))
+        while job.status != "failed":  # no result was set
+            await asyncio.sleep(0.01)
+        await node_a.save(job)
+        assert (await node_b.find(job.id)).status == "failed"
+
+        job.updated -= node_a.max_age + 1
+        node_a._expiry = [(0, job.id)]
+        await node_a.sweep()
+        assert not job.dir.exists()
+        assert await node_b.find(job.id) is None
+
+    asyncio.run(scenario())
+
+
+def test_document_opened_on_another_store(tmp_path):
+    node_a, node_b = make_stores(tmp_path)
+    sessions_a = DocumentSessions(1024 * 1024, node_a)
+    sessions_b = DocumentSessions(1024 * 1024, node_b)
+
+    async def scenario():
+        job = node_a.create()
+        writer = PdfWriter()
+        for _ in range(3):
+            writer.add_blank_page(200, 200)
+        writer.write(job.dir / DOCUMENT_FILE)
+        added = await sessions_a.add(job, "three.pdf", 1234, "ab" * 32)
+
+        doc = await sessions_b.get(added.id)
+        assert doc is not None
+        assert (doc.filename, doc.size, doc.sha256) == ("three.pdf", 1234, "ab" * 32)
+        assert doc.path.parent == tmp_path / "node_b" / added.id
+        assert await sessions_b.run(doc, lambda reader: len(reader.pages)) == 3
+        assert await sessions_b.get(added.id) is doc
+
+        assert await sessions_b.get("0" * 32) is None
+
+    asyncio.run(scenario())
+
+
+def test_document_kept_while_another_store_uses_it(tmp_path):
+    node_a, node_b = make_stores(tmp_path)
+    sessions_a = DocumentSessions(1024 * 1024, node_a)
+    sessions_b = DocumentSessions(1024 * 1024, node_b)
+
+    async def scenario():
+        job = node_a.create()
+        writer = PdfWriter()
+        writer.add_blank_page(200, 200)
+        writer.write(job.dir / DOCUMENT_FILE)
+        await sessions_a.add(job, "one.pdf", 100, "cd" * 32)
+
+        # Node A last saw the document long ago, node B uses it now
+        job.updated -= node_a.max_age + 1
+        node_a._expiry = [(0, job.id)]
+        doc = await sessions_b.get(job.id)
+        await sessions_b.run(doc, lambda reader: None)
+        await node_b.save(doc.job)
+
+        await node_a.sweep()
+        assert node_a.get(job.id) is not None
+        assert len(PdfReader(job.dir / DOCUMENT_FILE).pages) == 1
+
+    asyncio.run(scenario())
+
+
+def test_missing_objects(tmp_path):
+    backend = ObjectStoreJobBackend(LocalObjectStore(tmp_path / "objects"))
+    job_id = "0" * 32
+
+    assert backend.load(job_id, tmp_path) is None
+    with pytest.raises(HTTPException) as error:
+        backend.result_response(job_id, "merged.pdf", "application/pdf")
+    assert error.value.status_code == 404
+    assert not backend.fetch(job_id, "document.pdf", tmp_path / "document.pdf")
+    assert list(tmp_path.iterdir()) == []  # no partial download left behind
+    backend.delete([job_id])
+
+
+def test_objects_expired_from_the_store(tmp_path):
+    node_a, node_b = make_stores(tmp_path)
+    sessions_a = DocumentSessions(1024 * 1024, node_a)
+    sessions_b = DocumentSessions(1024 * 1024, node_b)
+
+    async def scenario():
+        job = node_a.create()
+        result = job.dir / "merged.pdf"
+        result.write_bytes(b"%PDF-1.4 result")
+        node_a.submit(job, asyncio.to_thread(job.set_result, result))
+        while job.status != "done":
+            await asyncio.sleep(0.01)
+        await node_a.save(job)
+
+        # A bucket lifecycle rule removed the result but not the record
+        node_a.backend.store.delete_prefix(f"jobs/{job.id}/result/")
+        found = await node_b.find(job.id)
+        assert found.status == "done"
+        with pytest.raises(HTTPException) as error:
+            node_b.result_response(found)
+        assert error.value.status_code == 404
+
+        doc_job = node_a.create()
+        PdfWriter().write(doc_job.dir / DOCUMENT_FILE)
+        await sessions_a.add(doc_job, "gone.pdf", 10, "ef" * 32)
+        node_a.backend.store.delete_prefix(f"jobs/{doc_job.id}/result/")
+        assert await sessions_b.get(doc_job.id) is None
+        assert not (tmp_path / "node_b" / doc_job.id / DOCUMENT_FILE).exists()
+
+        # ...and then the records
+        node_a.backend.store.delete_prefix(f"jobs/{job.id}/")
+        assert await node_b.find(job.id) is None
+
+    asyncio.run(scenario())
+
+
+def test_backend_missing_a_method_fails_at_construction():
+    class Incomplete(JobBackend):
+        def save(self, job_id, record, job_dir):
+            pass
+
+    with pytest.raises(TypeError):
+        Incomplete()
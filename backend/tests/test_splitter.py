@@ -0,0 +1,84 @@
+"""strip_unused on PDFs whose pages share one resource dictionary.
+
+Run from backend/ with `python -m pytest`.
+"""
+import os
+
+import pytest
+from pypdf import PdfReader, PdfWriter
+from pypdf.generic import DecodedStreamObject, DictionaryObject, NameObject, NumberObject
+
+from services.splitter import split_by_mode
+
+PAGES = 4
+
+
+def make_pdf(path, inherited: bool):
+    """A PDF whose pages each draw one of PAGES images, all in one shared /XObject dictionary.
+
+    With `inherited`, the dictionary hangs off the page tree instead of each page.
+    """
+    writer = PdfWriter()
+    images = DictionaryObject()
+    for i in range(PAGES):
+        image = DecodedStreamObject()
+        image.set_data(os.urandom(30_000))  # incompressible, so unused images show in the size
+        image.update({
+            NameObject("/Type"): NameObject("/XObject"),
+            NameObject("/Subtype"): NameObject("/Image"),
+            NameObject("/Width"): NumberObject(100),
+            NameObject("/Height"): NumberObject(100),
+            NameObject("/ColorSpace"): NameObject("/DeviceRGB"),
+            NameObject("/BitsPerComponent"): NumberObject(8),
+        })
+        images[NameObject(f"/Im{i}")] = writer._add_object(image)
+    resources = writer._add_object(DictionaryObject({NameObject("/XObject"): images}))
+
+    for i in range(PAGES):
+        page = writer.add_blank_page(200, 200)
+        content = DecodedStreamObject()
+        content.set_data(f"q 100 0 0 100 0 0 cm /Im{i} Do Q".encode())
+        page[NameObject("/Contents")] = writer._add_object(content)
+        if inherited:
+            del page["/Resources"]
+        else:
+            page[NameObject("/Resources")] = resources
+    if inherited:
+        writer._root_object["/Pages"].get_object()[NameObject("/Resources")] = resources
+    writer.write(path)
+    return path
+
+
+def split_sizes(source, tmp_path, params: dict) -> tuple[list[int], list[int]]:
+    sizes = []
+    for strip in (False, True):
+        output_dir = tmp_path / f"strip_{strip}"
+        output_dir.mkdir(exist_ok=True)
+        files = split_by_mode(source, output_dir, {**params, "strip_unused": strip})
+        sizes.append([f.stat().st_size for f in files])
+    return sizes[0], sizes[1]
+
+
+def image_names(path) -> list[set[str]]:
+    return [set(page["/Resources"]["/XObject"]) for page in PdfReader(path).pages]
+
+
+@pytest.mark.parametrize("inherited", [False, True])
+def test_strip_unused_drops_images_other_pages_use(tmp_path, inherited):
+    source = make_pdf(tmp_path / "shared.pdf", inherited)
+
+    plain, stripped = split_sizes(source, tmp_path, {"mode": "all"})
+    assert all(s < p / 2 for p, s in zip(plain, stripped))
+    assert image_names(tmp_path / "strip_True" / "page_2.pdf") == [{"/Im1"}]
+
+    plain, stripped = split_sizes(source, tmp_path, {"mode": "range", "start": 2, "end": 3})
+    assert stripped[0] < plain[0] * 0.6
+    assert image_names(tmp_path / "strip_True" / "pages_2-3.pdf") == [{"/Im1", "/Im2"}] * 2
+
+
+@pytest.mark.parametrize("inherited", [False, True])
+def test_strip_unused_never_grows_output(tmp_path, inherited):
+    # Every image is used by some page of the output: nothing to drop
+    source = make_pdf(tmp_path / "shared.pdf", inherited)
+    plain, stripped = split_sizes(source, tmp_path, {"mode": "range", "start": 1, "end": PAGES})
+    assert stripped[0] <= plain[0]
@@ -0,0 +1,74 @@
+"""Uploads on UploadRoute endpoints: streamed to disk once, rejected as soon as they are too large."""
+import asyncio
+import hashlib
+
+import httpx
+from fastapi import APIRouter, FastAPI, File, UploadFile
+
+from utils import uploads
+from utils.uploads import UploadRoute, save_upload
+
+
+def make_app(tmp_path) -> FastAPI:
+    router = APIRouter(route_class=UploadRoute)
+
+    @router.post("/upload")
+    async def upload(file: UploadFile = File(...)):
+        saved = await save_upload(file, tmp_path / "saved.bin")
+        return {"size": saved.size, "sha256": saved.sha256, "streamed": isinstance(file, uploads.StreamedUpload)}
+
+    app = FastAPI()
+    app.include_router(router)
+    return app
+
+
+class CountingBody(httpx.AsyncByteStream):
+    """A request body sent in chunks, counting how many the server asked for."""
+
+    def __init__(self, body: bytes, chunk: int):
+        self.chunks = [body[i:i + chunk] for i in range(0, len(body), chunk)]
+        self.sent = 0
+
+    async def __aiter__(self):
+        for chunk in self.chunks:
+            self.sent += 1
+            yield chunk
+
+
+def post(app: FastAPI, data: bytes, chunk: int = 64 * 1024) -> tuple[httpx.Response, CountingBody]:
+    boundary = "b0undary"
+    body = (f"--{boundary}\r\nContent-Disposition: form-data; name=\"file\"; filename=\"a.pdf\"\r\n"
+            f"Content-Type: application/pdf\r\n\r\n").encode() + data + f"\r\n--{boundary}--\r\n".encode()
+    stream = CountingBody(body, chunk)
+
+    async def send():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+            return await client.post("/upload", content=stream,
+                                     headers={"Content-Type": f"multipart/form-data; boundary={boundary}"})
+
+    return asyncio.run(send()), stream
+
+
+def test_upload_is_moved_into_place(tmp_path, monkeypatch):
+    monkeypatch.setattr(uploads, "UPLOAD_DIR", tmp_path / "uploads")
+    data = bytes(range(256)) * 4096  # 1MB, past Starlette's in-memory spool size
+
+    r, _ = post(make_app(tmp_path), data)
+
+    assert r.status_code == 200
+    assert r.json() == {"size": len(data), "sha256": hashlib.sha256(data).hexdigest(), "streamed": True}
+    assert (tmp_path / "saved.bin").read_bytes() == data
+    assert list((tmp_path / "uploads").iterdir()) == []
+
+
+def test_too_large_upload_is_rejected_before_the_body_ends(tmp_path, monkeypatch):
+    monkeypatch.setattr(uploads, "UPLOAD_DIR", tmp_path / "uploads")
+    monkeypatch.setattr(uploads, "MAX_FILE_SIZE", 256 * 1024)
+
+    r, stream = post(make_app(tmp_path), b"x" * (4 * 1024 * 1024))
+
+    assert r.status_code == 400
+    assert "File too large" in r.json()["detail"]
+    assert stream.sent < len(stream.chunks) / 2
+    assert list((tmp_path / "uploads").iterdir()) == []
+    assert not (tmp_path / "saved.bin").exists()
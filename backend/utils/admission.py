@@ -0,0 +1,228 @@
+import os
+import math
+import time
+import asyncio
+from collections import deque
+from contextvars import ContextVar
+from pathlib import Path
+
+from fastapi.responses import JSONResponse
+from starlette.routing import Match
+
+from utils.metrics import metrics
+
+# Requests are admitted while the estimated cost of those in progress stays
+# under the budget; 0 admits everything. Cost is in bytes: roughly the disk
+# and memory a request ties up (its uploads, outputs and scratch parts).
+ADMISSION_BUDGET_BYTES = int(os.environ.get("ADMISSION_BUDGET_BYTES", 1024 * 1024 * 1024))  # 1GB
+ADMISSION_WAIT = float(os.environ.get("ADMISSION_WAIT", 5))  # seconds a request may queue before a 429
+REQUEST_COST = 1024 * 1024  # every admitted request, however small
+MAX_RETRY_AFTER = 120  # seconds
+
+# Cost per uploaded byte by file type: the upload itself plus its output,
+# and for converters that render in parts, the parts until they are joined.
+# Until the uploads are saved, a request is charged DEFAULT_WEIGHT per byte
+# of body.
+DEFAULT_WEIGHT = 3
+COST_WEIGHTS = {
+    ".pdf": 3,  # split outputs repeat shared fonts and images; merge keeps inputs and output
+    ".txt": 2, ".md": 2, ".html": 2, ".csv": 2,
+    ".docx": 4, ".doc": 4, ".xlsx": 4, ".xls": 4, ".pptx": 4, ".ppt": 4,  # compressed XML, rendered in parts
+    ".png": 3, ".jpg": 2, ".jpeg": 2, ".bmp": 2, ".tiff": 3, ".tif": 3,
+}
+
+
+class Ticket:
+    """What an admitted request holds; its cost is refined as uploads are saved."""
+
+    def __init__(self, cost: int, body_bytes: int):
+        self.cost = cost
+        self.body_bytes = body_bytes  # body not yet accounted for by charge()
+        self.charged = 0
+        self.admitted = time.monotonic()
+        self.handed_over = False  # a background job releases it instead of the request
+
+
+class Overloaded(Exception):
+    def __init__(self, retry_after: int):
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """Keeps the estimated cost of admitted requests under a budget.
+
+    Requests that don't fit wait in arrival order, so a large one isn't
+    passed over indefinitely by small ones; after `wait` seconds they are
+    turned away with a Retry-After computed from how fast cost has been
+    released lately. A request costing more than the whole budget is
+    admitted once it would run alone.
+    """
+
+    def __init__(self, budget: int, wait: float):
+        self.budget = budget
+        self.wait = wait
+        self.in_use = 0
+        self._waiters: deque[list] = deque()  # [cost, future], oldest first
+        self._hold_seconds = 2.0  # moving average of how long a ticket is held
+        self._returning: deque[tuple] = deque()  # (time told to retry at, cost) of turned-away requests
+
+    def queued(self) -> int:
+        return len(self._waiters)
+
+    async def acquire(self, cost: int, body_bytes: int) -> Ticket:
+        """Admit a request of estimated `cost`, waiting up to `wait` seconds. Raises Overloaded."""
+        cost = min(cost, self.budget)
+        if not self._waiters and self.in_use + cost <= self.budget:
+            self.in_use += cost
+            return Ticket(cost, body_bytes)
+
+        waiter = [cost, asyncio.get_running_loop().create_future()]
+        self._waiters.append(waiter)
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter[1]), self.wait)
+        except asyncio.TimeoutError:
+            if not waiter[1].done():
+                retry_after = self._retry_after(waiter)
+                self._waiters.remove(waiter)
+                waiter[1].cancel()
+                self._wake()  # those behind it may fit now
+                raise Overloaded(retry_after)
+        except asyncio.CancelledError:  # client went away
+            if waiter[1].done():
+                self.in_use -= waiter[0]
+            else:
+                self._waiters.remove(waiter)
+                waiter[1].cancel()
+            self._wake()
+            raise
+        return Ticket(waiter[0], body_bytes)
+
+    def release(self, ticket: Ticket):
+        self.in_use -= ticket.cost
+        held = time.monotonic() - ticket.admitted
+        self._hold_seconds = 0.8 * self._hold_seconds + 0.2 * held
+        self._wake()
+
+    def charge(self, ticket: Ticket, size: int, weight: float):
+        """Replace `size` bytes of the body's default estimate with their cost by file type."""
+        ticket.charged += math.ceil(size * weight)
+        ticket.body_bytes = max(ticket.body_bytes - size, 0)
+        self._resize(ticket, REQUEST_COST + ticket.charged + ticket.body_bytes * DEFAULT_WEIGHT)
+
+    def _retry_after(self, waiter: list) -> int:
+        """Seconds until a waiting request would likely fit, from recent hold times.
+
+        Counts the load ahead of it: requests queued before it and those
+        already turned away that will be back first, so requests rejected
+        together are told to return one after another.
+        """
+        now = time.monotonic()
+        self._returning = deque(r for r in self._returning if r[0] > now)
+        ahead = sum(cost for _, cost in self._returning)
+        for other in self._waiters:
+            if other is waiter:
+                break
+            ahead += other[0]
+        excess = self.in_use + ahead + waiter[0] - self.budget
+        seconds = 1
+        if excess > 0 and self.in_use > 0:
+            # In-progress cost drains at about in_use / hold_seconds bytes per second
+            seconds = min(max(math.ceil(excess * self._hold_seconds / self.in_use), 1), MAX_RETRY_AFTER)
+        self._returning.append((now + seconds, waiter[0]))
+        return seconds
+
+    def _resize(self, ticket: Ticket, cost: int):
+        # Past admission, a larger estimate only delays later requests
+        cost = min(cost, self.budget)
+        self.in_use += cost - ticket.cost
+        ticket.cost = cost
+        self._wake()
+
+    def _wake(self):
+        while self._waiters:
+            cost, future = self._waiters[0]
+            if future.done():
+                self._waiters.popleft()
+                continue
+            if self.in_use + cost > self.budget and self.in_use > 0:
+                return
+            self._waiters.popleft()
+            self.in_use += cost
+            future.set_result(None)
+
+
+admission = AdmissionController(ADMISSION_BUDGET_BYTES, ADMISSION_WAIT)
+_ticket: ContextVar[Ticket | None] = ContextVar("admission_ticket", default=None)
+
+
+def charge(filename: str, size: int):
+    """Account a saved file of the current request at its type's cost per byte."""
+    ticket = _ticket.get()
+    if ticket is not None:
+        admission.charge(ticket, size, COST_WEIGHTS.get(Path(filename).suffix.lower(), DEFAULT_WEIGHT))
+
+
+def hand_over() -> Ticket | None:
+    """Take the current request's ticket for a background job, which must release() it when done."""
+    ticket = _ticket.get()
+    if ticket is not None:
+        ticket.handed_over = True
+    return ticket
+
+
+def release(ticket: Ticket | None):
+    if ticket is not None:
+        admission.release(ticket)
+
+
+class AdmissionMiddleware:
+    """ASGI middleware: admits POST requests by estimated cost, before their body is read.
+
+    The estimate starts from Content-Length (a request without one counts
+    as one maximum-size upload) and is refined by charge() as uploads are
+    saved. The ticket is held until the response has been sent, or by the
+    background job the request started.
+    """
+
+    def __init__(self, app, max_body: int):
+        self.app = app
+        self.max_body = max_body
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "POST" or not admission.budget:
+            return await self.app(scope, receive, send)
+
+        headers = dict(scope["headers"])
+        length = headers.get(b"content-length")
+        body_bytes = int(length) if length and length.isdigit() else self.max_body
+        route = _route(scope)
+        label = route.path if route is not None else "unmatched"
+
+        started = time.perf_counter()
+        try:
+            ticket = await admission.acquire(REQUEST_COST + body_bytes * DEFAULT_WEIGHT, body_bytes)
+        except Overloaded as e:
+            metrics.admission_rejected.inc(1, label)
+            if route is not None:
+                scope["route"] = route  # what routing would have set, for the request metrics
+            response = JSONResponse(
+                {"detail": "Server is busy, please retry later"}, 429, headers={"Retry-After": str(e.retry_after)},
+            )
+            return await response(scope, receive, send)
+        metrics.admission_wait_seconds.observe(time.perf_counter() - started, label)
+
+        token = _ticket.set(ticket)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _ticket.reset(token)
+            if not ticket.handed_over:
+                admission.release(ticket)
+
+
+def _route(scope):
+    """The route a request will reach, for metric labels."""
+    for route in scope["app"].router.routes:
+        if route.matches(scope)[0] == Match.FULL:
+            return route
+    return None
@@ -0,0 +1,159 @@
+import os
+import asyncio
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from pypdf import PdfReader
+
+from utils.executor import JOB_TIMEOUT, run_in_thread
+from utils.job_store import Job, JobStore, job_store
+
+# Parsed readers hold the whole file in memory plus whatever objects have been
+# resolved, so the budget is counted in source file bytes.
+MAX_READER_BYTES = int(os.environ.get("DOCUMENT_CACHE_MAX_BYTES", 256 * 1024 * 1024))
+DOCUMENT_FILE = "document.pdf"  # in the document's job directory
+
+
+@dataclass
+class Document:
+    """A PDF uploaded once and kept for repeated operations."""
+    job: Job
+    path: Path
+    filename: str
+    size: int
+    sha256: str
+    lock: threading.Lock = field(default_factory=threading.Lock)  # one operation at a time per reader
+
+    @property
+    def id(self) -> str:
+        return self.job.id
+
+
+class DocumentSessions:
+    """Registry of uploaded documents plus an LRU of their parsed readers.
+
+    Documents share their job's lifetime: once the job expires the handle
+    stops resolving. Readers are evicted oldest-first once their combined
+    source size passes `max_bytes`, and re-parsed on the next use.
+
+    A document's record and file go through the job backend, so another
+    uvicorn worker, or another node with JOB_STORAGE=object, re-opens a
+    handle it has not seen before instead of answering 404.
+    """
+
+    def __init__(self, max_bytes: int, jobs: JobStore = job_store):
+        self.max_bytes = max_bytes
+        self.jobs = jobs
+        self.parses = 0
+        self.reuses = 0
+        self._documents: dict[str, Document] = {}
+        self._readers: OrderedDict[str, tuple[PdfReader, int]] = OrderedDict()  # id -> (reader, size)
+        self._bytes = 0
+        self._lock = threading.Lock()  # readers are looked up from worker threads
+
+    async def add(self, job: Job, filename: str, size: int, sha256: str) -> Document:
+        """Register the PDF saved as DOCUMENT_FILE in the job's directory, and share it with other workers."""
+        self.prune()
+        job.document = {"filename": filename, "size": size, "sha256": sha256}
+        doc = self._open(job)
+        await asyncio.to_thread(self.jobs.backend.publish, job.id, doc.path)
+        await self.jobs.save(job)
+        self._documents[doc.id] = doc
+        return doc
+
+    async def get(self, doc_id: str) -> Document | None:
+        """A document of this worker, or one another worker added, re-opened from the job backend."""
+        doc = self._documents.get(doc_id)
+        if doc is not None:
+            if self.jobs.get(doc_id) is None:
+                self._forget(doc_id)
+                return None
+            return doc
+
+        job = await self.jobs.find(doc_id)
+        if job is None or job.document is None:
+            return None
+        if not await asyncio.to_thread(self._fetch, job):
+            return None
+        if doc_id not in self._documents:  # unless another request opened it meanwhile
+            self.jobs.adopt(job)
+            self._documents[doc_id] = self._open(job)
+        return self._documents[doc_id]
+
+    def prune(self):
+        """Forget documents whose job has expired, releasing their readers."""
+        for doc_id in list(self._documents):
+            if self.jobs.get(doc_id) is None:
+                self._forget(doc_id)
+
+    def stats(self) -> dict:
+        return {
+            "documents": len(self._documents),
+            "cached_readers": len(self._readers),
+            "reader_bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+            "parses": self.parses,
+            "reuses": self.reuses,
+        }
+
+    async def run(self, doc: Document, func, *args):
+        """Call func(reader, *args) in a worker thread with the document's parsed reader.
+
+        Runs under the process pool's queue limit and timeout (run_in_thread),
+        since the reader lives in this process and can't go to a worker.
+        """
+        self.use(doc)
+        return await run_in_thread(self._call, doc, func, args)
+
+    def use(self, doc: Document):
+        """Mark the document as in use, here and for other workers that might expire it."""
+        doc.job.touch()
+        self.jobs.save(doc.job)
+
+    def _open(self, job: Job) -> Document:
+        return Document(job=job, path=job.dir / DOCUMENT_FILE, **job.document)
+
+    def _fetch(self, job: Job) -> bool:
+        job.dir.mkdir(parents=True, exist_ok=True)
+        return self.jobs.backend.fetch(job.id, DOCUMENT_FILE, job.dir / DOCUMENT_FILE)
+
+    def _call(self, doc: Document, func, args: tuple):
+        # Bounded, so calls queued behind one that got stuck give their threads back
+        if not doc.lock.acquire(timeout=JOB_TIMEOUT):
+            raise TimeoutError("Another operation on this document is still running")
+        try:
+            return func(self._reader(doc), *args)
+        finally:
+            doc.lock.release()
+
+    def _reader(self, doc: Document) -> PdfReader:
+        with self._lock:
+            if doc.id in self._readers:
+                self._readers.move_to_end(doc.id)
+                self.reuses += 1
+                return self._readers[doc.id][0]
+
+        reader = PdfReader(str(doc.path))
+        with self._lock:
+            self.parses += 1
+            if doc.size <= self.max_bytes and doc.id not in self._readers:
+                self._readers[doc.id] = (reader, doc.size)
+                self._bytes += doc.size
+                while self._bytes > self.max_bytes:
+                    self._drop_reader(next(iter(self._readers)))
+        return reader
+
+    def _forget(self, doc_id: str):
+        self._documents.pop(doc_id, None)
+        with self._lock:
+            self._drop_reader(doc_id)
+
+    def _drop_reader(self, doc_id: str):
+        entry = self._readers.pop(doc_id, None)
+        if entry is not None:
+            self._bytes -= entry[1]
+
+
+document_sessions = DocumentSessions(MAX_READER_BYTES)
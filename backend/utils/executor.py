@@ -0,0 +1,285 @@
+import os
+import asyncio
+import multiprocessing
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from fastapi import HTTPException
+
+# Pool sizing — override via env on the deployed instance
+MAX_WORKERS = int(os.environ.get("PDF_POOL_WORKERS", os.cpu_count() or 1))
+MAX_QUEUE = int(os.environ.get("PDF_POOL_QUEUE", 32))         # jobs allowed to wait for a worker
+JOB_TIMEOUT = float(os.environ.get("PDF_JOB_TIMEOUT", 120))   # seconds per job
+# 1: start every worker at startup and load all the converters' libraries in it.
+# Off by default: a request that arrives with the app (a sleeping instance
+# woken by it) would wait behind the warm-up, which loads every format.
+WARM_UP = os.environ.get("PDF_POOL_WARMUP", "0") == "1"
+
+_pool: ProcessPoolExecutor | None = None
+_pool_jobs: dict[ProcessPoolExecutor, set[Future]] = {}  # unfinished jobs of each pool, current or retired
+_retired: set[ProcessPoolExecutor] = set()  # pools replaced because a job got stuck, not yet killed
+_threads: ThreadPoolExecutor | None = None  # run_in_thread calls; MAX_WORKERS run at once
+_pending = 0  # submitted jobs that have not finished (running + queued), pool and thread
+
+
+def get_pool() -> ProcessPoolExecutor:
+    """Return the shared process pool, creating it on first use."""
+    global _pool
+    if _pool is None:
+        # spawn: workers must not inherit the event loop or threadpool state
+        _pool = ProcessPoolExecutor(
+            max_workers=MAX_WORKERS,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+    return _pool
+
+
+def shutdown_pool():
+    """Stop the pool. Queued jobs are cancelled, running ones are abandoned.
+
+    Workers of pools retired for a stuck job are killed, and so are
+    queued run_in_thread calls.
+    """
+    global _threads
+    _drop_pool()
+    for pool in list(_retired):
+        _kill(pool)
+    if _threads is not None:
+        _threads.shutdown(wait=False, cancel_futures=True)
+        _threads = None
+
+
+def _drop_pool():
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+async def warm_up_pool(func):
+    """Start every worker by running `func` (which should load what jobs need) in each.
+
+    Workers are spawned on demand, one per job that finds none idle, so
+    MAX_WORKERS calls at once start them all. Failures are left for real
+    jobs to report.
+    """
+    await map_in_pool(func, [()] * MAX_WORKERS, return_exceptions=True)
+
+
+def pending_jobs() -> int:
+    return _pending
+
+
+async def run_in_pool(func, *args, timeout: float | None = None):
+    """Run a CPU-bound function in the process pool without blocking the event loop.
+
+    Raises HTTPException 503 when the queue is full and 504 when the job
+    exceeds its timeout. Exceptions raised by `func` propagate unchanged.
+    """
+    global _pending
+    if _pending >= MAX_WORKERS + MAX_QUEUE:
+        raise HTTPException(503, "Server is busy, please retry shortly")
+
+    loop = asyncio.get_running_loop()
+    pool = get_pool()
+    try:
+        future = pool.submit(func, *args)
+    except BrokenProcessPool:
+        # A worker died (e.g. OOM) — replace the pool and retry once
+        _drop_pool()
+        pool = get_pool()
+        future = pool.submit(func, *args)
+
+    # The slot is held until the worker really finishes, not when we stop
+    # waiting, so timed-out jobs still count against the pool size until
+    # their worker is killed.
+    _pending += 1
+    _pool_jobs.setdefault(pool, set()).add(future)
+    future.add_done_callback(lambda _: _call_from_worker_thread(loop, _finish_pool_job, pool, future))
+
+    timeout = timeout if timeout is not None else JOB_TIMEOUT
+    started = loop.time()
+    waiter = asyncio.wrap_future(future)
+    waiter.add_done_callback(lambda f: f.cancelled() or f.exception())  # a caller that gave up won't read it
+    try:
+        return await asyncio.wait_for(asyncio.shield(waiter), timeout)
+    except asyncio.TimeoutError:
+        if not future.cancel():  # only succeeds if it never started
+            _retire_pool(pool, future)
+        raise HTTPException(504, "Processing timed out")
+    except asyncio.CancelledError:
+        # Caller went away (e.g. client disconnected mid-stream): drop the job
+        # if it is queued, else still hold it to its timeout
+        if not future.cancel():
+            _watch(future, pool, timeout - (loop.time() - started))
+        raise
+    except BrokenProcessPool:
+        if pool is _pool:
+            _drop_pool()
+        raise HTTPException(500, "Worker process crashed while processing the file")
+
+
+async def run_in_thread(func, *args, timeout: float | None = None):
+    """Run CPU-bound work that needs this process's state in a thread, within the pool's limits.
+
+    For work on objects that can't be sent to a worker, such as a cached
+    parsed PDF. Calls share the pool's queue limit (503) and timeout (504),
+    and at most MAX_WORKERS run at once. A thread can't be stopped, so one
+    that times out is abandoned: its slot is given back and later calls
+    run on a fresh set of threads.
+    """
+    global _pending
+    if _pending >= MAX_WORKERS + MAX_QUEUE:
+        raise HTTPException(503, "Server is busy, please retry shortly")
+
+    loop = asyncio.get_running_loop()
+    threads = _get_threads()
+    future = threads.submit(func, *args)
+    _pending += 1
+    release = _once(_release)
+    future.add_done_callback(lambda _: _call_from_worker_thread(loop, release))
+
+    waiter = asyncio.wrap_future(future)
+    waiter.add_done_callback(lambda f: f.cancelled() or f.exception())  # a caller that gave up won't read it
+    try:
+        return await asyncio.wait_for(asyncio.shield(waiter), timeout if timeout is not None else JOB_TIMEOUT)
+    except asyncio.TimeoutError:
+        if not future.cancel():
+            _abandon_threads(threads)
+            release()
+        raise HTTPException(504, "Processing timed out")
+    except asyncio.CancelledError:
+        future.cancel()  # only if it hasn't started; a started call runs to the end
+        raise
+
+
+async def map_in_pool(func, arg_list: list[tuple], return_exceptions: bool = False) -> list:
+    """Run `func` over every argument tuple in parallel, returning results in input order.
+
+    At most MAX_WORKERS calls from one batch are in flight at a time, so a
+    large batch keeps every core busy without filling the shared queue.
+    """
+    run_one = _bounded(func, return_exceptions)
+    return await asyncio.gather(*(run_one(args) for args in arg_list))
+
+
+async def iter_in_pool(func, arg_list: list[tuple], return_exceptions: bool = False):
+    """Like map_in_pool, but yield each result as soon as it and all earlier ones are done.
+
+    Later calls keep running ahead while the caller consumes earlier
+    results, which lets a response start streaming before the batch ends.
+    """
+    run_one = _bounded(func, return_exceptions)
+    tasks = [asyncio.create_task(run_one(args)) for args in arg_list]
+    try:
+        for task in tasks:
+            yield await task
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+def _bounded(func, return_exceptions: bool):
+    limit = asyncio.Semaphore(MAX_WORKERS)
+
+    async def run_one(args):
+        async with limit:
+            try:
+                return await run_in_pool(func, *args)
+            except Exception as e:
+                if not return_exceptions:
+                    raise
+                return e
+
+    return run_one
+
+
+def _release():
+    global _pending
+    _pending -= 1
+
+
+def _once(func):
+    called = False
+
+    def call():
+        nonlocal called
+        if not called:
+            called = True
+            func()
+
+    return call
+
+
+def _call_from_worker_thread(loop: asyncio.AbstractEventLoop, func, *args):
+    try:
+        loop.call_soon_threadsafe(func, *args)
+    except RuntimeError:
+        pass  # loop already closed during shutdown
+
+
+def _finish_pool_job(pool: ProcessPoolExecutor, future: Future):
+    _release()
+    jobs = _pool_jobs.get(pool)
+    if jobs is not None:
+        jobs.discard(future)
+        if not jobs:
+            del _pool_jobs[pool]
+
+
+def _retire_pool(pool: ProcessPoolExecutor, stuck: Future):
+    """Replace a pool with a job stuck past its timeout, then kill its workers.
+
+    A single worker can't be stopped, so new jobs go to a fresh pool while
+    the old one finishes its other jobs (for at most JOB_TIMEOUT). Then all
+    its processes are killed, which fails the stuck job and frees its slot.
+    """
+    global _pool
+    if pool is not _pool:
+        return  # already retired (or replaced after a crash)
+    _pool = None
+    _retired.add(pool)
+    others = [asyncio.wrap_future(f) for f in _pool_jobs.get(pool, ()) if f is not stuck]
+    asyncio.get_running_loop().create_task(_kill_when_done(pool, others))
+
+
+async def _kill_when_done(pool: ProcessPoolExecutor, others: list[asyncio.Future]):
+    if others:
+        await asyncio.wait(others, timeout=JOB_TIMEOUT)
+    _kill(pool)
+
+
+def _kill(pool: ProcessPoolExecutor):
+    _retired.discard(pool)
+    # ProcessPoolExecutor has no public way to stop a running worker before Python 3.14
+    for process in list((pool._processes or {}).values()):
+        process.kill()
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _watch(future: Future, pool: ProcessPoolExecutor, timeout: float):
+    """Retire the pool if a job nobody is waiting for any more runs past its timeout."""
+    async def watch():
+        try:
+            await asyncio.wait_for(asyncio.shield(asyncio.wrap_future(future)), max(timeout, 0))
+        except asyncio.TimeoutError:
+            _retire_pool(pool, future)
+        except Exception:
+            pass  # the job failed; its caller is gone
+
+    asyncio.get_running_loop().create_task(watch())
+
+
+def _get_threads() -> ThreadPoolExecutor:
+    global _threads
+    if _threads is None:
+        _threads = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix="pdf-thread")
+    return _threads
+
+
+def _abandon_threads(threads: ThreadPoolExecutor):
+    """Leave a thread stuck past its timeout behind: later calls get new threads."""
+    global _threads
+    if threads is _threads:
+        _threads = None
+    threads.shutdown(wait=False)
@@ -3,9 +3,12 @@ import time
 import asyncio
 import shutil
 from pathlib import Path
+from typing import Awaitable, Callable
 
 TEMP_DIR = Path(__file__).parent.parent / "temp"
 MAX_AGE_SECONDS = 600  # 10 minutes
+TEMP_QUOTA_BYTES = int(os.environ.get("TEMP_QUOTA_BYTES", 1024 * 1024 * 1024))  # 1GB, 0 disables
+SWEEP_INTERVAL = 15  # seconds between job store sweeps
 
 
 def ensure_temp_dir():
@@ -13,17 +16,13 @@ def ensure_temp_dir():
     TEMP_DIR.mkdir(parents=True, exist_ok=True)
 
 
-def create_job_dir() -> Path:
-    """Create a unique job directory inside temp/."""
-    ensure_temp_dir()
-    job_id = f"{int(time.time() * 1000)}_{os.getpid()}"
-    job_dir = TEMP_DIR / job_id
-    job_dir.mkdir(parents=True, exist_ok=True)
-    return job_dir
-
-
 def cleanup_old_files():
-    """Delete job directories older than MAX_AGE_SECONDS."""
+    """Delete job directories older than MAX_AGE_SECONDS.
+
+    This lists all of temp/, so it only runs once at startup, for
+    directories left behind by an earlier process. Live jobs are removed
+    by the job store's sweep.
+    """
     if not TEMP_DIR.exists():
         return
     now = time.time()
@@ -34,8 +33,31 @@ def cleanup_old_files():
                 shutil.rmtree(item, ignore_errors=True)
 
 
-async def periodic_cleanup(interval: int = 60):
-    """Background task that runs cleanup every `interval` seconds."""
+def remove_dirs(paths: list[Path]):
+    for path in paths:
+        shutil.rmtree(path, ignore_errors=True)
+
+
+def disk_usage(root: Path = TEMP_DIR) -> tuple[int, int]:
+    """(bytes, files) currently stored under `root`."""
+    size = files = 0
+    for dirpath, _, filenames in os.walk(root):
+        for name in filenames:
+            try:
+                size += os.stat(os.path.join(dirpath, name)).st_size
+                files += 1
+            except OSError:
+                pass  # removed while we were walking
+    return size, files
+
+
+async def periodic_cleanup(sweep: Callable[[], Awaitable], interval: float = SWEEP_INTERVAL):
+    """Background task: clear leftovers from earlier runs, then call `sweep` every `interval` seconds.
+
+    Filesystem work happens in worker threads, so the event loop keeps
+    serving requests while large directories are deleted.
+    """
+    await asyncio.to_thread(cleanup_old_files)
     while True:
-        cleanup_old_files()
+        await sweep()
         await asyncio.sleep(interval)
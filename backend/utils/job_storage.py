@@ -0,0 +1,223 @@
+import os
+import json
+import uuid
+import shutil
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import BinaryIO, Iterator
+
+from fastapi import HTTPException
+from fastapi.responses import StreamingResponse
+
+from utils.zip_stream import attachment
+
+# Where background jobs keep their status and results, so that any uvicorn
+# worker, or any node behind a load balancer, can answer /api/jobs/{id}:
+#   local   records and results stay in the job's directory under temp/;
+#           enough for several workers sharing one machine
+#   object  records and results are copied to an ObjectStore; across nodes
+JOB_STORAGE = os.environ.get("JOB_STORAGE", "local")
+OBJECT_STORE_DIR = Path(os.environ.get("OBJECT_STORE_DIR", Path(__file__).parent.parent / "objects"))
+READ_CHUNK = 1024 * 1024
+
+
+class ObjectStore(ABC):
+    """Flat key -> bytes storage, the subset of S3/GCS the job backend needs.
+
+    Keys are "/"-separated paths. Writes must be atomic: readers see the
+    old object or the new one, never a partial write. Every method blocks,
+    so callers on the event loop use asyncio.to_thread.
+    """
+
+    @abstractmethod
+    def put_file(self, key: str, path: Path):
+        ...
+
+    @abstractmethod
+    def put_bytes(self, key: str, data: bytes):
+        ...
+
+    @abstractmethod
+    def get_bytes(self, key: str) -> bytes | None:
+        """The object's content, or None if there is no such key."""
+
+    @abstractmethod
+    def open(self, key: str) -> BinaryIO | None:
+        """A readable stream over the object, or None if there is no such key."""
+
+    @abstractmethod
+    def delete_prefix(self, prefix: str):
+        """Delete every object whose key starts with `prefix`."""
+
+
+class LocalObjectStore(ObjectStore):
+    """Objects as files under a directory: a stand-in for a bucket in development and tests.
+
+    A directory on a filesystem every node mounts (NFS, EFS...) also works
+    as a shared store.
+    """
+
+    def __init__(self, root: Path):
+        self.root = root
+
+    def put_file(self, key: str, path: Path):
+        with open(path, "rb") as src:
+            self._write(key, lambda out: shutil.copyfileobj(src, out, READ_CHUNK))
+
+    def put_bytes(self, key: str, data: bytes):
+        self._write(key, lambda out: out.write(data))
+
+    def get_bytes(self, key: str) -> bytes | None:
+        try:
+            return self._path(key).read_bytes()
+        except FileNotFoundError:
+            return None
+
+    def open(self, key: str) -> BinaryIO | None:
+        try:
+            return open(self._path(key), "rb")
+        except FileNotFoundError:
+            return None
+
+    def delete_prefix(self, prefix: str):
+        path = self._path(prefix.rstrip("/"))
+        if prefix.endswith("/"):
+            shutil.rmtree(path, ignore_errors=True)
+        else:
+            path.unlink(missing_ok=True)
+
+    def _path(self, key: str) -> Path:
+        if not key or key.startswith("/") or ".." in key.split("/"):
+            raise ValueError(f"Invalid object key: {key}")
+        return self.root / key
+
+    def _write(self, key: str, write):
+        path = self._path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(f".{path.name}.{uuid.uuid4().hex}")
+        try:
+            with open(tmp, "wb") as out:
+                write(out)
+            os.replace(tmp, path)
+        except BaseException:
+            tmp.unlink(missing_ok=True)
+            raise
+
+
+class JobBackend(ABC):
+    """Persists background job records and makes their results readable from any worker.
+
+    Records are the dicts of Job.record(). JobStore calls these methods in
+    worker threads. Backends must implement save() and load(); the other
+    methods default to files staying on the machine that wrote them.
+    """
+
+    @abstractmethod
+    def save(self, job_id: str, record: dict, job_dir: Path):
+        ...
+
+    @abstractmethod
+    def load(self, job_id: str, job_dir: Path) -> dict | None:
+        """The record last saved for the job, or None if there is none."""
+
+    def publish(self, job_id: str, path: Path):
+        """Make a job's file (a finished job's result, an uploaded document) available to other nodes."""
+
+    def result_response(self, job_id: str, name: str, media_type: str):
+        """Response for a result that is not on this machine's disk."""
+        raise HTTPException(404, "Job result not available on this server")
+
+    def fetch(self, job_id: str, name: str, dest: Path) -> bool:
+        """Make a file publish() stored available at `dest` on this machine. False if it is gone."""
+        return dest.exists()
+
+    def delete(self, job_ids: list[str]):
+        """Remove what the backend stored for jobs that are gone. Job directories are removed separately."""
+
+
+class LocalJobBackend(JobBackend):
+    """Records as job.json in the job directory; results are served from there.
+
+    Every worker process on the machine shares temp/, so any of them can
+    answer for a job another one runs, and read its files where they are.
+    """
+
+    RECORD = "job.json"
+
+    def save(self, job_id: str, record: dict, job_dir: Path):
+        tmp = job_dir / f".{self.RECORD}.{uuid.uuid4().hex}"
+        try:
+            tmp.write_text(json.dumps(record))
+            os.replace(tmp, job_dir / self.RECORD)
+        except FileNotFoundError:
+            pass  # the job directory was removed meanwhile
+
+    def load(self, job_id: str, job_dir: Path) -> dict | None:
+        try:
+            return json.loads((job_dir / self.RECORD).read_text())
+        except (FileNotFoundError, ValueError):
+            return None
+
+
+class ObjectStoreJobBackend(JobBackend):
+    """Records and results as objects under jobs/<job id>/, for workers on several nodes.
+
+    A node that did not run a job streams its result from the store, or
+    downloads a published file it needs on disk (fetch). Jobs
+    are deleted by the node that ran them when they expire; a bucket
+    lifecycle rule should clean up after nodes that went away.
+    """
+
+    def __init__(self, store: ObjectStore):
+        self.store = store
+
+    def save(self, job_id: str, record: dict, job_dir: Path):
+        self.store.put_bytes(f"jobs/{job_id}/job.json", json.dumps(record).encode())
+
+    def load(self, job_id: str, job_dir: Path) -> dict | None:
+        data = self.store.get_bytes(f"jobs/{job_id}/job.json")
+        return json.loads(data) if data is not None else None
+
+    def publish(self, job_id: str, path: Path):
+        self.store.put_file(f"jobs/{job_id}/result/{path.name}", path)
+
+    def result_response(self, job_id: str, name: str, media_type: str):
+        stream = self.store.open(f"jobs/{job_id}/result/{name}")
+        if stream is None:
+            raise HTTPException(404, "Job not found or expired")
+        return StreamingResponse(_chunks(stream), media_type=media_type, headers=attachment(name))
+
+    def fetch(self, job_id: str, name: str, dest: Path) -> bool:
+        if dest.exists():
+            return True
+        stream = self.store.open(f"jobs/{job_id}/result/{name}")
+        if stream is None:
+            return False
+        tmp = dest.with_name(f".{dest.name}.{uuid.uuid4().hex}")
+        try:
+            with stream, open(tmp, "wb") as out:
+                shutil.copyfileobj(stream, out, READ_CHUNK)
+            os.replace(tmp, dest)
+        except BaseException:
+            tmp.unlink(missing_ok=True)
+            raise
+        return True
+
+    def delete(self, job_ids: list[str]):
+        for job_id in job_ids:
+            self.store.delete_prefix(f"jobs/{job_id}/")
+
+
+def make_backend(kind: str = JOB_STORAGE) -> JobBackend:
+    if kind == "local":
+        return LocalJobBackend()
+    if kind == "object":
+        return ObjectStoreJobBackend(LocalObjectStore(OBJECT_STORE_DIR))
+    raise ValueError(f"Unknown JOB_STORAGE: {kind}")
+
+
+def _chunks(stream: BinaryIO) -> Iterator[bytes]:
+    # A sync iterator: Starlette reads it in a worker thread
+    with stream:
+        while chunk := stream.read(READ_CHUNK):
+            yield chunk
@@ -0,0 +1,309 @@
+import os
+import re
+import time
+import uuid
+import heapq
+import asyncio
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Awaitable, Callable
+
+from fastapi import HTTPException
+from fastapi.responses import FileResponse
+
+from utils import admission
+from utils.file_cleanup import TEMP_DIR, MAX_AGE_SECONDS, TEMP_QUOTA_BYTES, disk_usage, ensure_temp_dir, remove_dirs
+from utils.job_storage import JobBackend, make_backend
+from utils.metrics import metrics
+
+# Over quota, jobs idle for less than this are still kept. Requests answered
+# directly (not through /api/jobs) stay "pending" while they work, so this is
+# longer than a pool job may run (PDF_JOB_TIMEOUT)
+QUOTA_MIN_IDLE_SECONDS = 180
+JOB_ID = re.compile(r"[0-9a-f]{32}")
+
+
+@dataclass
+class Job:
+    """One unit of work and its directory under temp/."""
+    id: str
+    dir: Path
+    status: str = "pending"   # pending, running, done, failed
+    done: int = 0             # files or pages finished
+    total: int = 0
+    error: str | None = None
+    result_path: Path | None = None
+    media_type: str | None = None
+    stats: dict | None = None  # operation-specific figures, e.g. merge dedup savings
+    document: dict | None = None  # filename, size and sha256 of an uploaded document (/api/documents)
+    created: float = field(default_factory=time.time)
+    updated: float = field(default_factory=time.time)
+    on_change: Callable[[], object] | None = field(default=None, repr=False, compare=False)
+
+    def advance(self, n: int = 1):
+        """Record progress. Also keeps the job directory's mtime fresh for cleanup."""
+        self.done += n
+        self.touch()
+        if self.on_change:
+            self.on_change()
+
+    def touch(self):
+        self.updated = time.time()
+        try:
+            os.utime(self.dir)
+        except OSError:
+            pass
+
+    def set_result(self, path: Path):
+        self.result_path = path
+        self.media_type = "application/zip" if path.suffix == ".zip" else "application/pdf"
+
+    def record(self) -> dict:
+        """What the job backend stores, for workers that did not run the job."""
+        return {
+            "id": self.id,
+            "status": self.status,
+            "done": self.done,
+            "total": self.total,
+            "error": self.error,
+            "result": str(self.result_path.relative_to(self.dir)) if self.result_path else None,
+            "media_type": self.media_type,
+            "stats": self.stats,
+            "document": self.document,
+            "created": self.created,
+            "updated": self.updated,
+        }
+
+    @classmethod
+    def from_record(cls, record: dict, job_dir: Path) -> "Job":
+        result = record.pop("result")
+        job = cls(dir=job_dir, **record)
+        if result:
+            job.result_path = job_dir / result
+        return job
+
+    def to_dict(self) -> dict:
+        info = {
+            "job_id": self.id,
+            "status": self.status,
+            "progress": {"done": self.done, "total": self.total},
+        }
+        if self.status == "done":
+            info["result_url"] = f"/api/jobs/{self.id}/result"
+        if self.stats:
+            info["stats"] = self.stats
+        if self.error:
+            info["error"] = self.error
+        return info
+
+
+class JobStore:
+    """Registry of this process's jobs, each backed by a directory in temp/.
+
+    Jobs expire MAX_AGE_SECONDS after their last activity. sweep() finds
+    them through an expiry heap rather than by listing temp/, and deletes
+    their directories in a worker thread. While temp/ holds more than
+    `quota` bytes, it also evicts the least recently active jobs that are
+    not running, without waiting for them to expire.
+
+    Background jobs are also saved to `backend` as they progress, so that
+    find() in another worker process, or on another node, can report them.
+    Jobs that several workers serve (documents) are adopted by each of
+    them, and only removed once none has used them for `max_age`.
+    """
+
+    def __init__(self, root: Path, max_age: float, quota: int = 0, backend: JobBackend | None = None):
+        self.root = root
+        self.max_age = max_age
+        self.quota = quota
+        self.backend = backend or make_backend()
+        self._jobs: dict[str, Job] = {}
+        self._saving: dict[str, asyncio.Task] = {}  # job id -> save in progress
+        self._dirty: set[str] = set()  # jobs changed since their save in progress started
+        self._tasks: set[asyncio.Task] = set()
+        # (earliest expiry, job id); entries go stale when a job is touched
+        # and are re-queued when popped
+        self._expiry: list[tuple[float, str]] = []
+        self._sizes: dict[str, tuple[float, int, int]] = {}  # job id -> (job.updated when measured, bytes, files)
+
+    def create(self) -> Job:
+        ensure_temp_dir()
+        job_id = uuid.uuid4().hex
+        job_dir = self.root / job_id
+        job_dir.mkdir(parents=True)
+        job = Job(id=job_id, dir=job_dir)
+        self._jobs[job_id] = job
+        heapq.heappush(self._expiry, (job.updated + self.max_age, job_id))
+        return job
+
+    def get(self, job_id: str) -> Job | None:
+        job = self._jobs.get(job_id)
+        if job is None or self._expired(job, time.time()):
+            return None
+        return job
+
+    async def find(self, job_id: str) -> Job | None:
+        """A job of this process, or a background job another worker saved to the backend."""
+        if job_id in self._jobs:
+            return self.get(job_id)
+        if not JOB_ID.fullmatch(job_id):
+            return None
+        record = await asyncio.to_thread(self.backend.load, job_id, self.root / job_id)
+        if record is None:
+            return None
+        job = Job.from_record(record, self.root / job_id)
+        return None if self._expired(job, time.time()) else job
+
+    def adopt(self, job: Job):
+        """Track a job another worker created and this one now serves too, e.g. a document.
+
+        Its directory here expires like this worker's own jobs.
+        """
+        job.dir.mkdir(parents=True, exist_ok=True)
+        self._jobs[job.id] = job
+        heapq.heappush(self._expiry, (job.updated + self.max_age, job.id))
+
+    def save(self, job: Job) -> asyncio.Task:
+        """Save the job to the backend in the background; await the task to wait for the save."""
+        return self._persist(job)
+
+    def result_response(self, job: Job):
+        """Download response for a finished job's result, wherever it is stored."""
+        if job.result_path.exists():
+            return FileResponse(job.result_path, media_type=job.media_type, filename=job.result_path.name)
+        return self.backend.result_response(job.id, job.result_path.name, job.media_type)
+
+    def submit(self, job: Job, work: Awaitable):
+        """Run `work` in the background, recording its outcome on `job`.
+
+        The job keeps the request's admission ticket until it finishes.
+        """
+        job.on_change = lambda: self._persist(job)
+        task = asyncio.create_task(self._run(job, work, admission.hand_over()))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    def running(self) -> int:
+        """Background jobs currently running."""
+        return sum(job.status == "running" for job in self._jobs.values())
+
+    def usage(self) -> tuple[int, int]:
+        """(bytes, files) in this store's job directories, as of the last sweep."""
+        return (sum(size for _, size, _ in self._sizes.values()),
+                sum(files for _, _, files in self._sizes.values()))
+
+    async def sweep(self):
+        """Forget expired jobs (and over quota, the oldest idle ones), then delete their directories."""
+        now = time.time()
+        doomed = await self._still_unused(self._pop_expired(now), now)
+        await self._measure()
+        if self.quota:
+            evicted = await self._evict_over_quota(now)
+            metrics.temp_evictions.inc(len(evicted))
+            doomed += evicted
+        if doomed:
+            await asyncio.to_thread(remove_dirs, [job.dir for job in doomed])
+            await asyncio.to_thread(self.backend.delete, [job.id for job in doomed])
+
+    def _pop_expired(self, now: float) -> list[Job]:
+        doomed = []
+        while self._expiry and self._expiry[0][0] <= now:
+            _, job_id = heapq.heappop(self._expiry)
+            job = self._jobs.get(job_id)
+            if job is None:
+                continue
+            if self._expired(job, now):
+                doomed.append(self._forget(job))
+            else:
+                # Touched since, or still running: look again once it could have expired
+                heapq.heappush(self._expiry, (max(job.updated + self.max_age, now + 1), job_id))
+        return doomed
+
+    async def _still_unused(self, jobs: list[Job], now: float) -> list[Job]:
+        """Of expired jobs, those no other worker has used since; keep the rest.
+
+        Shared jobs save their record on every use, so a newer record in the
+        backend means another worker used the job after this one last did.
+        """
+        expired = []
+        for job in jobs:
+            record = None
+            if job.document is not None:
+                record = await asyncio.to_thread(self.backend.load, job.id, job.dir)
+            if record is not None and not self._expired(Job.from_record(record, job.dir), now):
+                job.updated = record["updated"]
+                self.adopt(job)
+            else:
+                expired.append(job)
+        return expired
+
+    async def _measure(self):
+        """Re-measure the job directories that changed since they were last measured."""
+        changed = [(job, job.updated) for job in self._jobs.values()
+                   if self._sizes.get(job.id, (None,))[0] != job.updated]
+        usages = await asyncio.to_thread(lambda: [disk_usage(job.dir) for job, _ in changed])
+        for (job, updated), (size, files) in zip(changed, usages):
+            if job.id in self._jobs:
+                self._sizes[job.id] = (updated, size, files)
+
+    async def _evict_over_quota(self, now: float) -> list[Job]:
+        used = self.usage()[0]
+        doomed = []
+        for job in sorted(self._jobs.values(), key=lambda j: j.updated):
+            if used <= self.quota:
+                break
+            if job.status == "running" or now - job.updated < QUOTA_MIN_IDLE_SECONDS:
+                continue
+            used -= self._sizes.get(job.id, (None, 0, 0))[1]
+            doomed.append(self._forget(job))
+        return doomed
+
+    def _forget(self, job: Job) -> Job:
+        del self._jobs[job.id]
+        self._sizes.pop(job.id, None)
+        return job
+
+    def _expired(self, job: Job, now: float) -> bool:
+        return job.status != "running" and now - job.updated > self.max_age
+
+    def _persist(self, job: Job) -> asyncio.Task:
+        """Save the job to the backend. Changes made during a save are coalesced into one more."""
+        task = self._saving.get(job.id)
+        if task is None:
+            task = self._saving[job.id] = asyncio.create_task(self._save(job))
+        else:
+            self._dirty.add(job.id)
+        return task
+
+    async def _save(self, job: Job):
+        try:
+            while True:
+                self._dirty.discard(job.id)
+                try:
+                    await asyncio.to_thread(self.backend.save, job.id, job.record(), job.dir)
+                except Exception:
+                    pass  # this process still has the job; other workers see it once a later save works
+                if job.id not in self._dirty:
+                    return
+        finally:
+            del self._saving[job.id]
+
+    async def _run(self, job: Job, work: Awaitable, ticket: admission.Ticket | None):
+        job.status = "running"
+        job.touch()
+        self._persist(job)
+        try:
+            await work
+            await asyncio.to_thread(self.backend.publish, job.id, job.result_path)
+            job.status = "done"
+        except HTTPException as e:
+            job.status, job.error = "failed", e.detail
+        except Exception as e:
+            job.status, job.error = "failed", str(e)
+        finally:
+            admission.release(ticket)
+        job.touch()
+        await self._persist(job)
+
+
+job_store = JobStore(TEMP_DIR, MAX_AGE_SECONDS, TEMP_QUOTA_BYTES)
@@ -0,0 +1,241 @@
+import os
+import time
+import cProfile
+import threading
+from collections import defaultdict
+from contextlib import contextmanager
+from pathlib import Path
+
+# Requests (and pool jobs) slower than this dump a cProfile file; 0 turns profiling off
+PROFILE_SLOW_MS = float(os.environ.get("PROFILE_SLOW_MS", 0))
+PROFILE_DIR = Path(os.environ.get("PROFILE_DIR", Path(__file__).parent.parent / "profiles"))
+PROFILE_MAX_FILES = 100  # oldest dumps are removed beyond this
+
+STAGE_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+
+class Histogram:
+    """Cumulative-bucket histogram with one series per label combination."""
+
+    def __init__(self, name: str, help: str, labels: tuple[str, ...], buckets: tuple[float, ...] = STAGE_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.buckets = buckets
+        self._series: dict[tuple, list] = {}  # labels -> [bucket counts..., count, sum]
+        self._lock = threading.Lock()  # observed from worker threads too (asyncio.to_thread)
+
+    def observe(self, value: float, *label_values: str):
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [0] * (len(self.buckets) + 1) + [0.0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += 1
+            series[-1] += value
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for label_values, series in sorted(self._series.items()):
+                labels = _labels(self.labels, label_values)
+                for bound, count in zip(self.buckets, series):
+                    lines.append(f'{self.name}_bucket{{{labels},le="{bound}"}} {count}')
+                lines.append(f'{self.name}_bucket{{{labels},le="+Inf"}} {series[-2]}')
+                lines.append(f"{self.name}_count{{{labels}}} {series[-2]}")
+                lines.append(f"{self.name}_sum{{{labels}}} {series[-1]:.6f}")
+        return lines
+
+
+class Counter:
+    type = "counter"
+
+    def __init__(self, name: str, help: str, labels: tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self._values: dict[tuple, float] = defaultdict(float)
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float, *label_values: str):
+        with self._lock:
+            self._values[label_values] += amount
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.type}"]
+        with self._lock:
+            for label_values, value in sorted(self._values.items()):
+                labels = _labels(self.labels, label_values)
+                lines.append(f"{self.name}{{{labels}}} {_number(value)}" if labels else f"{self.name} {_number(value)}")
+        return lines
+
+
+class Gauge(Counter):
+    type = "gauge"
+
+    def set(self, value: float, *label_values: str):
+        with self._lock:
+            self._values[label_values] = value
+
+
+class Metrics:
+    """Process-wide request and stage metrics, rendered in the Prometheus text format.
+
+    Stages are the steps of a request: upload, the pool work (convert,
+    split, merge), join and zip. Pool work is timed inside the worker by
+    measured(), so the figures exclude time spent waiting for a worker.
+    """
+
+    def __init__(self):
+        self.stage_seconds = Histogram(
+            "pdf_stage_seconds", "Time spent in each stage of a request.", ("operation", "stage", "file_type"),
+        )
+        self.bytes_in = Counter("pdf_bytes_in_total", "Uploaded bytes.", ("operation", "file_type"))
+        self.bytes_out = Counter("pdf_bytes_out_total", "Bytes of PDF output produced.", ("operation", "file_type"))
+        self.request_seconds = Histogram(
+            "pdf_http_request_seconds", "Request time until the last response byte.", ("route", "method", "status"),
+        )
+        self.response_bytes = Counter("pdf_http_response_bytes_total", "Response body bytes sent.", ("route",))
+        self.requests_in_flight = Gauge("pdf_http_requests_in_flight", "Requests being handled.")
+        # Set when /api/metrics is scraped
+        self.pool_workers = Gauge("pdf_pool_workers", "Process pool size.")
+        self.pool_jobs_in_flight = Gauge("pdf_pool_jobs_in_flight", "Pool jobs running or waiting for a worker.")
+        self.jobs_running = Gauge("pdf_jobs_running", "Background jobs (/api/jobs/...) running.")
+        self.temp_bytes = Gauge("pdf_temp_bytes", "Bytes in job directories under temp/, as of the last sweep.")
+        self.temp_files = Gauge("pdf_temp_files", "Files in job directories under temp/, as of the last sweep.")
+        self.temp_evictions = Counter("pdf_temp_evictions_total", "Jobs removed early because temp/ was over quota.")
+        self.cache_bytes = Gauge("pdf_cache_bytes", "Bytes held by the result cache.")
+        self.admission_cost_bytes = Gauge("pdf_admission_cost_bytes", "Estimated cost of admitted requests.")
+        self.admission_queued = Gauge("pdf_admission_queued", "Requests waiting to be admitted.")
+        self.admission_wait_seconds = Histogram(
+            "pdf_admission_wait_seconds", "Time requests waited to be admitted.", ("route",),
+        )
+        self.admission_rejected = Counter(
+            "pdf_admission_rejected_total", "Requests turned away with 429 because the cost budget was full.", ("route",),
+        )
+
+    def observe(self, operation: str, stage: str, file_type: str, seconds: float):
+        self.stage_seconds.observe(seconds, operation, stage, file_type)
+
+    @contextmanager
+    def stage(self, operation: str, stage: str, file_type: str = ""):
+        """Time a block as one stage. Works across awaits: it measures wall time."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(operation, stage, file_type, time.perf_counter() - started)
+
+    def render(self) -> str:
+        """Every metric in the Prometheus text exposition format."""
+        lines = []
+        for metric in vars(self).values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+def file_type(filename: str) -> str:
+    """Metric label for an input file: its lowercased extension without the dot."""
+    return Path(filename or "").suffix.lower().lstrip(".") or "none"
+
+
+def measured(func, *args):
+    """Call `func(*args)` and return (result, seconds). Runs inside pool workers.
+
+    With PROFILE_SLOW_MS set, the call is profiled and the profile is kept
+    when it took longer than the threshold.
+    """
+    profiler = cProfile.Profile() if PROFILE_SLOW_MS else None
+    started = time.perf_counter()
+    if profiler:
+        profiler.enable()
+    try:
+        result = func(*args)
+    finally:
+        if profiler:
+            profiler.disable()
+        seconds = time.perf_counter() - started
+        if profiler and seconds * 1000 >= PROFILE_SLOW_MS:
+            dump_profile(profiler, f"worker_{func.__name__}", seconds)
+    return result, seconds
+
+
+def dump_profile(profiler: cProfile.Profile, name: str, seconds: float) -> Path:
+    """Write a profile as PROFILE_DIR/<time>_<name>_<ms>ms.prof (open with pstats or snakeviz)."""
+    PROFILE_DIR.mkdir(parents=True, exist_ok=True)
+    path = PROFILE_DIR / f"{time.strftime('%Y%m%d-%H%M%S')}_{os.getpid()}_{name}_{seconds * 1000:.0f}ms.prof"
+    profiler.dump_stats(path)
+    dumps = sorted(PROFILE_DIR.glob("*.prof"), key=lambda p: p.stat().st_mtime)
+    for old in dumps[:-PROFILE_MAX_FILES]:
+        old.unlink(missing_ok=True)
+    return path
+
+
+class MetricsMiddleware:
+    """ASGI middleware: request timing, response bytes and in-flight count, per route.
+
+    Routes are labelled by their path template (/api/jobs/{job_id}), so the
+    number of series stays fixed. With PROFILE_SLOW_MS set, one request at
+    a time runs under cProfile and its profile is kept if it was slow. This
+    covers the event loop side (uploads, zipping, routing); pool work is
+    profiled in the worker by measured().
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self._profiling = False
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        status = "500"
+        sent = 0
+
+        async def send_wrapper(message):
+            nonlocal status, sent
+            if message["type"] == "http.response.start":
+                status = str(message["status"])
+            elif message["type"] == "http.response.body":
+                sent += len(message.get("body", b""))
+            await send(message)
+
+        profiler = None
+        if PROFILE_SLOW_MS and not self._profiling:
+            self._profiling = True
+            profiler = cProfile.Profile()
+            profiler.enable()
+
+        metrics.requests_in_flight.inc(1)
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            seconds = time.perf_counter() - started
+            metrics.requests_in_flight.inc(-1)
+            route = scope.get("route")
+            route = route.path if route is not None else "unmatched"
+            metrics.request_seconds.observe(seconds, route, scope["method"], status)
+            metrics.response_bytes.inc(sent, route)
+            if profiler:
+                profiler.disable()
+                self._profiling = False
+                if seconds * 1000 >= PROFILE_SLOW_MS:
+                    dump_profile(profiler, scope["method"] + route.replace("/", "_"), seconds)
+
+
+def _labels(names: tuple[str, ...], values: tuple) -> str:
+    return ",".join(f'{n}="{_escape(str(v))}"' for n, v in zip(names, values))
+
+
+def _number(value: float) -> str:
+    return str(int(value)) if value == int(value) else repr(value)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+metrics = Metrics()
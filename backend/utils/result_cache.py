@@ -0,0 +1,192 @@
+import os
+import json
+import asyncio
+import threading
+import time
+import uuid
+import shutil
+import hashlib
+from collections import OrderedDict
+from pathlib import Path
+
+CACHE_DIR = Path(__file__).parent.parent / "cache"
+MAX_CACHE_BYTES = int(os.environ.get("RESULT_CACHE_MAX_BYTES", 512 * 1024 * 1024))  # 512MB, 0 disables
+
+MANIFEST = "manifest.json"
+
+
+def make_key(operation: str, version: str, input_hashes: list[str], params: dict) -> str:
+    """Cache key for an operation over inputs (by content hash) with the given parameters."""
+    payload = json.dumps(
+        {"op": operation, "version": version, "inputs": input_hashes, "params": params},
+        sort_keys=True,
+    )
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def link_or_copy(src: Path, dest: Path):
+    """Hard-link `src` to `dest`, copying when the filesystem can't link."""
+    try:
+        os.link(src, dest)
+    except OSError:
+        shutil.copyfile(src, dest)
+
+
+class ResultCache:
+    """Disk-backed, size-capped LRU cache of output files keyed by make_key().
+
+    Entries live in their own directory outside temp/, so job cleanup never
+    removes them. Hits are hard-linked into the requesting job's directory,
+    so evicting an entry never breaks a download that is still in flight.
+
+    Disk work runs in a thread, off the event loop. The size index is kept
+    per process: each uvicorn worker evicts down to `max_bytes` counting the
+    entries it stored, found at startup or hit. Entries other workers stored
+    since are not counted, so the directory can briefly grow past the cap.
+    """
+
+    def __init__(self, root: Path, max_bytes: int):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries: OrderedDict[str, int] = OrderedDict()  # key -> size, oldest first
+        self._bytes = 0
+        self._loaded = False
+        self._lock = threading.Lock()  # guards the index; disk work runs in threads
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0
+
+    async def get(self, key: str, dest_dir: Path, names: list[str] | None = None) -> list[Path] | None:
+        """Link a cached artifact's files into `dest_dir`. Returns None on a miss.
+
+        `names` renames the files on the way out; by default the names they
+        were stored under are kept.
+        """
+        if not self.enabled:
+            return None
+        return await asyncio.to_thread(self._get, key, dest_dir, names)
+
+    async def put(self, key: str, files: list[Path]):
+        """Store output files (in order) under `key`, evicting old entries to fit."""
+        if self.enabled:
+            await asyncio.to_thread(self._put, key, files)
+
+    async def stats(self) -> dict:
+        if self.enabled:
+            await asyncio.to_thread(self._load)
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+                "evictions": self.evictions,
+            }
+
+    def _get(self, key: str, dest_dir: Path, names: list[str] | None) -> list[Path] | None:
+        self._load()
+
+        entry = self.root / key
+        linked = []
+        try:
+            stored = json.loads((entry / MANIFEST).read_text())["files"]
+            for i, stored_name in enumerate(stored):
+                dest = dest_dir / (names[i] if names else stored_name)
+                link_or_copy(entry / stored_name, dest)
+                linked.append(dest)
+            os.utime(entry)  # keep LRU order across restarts
+        except (OSError, ValueError, KeyError, IndexError):
+            # Not cached, or evicted by another worker while we were reading
+            for path in linked:
+                path.unlink(missing_ok=True)
+            with self._lock:
+                self._forget(key)
+                self.misses += 1
+            return None
+
+        size = None if key in self._entries else _dir_size(entry)  # else stored by another worker process
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+            elif size is not None:
+                self._entries[key] = size
+                self._bytes += size
+            self.hits += 1
+        return linked
+
+    def _put(self, key: str, files: list[Path]):
+        self._load()
+        if key in self._entries:
+            return
+
+        size = sum(f.stat().st_size for f in files)
+        if size > self.max_bytes:
+            return
+
+        tmp = self.root / f".{key}.{uuid.uuid4().hex}"
+        try:
+            tmp.mkdir(parents=True)
+            for f in files:
+                link_or_copy(f, tmp / f.name)
+            (tmp / MANIFEST).write_text(json.dumps({"files": [f.name for f in files]}))
+            tmp.rename(self.root / key)
+        except OSError:
+            # Another worker stored the same key first, or the disk is full
+            shutil.rmtree(tmp, ignore_errors=True)
+            return
+
+        evicted = []
+        with self._lock:
+            if key not in self._entries:
+                self._entries[key] = size
+                self._bytes += size
+            while self._bytes > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._forget(oldest)
+                evicted.append(oldest)
+                self.evictions += 1
+        for oldest in evicted:
+            shutil.rmtree(self.root / oldest, ignore_errors=True)
+
+    def _forget(self, key: str):
+        size = self._entries.pop(key, None)
+        if size is not None:
+            self._bytes -= size
+
+    def _load(self):
+        """Rebuild the LRU index from disk on first use (oldest mtime first)."""
+        with self._lock:
+            if self._loaded:
+                return
+            self._loaded = True
+            self._load_entries()
+
+    def _load_entries(self):
+        self.root.mkdir(parents=True, exist_ok=True)
+
+        found = []
+        for entry in self.root.iterdir():
+            if entry.name.startswith("."):
+                # put() interrupted by a crash; recent ones may belong to another worker
+                if time.time() - entry.stat().st_mtime > 3600:
+                    shutil.rmtree(entry, ignore_errors=True)
+            elif (entry / MANIFEST).exists():
+                found.append((entry.stat().st_mtime, entry.name, _dir_size(entry)))
+
+        for _, key, size in sorted(found):
+            self._entries[key] = size
+            self._bytes += size
+
+
+def _dir_size(path: Path) -> int:
+    return sum(f.stat().st_size for f in path.iterdir() if f.name != MANIFEST)
+
+
+result_cache = ResultCache(CACHE_DIR, MAX_CACHE_BYTES)
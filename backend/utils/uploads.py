@@ -0,0 +1,157 @@
+import os
+import uuid
+import asyncio
+import hashlib
+from dataclasses import dataclass
+from pathlib import Path
+
+import aiofiles
+from fastapi import Request, UploadFile, HTTPException
+from fastapi.routing import APIRoute
+from starlette.datastructures import FormData
+from starlette.formparsers import MultiPartException, MultiPartParser
+from starlette.requests import parse_options_header
+
+from utils import admission
+from utils.file_cleanup import TEMP_DIR
+
+MAX_FILE_SIZE = 50 * 1024 * 1024  # 50MB
+CHUNK_SIZE = 1024 * 1024  # 1MB per read/write
+UPLOAD_DIR = TEMP_DIR / "uploads"  # files being received; on temp/'s filesystem so they can be moved into jobs
+
+
+@dataclass
+class SavedUpload:
+    """An upload copied into a job directory."""
+    filename: str   # name as sent by the client
+    path: Path
+    size: int
+    sha256: str
+
+
+def safe_filename(filename: str) -> str:
+    """Strip any directory components a client put in the filename."""
+    return Path(filename or "").name or "upload"
+
+
+class StreamedUpload(UploadFile):
+    """A file part written straight to its own file under UPLOAD_DIR while the body is read.
+
+    It is hashed on the way in, and fails the request with a 400 as soon
+    as it passes `max_size`, without reading the rest of the body.
+    """
+
+    def __init__(self, filename: str, headers, max_size: int):
+        UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
+        self.path = UPLOAD_DIR / uuid.uuid4().hex
+        super().__init__(open(self.path, "wb+"), size=0, filename=filename, headers=headers)
+        self.max_size = max_size
+        self.digest = hashlib.sha256()
+
+    async def write(self, data: bytes):
+        self.size += len(data)
+        if self.size > self.max_size:
+            raise HTTPException(400, _too_large(self.filename, self.max_size))
+        self.digest.update(data)
+        await asyncio.to_thread(self.file.write, data)
+
+    async def close(self):
+        await asyncio.to_thread(self._discard)
+
+    def _discard(self):
+        self.file.close()
+        self.path.unlink(missing_ok=True)  # unless save_upload() moved it into a job
+
+
+class UploadParser(MultiPartParser):
+    """Starlette's multipart parser, with file parts received as StreamedUploads."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.max_upload_size = MAX_FILE_SIZE
+        self._uploads: list[StreamedUpload] = []
+
+    def on_headers_finished(self):
+        super().on_headers_finished()
+        part = self._current_part
+        if part.file is not None:
+            # Replace the spooled temporary file Starlette opened (nothing was written to it yet)
+            self._files_to_close_on_error.pop().close()
+            part.file = StreamedUpload(part.file.filename, part.file.headers, self.max_upload_size)
+            self._uploads.append(part.file)
+
+    async def parse(self) -> FormData:
+        try:
+            return await super().parse()
+        except BaseException:
+            await asyncio.gather(*(upload.close() for upload in self._uploads))
+            raise
+
+
+class UploadRequest(Request):
+    async def _get_form(self, *, max_files: int | float = 1000, max_fields: int | float = 1000) -> FormData:
+        if self._form is None and parse_options_header(self.headers.get("Content-Type"))[0] == b"multipart/form-data":
+            try:
+                self._form = await UploadParser(self.headers, self.stream(), max_files=max_files, max_fields=max_fields).parse()
+            except MultiPartException as exc:
+                raise HTTPException(400, exc.message)
+        return await super()._get_form(max_files=max_files, max_fields=max_fields)
+
+
+class UploadRoute(APIRoute):
+    """Route class for endpoints that take uploads: their files stream to disk as they arrive.
+
+    FastAPI otherwise spools the whole body to temporary files before the
+    endpoint runs, and save_upload() would copy each one again.
+    """
+
+    def get_route_handler(self):
+        handler = super().get_route_handler()
+
+        async def upload_route_handler(request: Request):
+            return await handler(UploadRequest(request.scope, request.receive))
+
+        return upload_route_handler
+
+
+async def save_upload(upload: UploadFile, dest: Path, max_size: int = MAX_FILE_SIZE) -> SavedUpload:
+    """Move or copy an upload to `dest`, hashing it on the way.
+
+    A StreamedUpload (routes with UploadRoute) is already on disk and
+    hashed, so it is moved. Any other upload is copied in fixed-size
+    chunks, and the copy stops and the partial file is removed as soon as
+    it passes `max_size`. The saved file is charged to the request's
+    admission ticket by its type.
+    """
+    if isinstance(upload, StreamedUpload):
+        if upload.size > max_size:
+            raise HTTPException(400, _too_large(upload.filename, max_size))
+        await asyncio.to_thread(_move, upload, dest)
+        admission.charge(upload.filename, upload.size)
+        return SavedUpload(filename=upload.filename, path=dest, size=upload.size, sha256=upload.digest.hexdigest())
+
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        async with aiofiles.open(dest, "wb") as out:
+            while chunk := await upload.read(CHUNK_SIZE):
+                size += len(chunk)
+                if size > max_size:
+                    raise HTTPException(400, _too_large(upload.filename, max_size))
+                digest.update(chunk)
+                await out.write(chunk)
+    except BaseException:
+        dest.unlink(missing_ok=True)
+        raise
+
+    admission.charge(upload.filename, size)
+    return SavedUpload(filename=upload.filename, path=dest, size=size, sha256=digest.hexdigest())
+
+
+def _move(upload: StreamedUpload, dest: Path):
+    upload.file.flush()
+    os.replace(upload.path, dest)
+
+
+def _too_large(filename: str, max_size: int) -> str:
+    return f"File too large: {filename} (max {max_size // (1024 * 1024)}MB)"
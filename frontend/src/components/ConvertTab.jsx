@@ -4,11 +4,17 @@ import { Loader2, Download } from 'lucide-react';
 import FileDropZone from './FileDropZone';
 import FileList from './FileList';
 
-const ACCEPTED = '.docx,.doc,.xlsx,.xls,.csv,.pptx,.ppt,.png,.jpg,.jpeg,.bmp,.tiff,.txt,.md,.html';
+const ACCEPTED = '.docx,.doc,.xlsx,.xls,.csv,.pptx,.ppt,.png,.jpg,.jpeg,.bmp,.tiff,.tif,.txt,.md,.html';
+const IMAGE_PATTERN = /\.(png|jpe?g|bmp|tiff?)$/i;
 
 export default function ConvertTab({ addToast }) {
   const [files, setFiles] = useState([]);
   const [loading, setLoading] = useState(false);
+  const [combine, setCombine] = useState(false);
+
+  // Only a batch of images can be combined into one PDF
+  const canCombine = files.length > 1 && files.every((f) => IMAGE_PATTERN.test(f.name));
+  const combining = combine && canCombine;
 
   const handleFiles = (newFiles) => {
     setFiles((prev) => [...prev, ...newFiles]);
@@ -24,6 +30,7 @@ export default function ConvertTab({ addToast }) {
 
     const formData = new FormData();
     files.forEach((f) => formData.append('files', f));
+    if (combining) formData.append('combine', 'true');
 
     try {
       const res = await api.post('/api/convert', formData, {
@@ -34,7 +41,7 @@ export default function ConvertTab({ addToast }) {
       const disposition = res.headers['content-disposition'];
       let filename = files.length === 1
         ? files[0].name.replace(/\.[^.]+$/, '.pdf')
-        : 'converted.zip';
+        : combining ? 'combined.pdf' : 'converted.zip';
       if (disposition) {
         const match = disposition.match(/filename="?(.+?)"?$/);
         if (match) filename = match[1];
@@ -84,6 +91,18 @@ export default function ConvertTab({ addToast }) {
 
       <FileList files={files} onRemove={removeFile} />
 
+      {canCombine && (
+        <label className="mt-4 flex items-center gap-3 p-3 rounded-lg border cursor-pointer"
+          style={{ borderColor: combine ? '#0ea5e9' : 'var(--border)', backgroundColor: 'var(--bg-secondary)' }}>
+          <input type="checkbox" checked={combine}
+            onChange={(e) => setCombine(e.target.checked)} className="accent-primary-500" />
+          <div>
+            <p className="font-medium text-sm">Combine into one PDF</p>
+            <p className="text-xs" style={{ color: 'var(--text-secondary)' }}>One page per image, in upload order</p>
+          </div>
+        </label>
+      )}
+
       {files.length > 0 && (
         <button
           onClick={handleConvert}
@@ -22,12 +22,12 @@ export default function SplitTab({ addToast }) {
     setFile(f);
     setPdfInfo(null);
 
-    // Get PDF info
+    // Upload once — the returned document_id is reused for the split
     setInfoLoading(true);
     const formData = new FormData();
     formData.append('file', f);
     try {
-      const res = await api.post('/api/split/info', formData);
+      const res = await api.post('/api/documents', formData);
       setPdfInfo(res.data);
       setRangeEnd(res.data.page_count);
     } catch {
@@ -42,7 +42,6 @@ export default function SplitTab({ addToast }) {
     setLoading(true);
 
     const formData = new FormData();
-    formData.append('file', file);
     formData.append('mode', mode);
     if (mode === 'specific') formData.append('pages', specificPages);
     if (mode === 'range') {
@@ -51,7 +50,7 @@ export default function SplitTab({ addToast }) {
     }
 
     try {
-      const res = await api.post('/api/split', formData, {
+      const res = await api.post(`/api/documents/${pdfInfo.document_id}/split`, formData, {
         responseType: 'blob',
       });
 
@@ -68,7 +67,10 @@ export default function SplitTab({ addToast }) {
 
       addToast('success', 'PDF split successfully!');
     } catch (err) {
-      if (err.response?.data instanceof Blob) {
+      if (err.response?.status === 404) {
+        addToast('error', 'Upload expired, please add the file again');
+        reset();
+      } else if (err.response?.data instanceof Blob) {
         const text = await err.response.data.text();
         try {
           addToast('error', JSON.parse(text).detail);